@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+# vexptoolbox: Vizard Toolbox for Behavioral Experiments
+# Test configuration: import vexptoolbox from the analysis folder
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+# vexptoolbox: Vizard Toolbox for Behavioral Experiments
+# Parity tests of batched gaze geometry against recorded and vizmat reference values
+
+import os
+import csv
+import glob
+import math
+
+import numpy as np
+import pytest
+
+from vexptoolbox.data import targetLayout
+from vexptoolbox.geometry import (vectorToPoint, angleBetween, vectorEuler, eulerVector,
+                                  vecRotVecEuler, gazeAngles, gazeTargetErrors)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'results')
+
+
+def _recordedTargets(depth=6.0):
+    """ Unique (x, y, d, xm, ym) validation targets from the recorded per-target data """
+    targets = set()
+    for target_file in glob.glob(os.path.join(RESULTS_DIR, 'data_targets_*.csv')):
+        with open(target_file, 'r') as tf:
+            for row in csv.DictReader(tf, delimiter='\t'):
+                if float(row['d']) == depth:
+                    targets.add(tuple(float(row[f]) for f in ['x', 'y', 'd', 'xm', 'ym']))
+    return sorted(targets)
+
+
+RECORDED_TARGETS = _recordedTargets()
+
+
+def _dir(yaw, pitch):
+    """ Gaze direction for yaw (right) and elevation (up) in degrees """
+    (yr, pr) = (math.radians(yaw), math.radians(pitch))
+    return [math.sin(yr) * math.cos(pr), math.sin(pr), math.cos(yr) * math.cos(pr)]
+
+
+@pytest.mark.skipif(len(RECORDED_TARGETS) == 0, reason='No recorded target data found')
+def test_recorded_target_layout():
+    """ Target positions (xm, ym) recorded during validation are reproduced from the
+    target angles, and the gaze angles of the eye-target vectors match those angles """
+    tar = np.array(RECORDED_TARGETS)
+    layout = np.array(targetLayout(tar[:, 0:3]))
+    np.testing.assert_allclose(layout[:, 0:2], tar[:, 3:5], atol=0.006)
+
+    # Recorded positions are rounded to cm, i.e. < 0.1 deg at 6 m
+    vec = vectorToPoint(np.zeros((len(tar), 3)), np.stack([tar[:, 3], tar[:, 4], tar[:, 2]], axis=-1))
+    (x, y) = gazeAngles(vec)
+    np.testing.assert_allclose(x, tar[:, 0], atol=0.1)
+    np.testing.assert_allclose(y, tar[:, 1], atol=0.1)
+
+    # Gaze directed at each target has no error
+    (err, errX, errY) = gazeTargetErrors(np.zeros((len(tar), 3)), vectorToPoint([0, 0, 0], layout), layout)
+    np.testing.assert_allclose(err, 0.0, atol=1e-5)
+    np.testing.assert_allclose(errX, 0.0, atol=1e-6)
+    np.testing.assert_allclose(errY, 0.0, atol=1e-6)
+
+
+@pytest.mark.parametrize('b, yaw, pitch', [
+    ([0, 0, 1], 0.0, 0.0),
+    ([1, 0, 0], 90.0, 0.0),
+    ([-1, 0, 0], -90.0, 0.0),
+    ([0, -1, 0], 0.0, 90.0),
+    ([0, 1, 0], 0.0, -90.0),
+    ([1, 0, 1], 45.0, 0.0),
+    ([0, 1, 1], 0.0, -45.0),
+])
+def test_vecrotvec_vizmat(b, yaw, pitch):
+    """ vizmat.Transform().makeVecRotVec([0, 0, 1], b).getEuler() for axis-aligned rotations """
+    (y, p) = vecRotVecEuler([0, 0, 1], b)
+    assert float(y) == pytest.approx(yaw, abs=1e-9)
+    assert float(p) == pytest.approx(pitch, abs=1e-9)
+
+
+def test_vecrotvec_forward_euler():
+    """ Rotating the forward axis reproduces the euler angles of the target direction """
+    (yaw, pitch) = np.meshgrid(np.arange(-40.0, 41.0, 10.0), np.arange(-30.0, 31.0, 10.0))
+    v = eulerVector(yaw.ravel(), pitch.ravel())
+    (y, p) = vecRotVecEuler([0, 0, 1], v)
+    np.testing.assert_allclose(y, yaw.ravel(), atol=1e-9)
+    np.testing.assert_allclose(p, pitch.ravel(), atol=1e-9)
+    np.testing.assert_allclose(np.stack(vectorEuler(v)), np.stack([yaw.ravel(), pitch.ravel()]), atol=1e-9)
+
+
+@pytest.mark.parametrize('origin, gaze, target, ref', [
+    # (error, horizontal error, vertical error), positive: gaze right of / above target
+    ([0, 0, 0], _dir(0, 0), [0, 0, 6], (0.0, 0.0, 0.0)),
+    ([0, 0, 0], _dir(5, 0), [0, 0, 6], (5.0, 5.0, 0.0)),
+    ([0, 0, 0], _dir(-2, 0), [0, 0, 6], (2.0, -2.0, 0.0)),
+    ([0, 0, 0], _dir(0, 3), [0, 0, 6], (3.0, 0.0, 3.0)),
+    ([0, 0, 0], _dir(0, -4), [0, 0, 0.5], (4.0, 0.0, -4.0)),
+    ([0.03, 0, 0], _dir(0, 0), [0, 0, 6], (math.degrees(math.atan(0.005)),) * 2 + (0.0,)),
+    ([0, 0, 0], _dir(0, 0), [0, 6 * math.tan(math.radians(10)), 6], (10.0, 0.0, -10.0)),
+])
+def test_gaze_target_errors(origin, gaze, target, ref):
+    (err, errX, errY) = gazeTargetErrors(np.array([origin]), np.array([gaze]), target)
+    np.testing.assert_allclose([err[0], errX[0], errY[0]], ref, atol=1e-6)
+
+
+def test_gaze_angles():
+    """ targetGaze_X / targetGaze_Y conventions: positive values right / up """
+    (x, y) = gazeAngles(np.array([_dir(30, 0), _dir(0, 10), _dir(-15, -5)]))
+    np.testing.assert_allclose(x, [30.0, 0.0, -15.0], atol=1e-9)
+    np.testing.assert_allclose(y, [0.0, 10.0, -5.0], atol=1e-9)
+
+
+def test_batch_matches_single():
+    """ Batched results equal per-sample calls, as in recorder and recomputeMetrics() """
+    rng = np.random.default_rng(0)
+    origins = rng.normal(0.0, 0.03, (50, 3))
+    gaze = np.array([_dir(a, b) for (a, b) in rng.uniform(-20, 20, (50, 2))])
+    target = [0.5, -0.3, 6.0]
+    batch = gazeTargetErrors(origins, gaze, target)
+    for i in range(0, len(gaze)):
+        single = gazeTargetErrors(origins[i], gaze[i], target)
+        np.testing.assert_allclose([float(v) for v in single], [b[i] for b in batch], atol=1e-9)
+    np.testing.assert_allclose(batch[0], angleBetween(gaze, vectorToPoint(origins, target)))
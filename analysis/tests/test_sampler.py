@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+# vexptoolbox: Vizard Toolbox for Behavioral Experiments
+# High-rate eye sampling thread and frame / eye sample join, using a simulated tracker
+
+import time
+
+import pytest
+
+from vexptoolbox.sampler import SampleBuffer, ThreadedSampler, FakeEyeTracker
+
+if hasattr(time, 'perf_counter'):
+    from time import perf_counter
+else:
+    from time import clock as perf_counter
+
+TRACKER_RATE = 120.0	# Hz, native rate of simulated tracker
+TRACKER_JITTER = 0.5	# ms, SD of simulated sample timing
+FRAME_RATE = 90.0		# Hz, simulated render frame rate
+
+
+def test_buffer_nearest():
+    b = SampleBuffer(size=5)
+    assert b.nearest(1.0) is None
+    for i in range(0, 12):
+        b.push(float(i), i)
+    # Oldest slot is left out while the producer may overwrite it
+    assert b.read() == [8, 9, 10, 11]
+    assert b.nearest(8.4) == 8
+    assert b.nearest(8.6) == 9
+    assert b.nearest(100.0) == 11
+    assert b.nearest(-1.0) == 8
+    assert b.latest() == 11
+
+
+def test_sampler_fake_tracker():
+    """ Polling faster than the tracker rate stores tracker samples once, in order """
+    tracker = FakeEyeTracker(rate=TRACKER_RATE, jitter=TRACKER_JITTER, noise=0.1, seed=1)
+    sampler = ThreadedSampler(tracker.poll, rate=1000.0)
+    sampler.start()
+    time.sleep(0.5)
+    sampler.stop()
+
+    seqs = [s['eye_seq'] for s in sampler.buffer.read()]
+    assert len(seqs) == len(set(seqs))
+    assert seqs == sorted(seqs)
+    # Allow for a few samples lost while the polling thread is not scheduled
+    assert len(seqs) >= 0.8 * tracker.emitted
+    assert sampler.repeats > 0
+    times = [s['eye_time'] for s in sampler.buffer.read()]
+    assert all([b >= a for (a, b) in zip(times[:-1], times[1:])])
+
+
+def test_frame_join_nearest_eye_sample():
+    """ Render-frame samples are joined to the closest eye sample in time,
+    as done by SampleRecorder.recordSample() """
+    tracker = FakeEyeTracker(rate=TRACKER_RATE, jitter=TRACKER_JITTER, seed=2)
+    sampler = ThreadedSampler(tracker.poll, rate=1000.0)
+    sampler.start()
+    time.sleep(0.05)
+
+    frames = []
+    next_t = perf_counter()
+    for f in range(0, 45):
+        next_t += 1.0 / FRAME_RATE
+        time.sleep(max(next_t - perf_counter(), 0.0))
+        s = {'frameno': f, 'systime': perf_counter() * 1000.0}
+        assert sampler.merge(s, s['systime'])
+        frames.append(s)
+    sampler.stop()
+
+    # Joined eye sample is the nearest one that was buffered at the time of the frame
+    eye = sampler.buffer.read()
+    for s in frames:
+        nearest = min([s['systime'] - e['eye_time'] for e in eye if e['eye_time'] <= s['systime']])
+        assert abs(s['eye_time'] - s['systime']) <= nearest + 1.0
+        assert s['systime'] - s['eye_time'] < 3 * 1000.0 / TRACKER_RATE
+
+    # Eye samples advance with the frames, and frames are not all joined to one sample
+    seqs = [s['eye_seq'] for s in frames]
+    assert seqs == sorted(seqs)
+    assert len(set(seqs)) > len(frames) // 2
+
+
+def test_merge_empty_buffer():
+    sampler = ThreadedSampler(FakeEyeTracker().poll, rate=100.0)
+    s = {'systime': 1.0}
+    assert not sampler.merge(s, s['systime'])
+    assert s == {'systime': 1.0}
+
+
+def test_recorder_eye_rate_gating():
+    """ High-rate sampling is only enabled for trackers known to be thread-safe """
+    pytest.importorskip('viz')
+    from vexptoolbox.recorder import SampleRecorder
+    rec = SampleRecorder(eye_tracker=FakeEyeTracker(), eye_rate=TRACKER_RATE)
+    assert rec._eye_sampler is None
@@ -6,6 +6,23 @@ __version__ = '0.1.1'
 
 from .data import *
 from .stats import * 
+from .sampler import *
+from .monitor import *
+from .dwell import *
+from .fixation import *
+from .overview import *
+
+try:
+    # Batched geometry and analysis functions require NumPy
+    import numpy
+    from .geometry import *
+    from .aoi import *
+    from .classify import *
+    from .segments import *
+    from .metrics import *
+
+except ImportError:
+    pass
 
 try:
     import viz
@@ -0,0 +1,664 @@
+# -*- coding: utf-8 -*-
+
+# vexptoolbox: Vizard Toolbox for Behavioral Experiments
+# Gaze ray hit testing against areas of interest (AOIs) with simple shapes
+#
+# AOI poses are 4x4 transform matrices in Vizard's row-vector convention
+# (points are transformed as p * M, translation in elements 12-14), i.e. the
+# list returned by node.getMatrix(viz.ABS_GLOBAL).get(). Shape geometry is
+# given in the AOI's local coordinate system.
+
+import numpy as np
+
+from .data import MISSING_VALUE, _HAS_SCI_PKGS
+from .geometry import eulerVector, eulerQuat
+
+if _HAS_SCI_PKGS:
+    import pandas as pd
+
+AOI_SPHERE = 0
+AOI_BOX = 1
+AOI_PLANE = 2
+
+_SHAPES = {'sphere': AOI_SPHERE, 'box': AOI_BOX, 'plane': AOI_PLANE}
+
+
+def translationMatrix(pos):
+    """ Return a 4x4 matrix (row-vector convention) for a translation
+
+    Args:
+        pos (3-tuple): Position (X, Y, Z)
+    """
+    m = np.identity(4)
+    m[3, 0:3] = pos
+    return m
+
+
+def poseMatrix(pos, euler=(0.0, 0.0, 0.0)):
+    """ Return a 4x4 matrix (row-vector convention) for a position and
+    Vizard euler orientation, like node.getMatrix() of a placed node
+
+    Args:
+        pos (3-tuple): Position (X, Y, Z)
+        euler (3-tuple): Orientation (yaw, pitch, roll) in degrees
+    """
+    (x, y, z, w) = eulerQuat(*euler)
+    m = np.identity(4)
+    m[0:3, 0:3] = [[1.0 - 2.0 * (y * y + z * z), 2.0 * (x * y + z * w), 2.0 * (x * z - y * w)],
+                   [2.0 * (x * y - z * w), 1.0 - 2.0 * (x * x + z * z), 2.0 * (y * z + x * w)],
+                   [2.0 * (x * z + y * w), 2.0 * (y * z - x * w), 1.0 - 2.0 * (x * x + y * y)]]
+    m[3, 0:3] = pos
+    return m
+
+
+def _rayBox(o, d, c, h):
+    """ Ray-box intersection using the slab method. Boxes with zero extent 
+    along one axis are treated as plane patches.
+
+    Args:
+        o, d: X, Y and Z components of ray origins and directions, each
+            a scalar or an array of shape (..., M)
+        c, h: (M, 3) arrays of box centers and half extents
+
+    Returns: tuple of (hit, distance) arrays, distance in units of |d|
+    """
+    tmin = None
+    tmax = None
+    for j in range(0, 3):
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            inv = 1.0 / d[j]
+            t1 = (c[:, j] - h[:, j] - o[j]) * inv
+            t2 = (c[:, j] + h[:, j] - o[j]) * inv
+        tn = np.minimum(t1, t2)
+        tf = np.maximum(t1, t2)
+
+        # Rays parallel to a slab either always or never overlap it
+        parallel = (d[j] == 0.0)
+        if np.any(parallel):
+            inside = np.abs(o[j] - c[:, j]) <= h[:, j]
+            tn = np.where(parallel, np.where(inside, -np.inf, np.inf), tn)
+            tf = np.where(parallel, np.where(inside, np.inf, -np.inf), tf)
+
+        tmin = tn if tmin is None else np.maximum(tmin, tn)
+        tmax = tf if tmax is None else np.minimum(tmax, tf)
+
+    hit = tmax >= np.maximum(tmin, 0.0)
+    return (hit, np.where(tmin >= 0.0, tmin, tmax))
+
+
+def _raySphere(o, d, c, r):
+    """ Ray-sphere intersection, arguments like _rayBox()
+
+    Args:
+        o, d: X, Y and Z components of ray origins and directions
+        c: (M, 3) array of sphere centers
+        r: (M,) array of sphere radii
+
+    Returns: tuple of (hit, distance) arrays, distance in units of |d|
+    """
+    oc = [o[j] - c[:, j] for j in range(0, 3)]
+    a = d[0] * d[0] + d[1] * d[1] + d[2] * d[2]
+    b = oc[0] * d[0] + oc[1] * d[1] + oc[2] * d[2]
+    cc = oc[0] * oc[0] + oc[1] * oc[1] + oc[2] * oc[2] - r * r
+    disc = b * b - a * cc
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sq = np.sqrt(disc)
+        t0 = (-b - sq) / a
+        t1 = (-b + sq) / a
+    t = np.where(t0 >= 0.0, t0, t1)
+    return ((disc >= 0.0) & (t >= 0.0), t)
+
+
+
+class AOISet(object):
+
+    def __init__(self, leaf_size=8):
+        """ Collection of areas of interest (AOIs) with simple bounding shapes
+        (sphere, box, plane patch) for fast gaze ray hit testing.
+
+        Single rays (e.g., the current gaze on each frame) are tested using a
+        bounding volume hierarchy (BVH) over all static AOIs, plus all dynamic
+        AOIs. Batches of rays (e.g., recorded samples) are tested against all
+        AOIs at once. All shape tests are vectorized using NumPy.
+
+        Args:
+            leaf_size (int): Maximum number of AOIs per BVH leaf node
+        """
+        self.leaf_size = int(leaf_size)
+        self.names = []
+        self.keys = []
+        self._shapes = []
+        self._centers = []
+        self._halfs = []
+        self._matrices = []
+        self._static = []
+        self._valid = False
+
+
+    def __len__(self):
+        return len(self.names)
+
+
+    def add(self, shape='sphere', size=1.0, matrix=None, center=(0.0, 0.0, 0.0),
+            axis='y', name='', key=None, static=True):
+        """ Add a new AOI
+
+        Args:
+            shape (str): 'sphere', 'box', or 'plane'
+            size: Sphere radius, box size (X, Y, Z) or plane patch size.
+                Plane size is given along the two remaining axes in XYZ order,
+                e.g. (X, Z) for the default axis='y' (like vizshape.addPlane)
+            matrix: 4x4 transform matrix (or list of 16 values) of the AOI,
+                default: identity
+            center (3-tuple): Shape center in local AOI coordinates
+            axis (str): Normal axis of a plane patch ('x', 'y' or 'z')
+            name (str): AOI name
+            key: Arbitrary object to identify this AOI (e.g., a Vizard node)
+            static (bool): if False, AOI is expected to move often and will
+                not be included in the BVH
+
+        Returns: AOI index
+        """
+        if shape not in _SHAPES:
+            raise ValueError('Unknown AOI shape "{:s}", use one of: {:s}'.format(str(shape), ', '.join(_SHAPES.keys())))
+
+        if shape == 'sphere':
+            half = [float(size),] * 3
+        elif shape == 'box':
+            half = [float(v) / 2.0 for v in size]
+        else:
+            ax = 'xyz'.index(axis.lower())
+            half = [float(v) / 2.0 for v in size]
+            half.insert(ax, 0.0)
+
+        if matrix is None:
+            matrix = np.identity(4)
+
+        self.names.append(name)
+        self.keys.append(key)
+        self._shapes.append(_SHAPES[shape])
+        self._centers.append([float(v) for v in center])
+        self._halfs.append(half)
+        self._matrices.append(np.asarray(matrix, dtype=float).reshape(4, 4))
+        self._static.append(bool(static))
+        self._valid = False
+        return len(self.names) - 1
+
+
+    def remove(self, key):
+        """ Remove all AOIs that were added with the given key """
+        keep = [i for i, k in enumerate(self.keys) if k is not key]
+        for lst in [self.names, self.keys, self._shapes, self._centers,
+                    self._halfs, self._matrices, self._static]:
+            lst[:] = [lst[i] for i in keep]
+        self._valid = False
+
+
+    def setMatrix(self, index, matrix):
+        """ Update the transform matrix of an AOI. Updating dynamic AOIs
+        is cheap, updating static AOIs causes a BVH rebuild on next use.
+
+        Args:
+            index (int): AOI index
+            matrix: 4x4 transform matrix or list of 16 values
+        """
+        m = np.asarray(matrix, dtype=float).reshape(4, 4)
+        self._matrices[index] = m
+        if self._static[index]:
+            self._valid = False
+        elif self._valid:
+            self._inv[index] = np.linalg.inv(m)
+
+
+    @property
+    def dynamic(self):
+        """ List of indices of dynamic AOIs """
+        return [i for i, s in enumerate(self._static) if not s]
+
+
+    def worldCenters(self):
+        """ Return (N, 3) array of AOI shape centers in world coordinates """
+        c = np.array(self._centers, dtype=float).reshape(-1, 3)
+        m = np.array(self._matrices, dtype=float).reshape(-1, 4, 4)
+        return np.einsum('ni,nij->nj', c, m[:, 0:3, 0:3]) + m[:, 3, 0:3]
+
+
+    def _build(self):
+        """ Convert AOI lists to arrays and build the BVH """
+        n = len(self.names)
+        self._shape_arr = np.array(self._shapes, dtype=int).reshape(n)
+        self._center_arr = np.array(self._centers, dtype=float).reshape(n, 3)
+        self._half_arr = np.array(self._halfs, dtype=float).reshape(n, 3)
+        self._inv = np.linalg.inv(np.array(self._matrices, dtype=float).reshape(n, 4, 4))
+        self._dyn_idx = np.array(self.dynamic, dtype=int)
+
+        # World space bounding boxes from transformed local box corners
+        corners = np.array([[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=float)
+        local = self._center_arr[:, np.newaxis, :] + corners[np.newaxis, :, :] * self._half_arr[:, np.newaxis, :]
+        mats = np.array(self._matrices, dtype=float).reshape(n, 4, 4)
+        world = np.einsum('nki,nij->nkj', local, mats[:, 0:3, 0:3]) + mats[:, np.newaxis, 3, 0:3]
+        self._bmin = world.min(axis=1) if n > 0 else np.zeros((0, 3))
+        self._bmax = world.max(axis=1) if n > 0 else np.zeros((0, 3))
+
+        # BVH as flat node arrays; leaves reference a range of self._order
+        static_idx = np.array([i for i, s in enumerate(self._static) if s], dtype=int)
+        self._order = []
+        nodes = []
+        if len(static_idx) > 0:
+            self._buildNode(static_idx, nodes)
+        self._node_min = np.array([nd[0] for nd in nodes], dtype=float).reshape(-1, 3)
+        self._node_max = np.array([nd[1] for nd in nodes], dtype=float).reshape(-1, 3)
+        self._node_children = np.array([nd[2] for nd in nodes], dtype=int).reshape(-1, 2)
+        self._node_range = np.array([nd[3] for nd in nodes], dtype=int).reshape(-1, 2)
+        self._order = np.array(self._order, dtype=int)
+        self._valid = True
+
+
+    def _buildNode(self, idx, nodes):
+        """ Recursively add BVH nodes for the given AOI indices (median split
+        along the longest axis of AOI centers). Returns the node number. """
+        nid = len(nodes)
+        bmin = self._bmin[idx].min(axis=0)
+        bmax = self._bmax[idx].max(axis=0)
+        nodes.append(None)
+
+        if len(idx) <= self.leaf_size:
+            nodes[nid] = (bmin, bmax, (-1, -1), (len(self._order), len(self._order) + len(idx)))
+            self._order.extend(idx.tolist())
+            return nid
+
+        mid = (self._bmin[idx] + self._bmax[idx]) / 2.0
+        axis = np.argmax(mid.max(axis=0) - mid.min(axis=0))
+        split = np.argsort(mid[:, axis], kind='mergesort')
+        half = len(idx) // 2
+        left = self._buildNode(idx[split[:half]], nodes)
+        right = self._buildNode(idx[split[half:]], nodes)
+        nodes[nid] = (bmin, bmax, (left, right), (0, 0))
+        return nid
+
+
+    def _candidates(self, origin, direction, max_dist):
+        """ Return indices of AOIs whose BVH leaves are hit by a single ray.
+        The tree is traversed breadth-first, testing all nodes of one
+        level in a single vectorized step. """
+        found = [self._dyn_idx]
+        if len(self._node_min) == 0:
+            return np.concatenate(found)
+
+        with np.errstate(divide='ignore'):
+            inv = 1.0 / direction
+        frontier = np.array([0], dtype=int)
+        while len(frontier) > 0:
+            # Slab test against node bounds, fmin/fmax skip NaNs of parallel rays
+            with np.errstate(invalid='ignore'):
+                lo = (self._node_min[frontier] - origin) * inv
+                hi = (self._node_max[frontier] - origin) * inv
+            tn = np.fmin(lo, hi).max(axis=1)
+            tf = np.fmax(lo, hi).min(axis=1)
+            frontier = frontier[(tf >= np.maximum(tn, 0.0)) & (tn <= max_dist)]
+            if len(frontier) == 0:
+                break
+
+            children = self._node_children[frontier]
+            leaf = children[:, 0] < 0
+            for (start, end) in self._node_range[frontier[leaf]]:
+                found.append(self._order[start:end])
+            frontier = children[~leaf].ravel()
+        return np.concatenate(found)
+
+
+    def _hit(self, o, d, idx):
+        """ Exact shape tests of rays against AOIs. Rays are transformed into
+        each AOI's local coordinate system, one component at a time.
+
+        Args:
+            o, d: (R, 3) arrays of world space ray origins and unit directions
+            idx: (M,) array of AOI indices
+
+        Returns: tuple of (hit, distance) arrays, shape (R, M)
+        """
+        oh = np.concatenate([o, np.ones((len(o), 1))], axis=1)
+        hit = np.zeros((len(o), len(idx)), dtype=bool)
+        dist = np.full((len(o), len(idx)), np.inf)
+
+        sph = self._shape_arr[idx] == AOI_SPHERE
+        for mask in [sph, ~sph]:
+            if not mask.any():
+                continue
+            sub = idx[mask]
+            inv = self._inv[sub]
+            ol = [oh.dot(inv[:, :, j].T) for j in range(0, 3)]
+            dl = [d.dot(inv[:, 0:3, j].T) for j in range(0, 3)]
+            if mask is sph:
+                (h, t) = _raySphere(ol, dl, self._center_arr[sub], self._half_arr[sub, 0])
+            else:
+                (h, t) = _rayBox(ol, dl, self._center_arr[sub], self._half_arr[sub])
+            hit[:, mask] = h
+            dist[:, mask] = np.where(h, t, np.inf)
+        return (hit, dist)
+
+
+    def raycast(self, origin, direction, max_dist=np.inf):
+        """ Find the nearest AOI hit by a single ray, using the BVH
+
+        Args:
+            origin (3-tuple): Ray origin in world coordinates
+            direction (3-tuple): Ray direction
+            max_dist (float): Ignore hits further away than this
+
+        Returns: tuple of (AOI index, distance, hit point), or None if no AOI was hit
+        """
+        if not self._valid:
+            self._build()
+        o = np.asarray(origin, dtype=float).reshape(1, 3)
+        d = np.asarray(direction, dtype=float).reshape(1, 3)
+        d = d / np.linalg.norm(d)
+
+        idx = self._candidates(o[0], d[0], max_dist)
+        if len(idx) == 0:
+            return None
+        (hit, dist) = self._hit(o, d, idx)
+        best = np.argmin(dist[0])
+        if not hit[0, best] or dist[0, best] > max_dist:
+            return None
+        t = float(dist[0, best])
+        return (int(idx[best]), t, (o[0] + t * d[0]).tolist())
+
+
+    def intersect(self, origins, directions, max_dist=np.inf, chunk_size=250000):
+        """ Find the nearest AOI hit by each of a batch of rays. Rays are
+        tested against all AOIs in chunks of at most chunk_size ray-AOI pairs.
+
+        Args:
+            origins: (N, 3) array of ray origins in world coordinates
+            directions: (N, 3) array of ray directions
+            max_dist (float): Ignore hits further away than this
+            chunk_size (int): Maximum number of ray-AOI tests per chunk
+
+        Returns: tuple of (AOI index, distance) arrays, index is -1 and
+            distance is NaN where no AOI was hit
+        """
+        if not self._valid:
+            self._build()
+        o = np.asarray(origins, dtype=float).reshape(-1, 3)
+        d = np.asarray(directions, dtype=float).reshape(-1, 3)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            d = d / np.linalg.norm(d, axis=1, keepdims=True)
+
+        index = np.full(len(o), -1, dtype=int)
+        distance = np.full(len(o), np.nan)
+        if len(self) == 0:
+            return (index, distance)
+
+        idx = np.arange(len(self))
+        step = max(1, int(chunk_size // len(self)))
+        for start in range(0, len(o), step):
+            sl = slice(start, start + step)
+            (hit, dist) = self._hit(o[sl], d[sl], idx)
+            best = np.argmin(dist, axis=1)
+            bdist = dist[np.arange(len(best)), best]
+            valid = np.isfinite(bdist) & (bdist <= max_dist)
+            index[sl] = np.where(valid, best, -1)
+            distance[sl] = np.where(valid, bdist, np.nan)
+        return (index, distance)
+
+
+
+
+def sceneAOIs(scene):
+    """ Create an AOISet from a scene description, i.e. a list of object dicts
+    with keys 'type' ('cube', 'box' or 'sphere'), 'size' (edge length or 
+    diameter in m) and 'x', 'y', 'z' (center position), as stored in the 
+    'scene' metadata by buildRandomScene() in gaze_evaluation.py. An optional
+    'name' key is used as AOI name, otherwise objects are named by type and index.
+
+    Objects can also be of type 'plane' (size as width, height along the two
+    axes other than the 'axis' key, default 'y'), and can be rotated by
+    optional 'yaw', 'pitch' and 'roll' keys (degrees).
+
+    Args:
+        scene: List of scene object dicts
+
+    Returns: AOISet object
+    """
+    aois = AOISet()
+    for i, obj in enumerate(scene):
+        name = obj.get('name', '{:s}{:d}'.format(obj['type'], i))
+        euler = [obj.get(k, 0.0) for k in ['yaw', 'pitch', 'roll']]
+        if any(euler):
+            matrix = poseMatrix([obj['x'], obj['y'], obj['z']], euler)
+        else:
+            matrix = translationMatrix([obj['x'], obj['y'], obj['z']])
+        if obj['type'] in ['cube', 'box']:
+            size = obj['size']
+            if np.isscalar(size):
+                size = [size,] * 3
+            aois.add('box', size, matrix=matrix, name=name)
+        elif obj['type'] == 'sphere':
+            aois.add('sphere', obj['size'] / 2.0, matrix=matrix, name=name)
+        elif obj['type'] == 'plane':
+            aois.add('plane', obj['size'], matrix=matrix, axis=obj.get('axis', 'y'), name=name)
+        else:
+            raise ValueError('Unsupported scene object type: {:s}'.format(str(obj['type'])))
+    return aois
+
+
+def mapGazeToAOIs(samples, aois, prefix='gaze', max_dist=np.inf, angles=True, chunk_size=100000):
+    """ Map recorded gaze samples to AOIs offline. For each sample, computes the
+    nearest AOI hit by the gaze ray and its distance, and optionally the angular
+    distance between gaze direction and each AOI center.
+
+    Args:
+        samples: Recorded samples as pandas DataFrame or dict of columns (e.g., 
+            from transposeSamples()), with <prefix>_posX/Y/Z gaze origin and 
+            <prefix>_dirX/Y (yaw, pitch) gaze direction fields
+        aois: AOISet object (see also sceneAOIs())
+        prefix (str): Gaze field prefix, e.g. 'gazeL' for left eye data
+        max_dist (float): Ignore hits further away than this (in m)
+        angles (bool): if True, include angular distance to each AOI
+        chunk_size (int): Number of samples to process at once
+
+    Returns: dict of columns, or DataFrame if samples was a DataFrame:
+        - aoi_index: index of the AOI hit, -1 if none
+        - aoi_name: name of the AOI hit, '' if none
+        - aoi_dist: distance from gaze origin to hit point, NaN if none
+        - aoi_angle_<name>: angle between gaze and AOI center in degrees
+    """
+    cols = [np.asarray(samples['{:s}_{:s}'.format(prefix, f)], dtype=float) 
+            for f in ['posX', 'posY', 'posZ', 'dirX', 'dirY']]
+    n = len(cols[0])
+    names = np.array(list(aois.names) + ['',], dtype=object)
+    centers = aois.worldCenters()
+
+    out = {'aoi_index': np.full(n, -1, dtype=int),
+           'aoi_dist': np.full(n, np.nan)}
+    if angles:
+        ang = np.full((n, len(aois)), np.nan)
+
+    for start in range(0, n, chunk_size):
+        sl = slice(start, start + chunk_size)
+        data = np.stack([c[sl] for c in cols], axis=1)
+        valid = np.all(np.isfinite(data) & (data != MISSING_VALUE), axis=1)
+        if not valid.any():
+            continue
+        ori = data[valid, 0:3]
+        vec = eulerVector(data[valid, 3], data[valid, 4])
+
+        (idx, dist) = aois.intersect(ori, vec, max_dist=max_dist)
+        out['aoi_index'][sl][valid] = idx
+        out['aoi_dist'][sl][valid] = dist
+        if angles:
+            # Angle between gaze and eye-AOI vectors, computed per component
+            oc = [centers[np.newaxis, :, j] - ori[:, j:j+1] for j in range(0, 3)]
+            dot = oc[0] * vec[:, 0:1] + oc[1] * vec[:, 1:2] + oc[2] * vec[:, 2:3]
+            norm = np.sqrt(oc[0] * oc[0] + oc[1] * oc[1] + oc[2] * oc[2])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                ang[sl][valid] = np.degrees(np.arccos(np.clip(dot / norm, -1.0, 1.0)))
+
+    out['aoi_name'] = names[out['aoi_index']]
+    ang_cols = []
+    if angles:
+        ang_cols = ['aoi_angle_{:s}'.format(name) for name in aois.names]
+
+    if _HAS_SCI_PKGS and isinstance(samples, pd.DataFrame):
+        # Keep angles as a single 2D block, much faster than separate columns
+        res = pd.DataFrame(out, index=samples.index)
+        if angles:
+            res = pd.concat([res, pd.DataFrame(ang, columns=ang_cols, index=samples.index)], axis=1)
+        return res
+
+    for (k, col) in enumerate(ang_cols):
+        out[col] = ang[:, k]
+    return out
+
+
+def reprojectGaze(samples, scene, prefix='gaze', max_dist=np.inf, chunk_size=100000):
+    """ Recompute 3D gaze points of recorded samples against a (new) scene
+    offline, without Vizard. Gaze rays are intersected with all scene objects 
+    in vectorized chunks, so that recordings process far faster than real time.
+
+    Args:
+        samples: Recorded samples as pandas DataFrame or dict of columns, with
+            <prefix>_posX/Y/Z gaze origin and <prefix>_dirX/Y gaze direction fields
+        scene: AOISet object, or scene description (list of object dicts, see sceneAOIs())
+        prefix (str): Gaze field prefix, e.g. 'gazeL' for left eye data
+        max_dist (float): Ignore hits further away than this (in m)
+        chunk_size (int): Number of samples to process at once
+
+    Returns: dict of columns, or DataFrame if samples was a DataFrame, with the 
+        same fields as recorded by SampleRecorder: gaze3d_valid, gaze3d_posX/Y/Z 
+        (MISSING_VALUE if no object was hit), gaze3d_object_id (AOI index, -1 if
+        none) and gaze3d_object_name
+    """
+    aois = scene
+    if not isinstance(scene, AOISet):
+        aois = sceneAOIs(scene)
+    cols = [np.asarray(samples['{:s}_{:s}'.format(prefix, f)], dtype=float) 
+            for f in ['posX', 'posY', 'posZ', 'dirX', 'dirY']]
+    n = len(cols[0])
+    names = np.array(list(aois.names) + ['',], dtype=object)
+
+    pos = np.full((n, 3), MISSING_VALUE)
+    index = np.full(n, -1, dtype=int)
+    for start in range(0, n, chunk_size):
+        data = np.stack([c[start:start + chunk_size] for c in cols], axis=1)
+        valid = np.flatnonzero(np.all(np.isfinite(data) & (data != MISSING_VALUE), axis=1))
+        if len(valid) == 0:
+            continue
+        ori = data[valid, 0:3]
+        vec = eulerVector(data[valid, 3], data[valid, 4])
+
+        (idx, dist) = aois.intersect(ori, vec, max_dist=max_dist)
+        hit = idx >= 0
+        rows = start + valid[hit]
+        index[rows] = idx[hit]
+        pos[rows] = ori[hit] + dist[hit, np.newaxis] * vec[hit]
+
+    out = {'gaze3d_valid': (index >= 0).astype(int),
+           'gaze3d_posX': pos[:, 0], 'gaze3d_posY': pos[:, 1], 'gaze3d_posZ': pos[:, 2],
+           'gaze3d_object_id': index,
+           'gaze3d_object_name': names[index]}
+    if _HAS_SCI_PKGS and isinstance(samples, pd.DataFrame):
+        return pd.DataFrame(out, index=samples.index)
+    return out
+
+
+if _HAS_SCI_PKGS:
+    def reprojectGazeFile(sample_file, scene, out_file, sep='\t', chunk_rows=500000, **kwargs):
+        """ Recompute 3D gaze points of a saved recording file against a (new) scene,
+        reading and writing the file in chunks (see reprojectGaze()). Existing
+        gaze3d_* columns are replaced, all other columns are kept.
+
+        Args:
+            sample_file (str): Sample file written by SampleRecorder.saveRecording()
+            scene: AOISet object, or scene description (see sceneAOIs())
+            out_file (str): Output file name
+            sep (str): Field separator in sample and output files
+            chunk_rows (int): Number of rows to read at once
+            **kwargs: Passed on to reprojectGaze()
+
+        Returns: Number of rows written to out_file
+        """
+        aois = scene
+        if not isinstance(scene, AOISet):
+            aois = sceneAOIs(scene)
+        rows = 0
+        for chunk in pd.read_csv(sample_file, sep=sep, chunksize=chunk_rows):
+            res = reprojectGaze(chunk, aois, **kwargs)
+            for col in res.columns:
+                chunk[col] = res[col].values
+            chunk.to_csv(out_file, sep=sep, index=False, header=(rows == 0), 
+                         mode='w' if rows == 0 else 'a')
+            rows += len(chunk)
+        return rows
+
+
+    def mapGazeFileToAOIs(sample_file, aois, out_file=None, sep='\t', chunk_rows=500000, **kwargs):
+        """ Map gaze samples in a saved recording file to AOIs, reading the file
+        in chunks so that recordings larger than memory can be processed.
+        See mapGazeToAOIs() for the computed columns.
+
+        Args:
+            sample_file (str): Sample file written by SampleRecorder.saveRecording()
+            aois: AOISet object (see also sceneAOIs())
+            out_file (str): if set, write all sample columns plus AOI columns to 
+                this file, chunk by chunk. Otherwise return the AOI columns.
+            sep (str): Field separator in sample and output files
+            chunk_rows (int): Number of rows to read at once
+            **kwargs: Passed on to mapGazeToAOIs()
+
+        Returns: DataFrame of time and AOI columns, or number of rows written to out_file
+        """
+        results = []
+        rows = 0
+        header = True
+        for chunk in pd.read_csv(sample_file, sep=sep, chunksize=chunk_rows):
+            res = mapGazeToAOIs(chunk, aois, **kwargs)
+            if out_file is not None:
+                pd.concat([chunk, res], axis=1).to_csv(out_file, sep=sep, index=False, 
+                                                       header=header, mode='w' if header else 'a')
+                header = False
+            else:
+                res.insert(0, 'time', chunk['time'].values)
+                results.append(res)
+            rows += len(chunk)
+
+        if out_file is not None:
+            return rows
+        if len(results) == 0:
+            return pd.DataFrame()
+        return pd.concat(results, ignore_index=True)
+
+
+if __name__ == '__main__':
+    """ If module is called directly, benchmark hit testing on a random scene """
+    import time
+
+    rng = np.random.default_rng(0)
+    n_aoi = 1000
+    aois = AOISet()
+    for i in range(n_aoi):
+        pos = rng.uniform([-20, 0, -20], [20, 4, 20])
+        shape = ['sphere', 'box', 'plane'][i % 3]
+        size = {'sphere': rng.uniform(0.1, 0.5),
+                'box': rng.uniform(0.1, 1.0, 3),
+                'plane': rng.uniform(0.2, 1.0, 2)}[shape]
+        aois.add(shape, size, matrix=translationMatrix(pos), axis='z', name='aoi{:d}'.format(i))
+
+    t0 = time.perf_counter()
+    aois.raycast([0, 1.7, 0], [0, 0, 1])
+    print('BVH build: {:.2f} ms'.format((time.perf_counter() - t0) * 1000.0))
+
+    n_rays = 2000
+    ori = np.tile([0.0, 1.7, 0.0], (n_rays, 1))
+    dirs = rng.normal(size=(n_rays, 3))
+    t0 = time.perf_counter()
+    for k in range(n_rays):
+        aois.raycast(ori[k], dirs[k])
+    dt = (time.perf_counter() - t0) * 1000.0 / n_rays
+    print('Single ray (BVH), {:d} AOIs: {:.3f} ms per ray'.format(n_aoi, dt))
+
+    t0 = time.perf_counter()
+    (idx, dist) = aois.intersect(ori, dirs)
+    dt = (time.perf_counter() - t0) * 1000.0
+    print('Batch of {:d} rays, {:d} AOIs: {:.1f} ms ({:d} hits)'.format(n_rays, n_aoi, dt, int(np.sum(idx >= 0))))
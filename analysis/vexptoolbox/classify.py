@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+
+# vexptoolbox: Vizard Toolbox for Behavioral Experiments
+# Offline classification of recorded gaze samples into fixations, saccades,
+# blinks and tracking loss. All steps operate on whole columns at once
+# (velocity via diffs, hysteresis and gap merging via run-length encoding).
+
+import numpy as np
+
+from .data import MISSING_VALUE, _HAS_SCI_PKGS
+
+if _HAS_SCI_PKGS:
+    import pandas as pd
+
+GAZE_OTHER = 0
+GAZE_FIXATION = 1
+GAZE_SACCADE = 2
+GAZE_BLINK = 3
+GAZE_LOST = 4
+
+GAZE_EVENT_NAMES = ['other', 'fixation', 'saccade', 'blink', 'lost']
+
+
+def runLengths(x):
+    """ Run-length encoding of a 1D array
+
+    Args:
+        x: 1D array
+
+    Returns: tuple of (starts, lengths, values) arrays
+    """
+    x = np.asarray(x)
+    n = len(x)
+    if n == 0:
+        return (np.zeros(0, dtype=int), np.zeros(0, dtype=int), x[:0])
+    starts = np.concatenate(([0], np.flatnonzero(x[1:] != x[:-1]) + 1))
+    lengths = np.diff(np.append(starts, n))
+    return (starts, lengths, x[starts])
+
+
+def _column(samples, field):
+    """ Return a sample column as float array, or None if not present """
+    if field not in samples:
+        return None
+    return np.asarray(samples[field], dtype=float)
+
+
+def _missing(x):
+    return ~np.isfinite(x) | (x == MISSING_VALUE)
+
+
+def _runCentroids(vec, starts, ends):
+    """ Unit mean vectors of runs of samples, given as component arrays
+
+    Args:
+        vec: list of X, Y, Z component arrays
+        starts: Start indices of runs
+        ends: End indices of runs (exclusive)
+    """
+    sums = []
+    for v in vec:
+        cs = np.concatenate(([0.0], np.cumsum(v)))
+        sums.append(cs[ends] - cs[starts])
+    norm = np.sqrt(sums[0] * sums[0] + sums[1] * sums[1] + sums[2] * sums[2])
+    norm[norm == 0] = 1.0
+    return [x / norm for x in sums]
+
+
+def classifyGaze(samples, prefix='gaze', eye='', velocity=30.0, velocity_low=None,
+                 min_fixation=60.0, max_gap=75.0, merge_angle=0.5, max_blink=500.0,
+                 eye_open=0.1):
+    """ Label every gaze sample as fixation, saccade, blink, tracking loss or
+    other (e.g., fixations shorter than min_fixation), and compute an event table.
+
+    Saccades are detected by a velocity threshold with hysteresis: runs of samples
+    above velocity_low that reach velocity somewhere are saccades. Fixations
+    separated by short interruptions (up to max_gap ms, e.g. dropped samples or
+    small noise peaks) are merged if their centroids are less than merge_angle
+    apart. Missing data with closed eyes (eye_state column) or, if eye openness
+    is not recorded, between max_gap and max_blink ms long, is labeled a blink.
+
+    Args:
+        samples: Recorded samples as pandas DataFrame or dict of columns (e.g.,
+            from transposeSamples()), with 'time' and either <prefix><eye>_dirX/Y
+            (yaw, pitch) or <prefix><eye>_X/Y/Z (unit vector) gaze direction fields.
+            Optional 'eye_state<eye>' and 'pupil_size<eye>' columns are used
+            to detect blinks and invalid samples.
+        prefix (str): Gaze field prefix, e.g. 'tracker' for eye-in-head or
+            'trackVec' for validation samples
+        eye (str): '' for combined gaze, 'L' or 'R' for monocular data
+        velocity (float): Saccade velocity threshold in degrees/s
+        velocity_low (float): Saccade offset threshold, default: 0.6 * velocity
+        min_fixation (float): Minimum fixation duration in ms
+        max_gap (float): Maximum duration of interruptions between merged fixations (ms)
+        merge_angle (float): Maximum angle between merged fixations (degrees)
+        max_blink (float): Maximum blink duration (ms) if eye openness is unavailable
+        eye_open (float): Eye openness below which the eye is considered closed
+
+    Returns: tuple of (labels, events):
+        - labels: array of GAZE_* codes, one per sample
+        - events: dict of columns, or DataFrame if samples was a DataFrame, with
+            event, label, start_index, end_index (exclusive), start, end, duration (ms),
+            x, y (centroid yaw and pitch, fixations only), amplitude (degrees) and
+            peak_velocity (degrees/s, saccades only)
+    """
+    if velocity_low is None:
+        velocity_low = 0.6 * velocity
+    t = np.asarray(samples['time'], dtype=float)
+    n = len(t)
+
+    # Gaze direction vectors (kept as separate components for speed) and validity
+    dx = _column(samples, '{:s}{:s}_dirX'.format(prefix, eye))
+    if dx is not None:
+        dy = _column(samples, '{:s}{:s}_dirY'.format(prefix, eye))
+        invalid = _missing(dx) | _missing(dy)
+        yaw = np.radians(np.where(invalid, 0.0, dx))
+        pitch = np.radians(np.where(invalid, 0.0, dy))
+        cp = np.cos(pitch)
+        vec = [np.sin(yaw) * cp, -np.sin(pitch), np.cos(yaw) * cp]
+    else:
+        vec = [_column(samples, '{:s}{:s}_{:s}'.format(prefix, eye, ax)) for ax in 'XYZ']
+        invalid = _missing(vec[0]) | _missing(vec[1]) | _missing(vec[2])
+        vec = [np.where(invalid, 0.0, v) for v in vec]
+        norm = np.sqrt(vec[0] * vec[0] + vec[1] * vec[1] + vec[2] * vec[2])
+        norm[invalid] = 1.0
+        vec = [v / norm for v in vec]
+
+    closed = np.zeros(n, dtype=bool)
+    state = _column(samples, 'eye_state{:s}'.format(eye))
+    has_state = state is not None
+    if has_state:
+        closed = ~_missing(state) & (state < eye_open)
+        invalid |= closed
+    pupil = _column(samples, 'pupil_size{:s}'.format(eye))
+    if pupil is not None:
+        invalid |= ~_missing(pupil) & (pupil <= 0)
+    # Invalid samples have zero-length vectors, so they do not add to centroids
+    for v in vec:
+        v[invalid] = 0.0
+
+    # Angular velocity between consecutive samples, assigned to the later sample
+    vel = np.full(n, np.nan)
+    if n > 1:
+        dot = vec[0][1:] * vec[0][:-1] + vec[1][1:] * vec[1][:-1] + vec[2][1:] * vec[2][:-1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            vel[1:] = np.degrees(np.arccos(np.clip(dot, -1.0, 1.0))) / (np.diff(t) / 1000.0)
+        vel[1:][invalid[1:] | invalid[:-1]] = np.nan
+        vel[0] = vel[1]
+
+    # Hysteresis: runs above the low threshold that contain a high-velocity sample
+    with np.errstate(invalid='ignore'):
+        above = vel >= velocity_low
+        peak = vel >= velocity
+    (starts, lengths, values) = runLengths(above)
+    is_sac = values & (np.add.reduceat(peak, starts) > 0) if n > 0 else values
+    saccade = np.repeat(is_sac, lengths)
+
+    labels = np.full(n, GAZE_FIXATION, dtype=np.int8)
+    labels[saccade] = GAZE_SACCADE
+    labels[invalid] = GAZE_LOST
+
+    # Sample end times: onset of the next sample (last sample: median interval)
+    t_end = np.empty(n)
+    if n > 0:
+        t_end[:-1] = t[1:]
+        t_end[-1] = t[-1] + (np.median(np.diff(t)) if n > 1 else 0.0)
+
+    # Missing data runs: blinks if eyes were closed or short enough
+    (starts, lengths, values) = runLengths(labels)
+    ends = starts + lengths
+    dur = t_end[ends - 1] - t[starts]
+    lost = values == GAZE_LOST
+    if has_state:
+        blink = lost & (np.add.reduceat(closed, starts) > 0)
+    else:
+        blink = lost & (dur > max_gap) & (dur <= max_blink)
+    values[blink] = GAZE_BLINK
+
+    # Merge fixations separated by short interruptions (not blinks)
+    fix = np.flatnonzero(values == GAZE_FIXATION)
+    if len(fix) > 1:
+        cen = _runCentroids(vec, starts[fix], ends[fix])
+        (a, b) = (fix[:-1], fix[1:])
+        gap = t[starts[b]] - t_end[ends[a] - 1]
+        dot = cen[0][:-1] * cen[0][1:] + cen[1][:-1] * cen[1][1:] + cen[2][:-1] * cen[2][1:]
+        ang = np.degrees(np.arccos(np.clip(dot, -1.0, 1.0)))
+        between = np.cumsum(values == GAZE_BLINK)
+        merge = (gap <= max_gap) & (ang <= merge_angle) & (between[b] == between[a])
+        # Relabel all runs between merged fixations
+        fill = np.zeros(len(values) + 1, dtype=int)
+        np.add.at(fill, a[merge] + 1, 1)
+        np.add.at(fill, b[merge], -1)
+        values[np.cumsum(fill)[:-1] > 0] = GAZE_FIXATION
+
+    # Recompute runs after merging, discard short fixations
+    labels = np.repeat(values, lengths)
+    (starts, lengths, values) = runLengths(labels)
+    ends = starts + lengths
+    dur = t_end[ends - 1] - t[starts]
+    values[(values == GAZE_FIXATION) & (dur < min_fixation)] = GAZE_OTHER
+    labels = np.repeat(values, lengths)
+
+    # Merge runs that became adjacent, then compute event properties
+    (starts, lengths, values) = runLengths(labels)
+    ends = starts + lengths
+    ne = len(starts)
+    events = {'event': np.array(GAZE_EVENT_NAMES, dtype=object)[values],
+              'label': values,
+              'start_index': starts,
+              'end_index': ends,
+              'start': t[starts] if ne > 0 else np.zeros(0),
+              'end': t_end[ends - 1] if ne > 0 else np.zeros(0),
+              'x': np.full(ne, np.nan),
+              'y': np.full(ne, np.nan),
+              'amplitude': np.full(ne, np.nan),
+              'peak_velocity': np.full(ne, np.nan)}
+    events['duration'] = events['end'] - events['start']
+
+    if ne > 0:
+        isfix = values == GAZE_FIXATION
+        if isfix.any():
+            cen = _runCentroids(vec, starts[isfix], ends[isfix])
+            events['x'][isfix] = np.degrees(np.arctan2(cen[0], cen[2]))
+            events['y'][isfix] = np.degrees(np.arcsin(np.clip(-cen[1], -1.0, 1.0)))
+        issac = values == GAZE_SACCADE
+        if issac.any():
+            (s0, s1) = (starts[issac], ends[issac] - 1)
+            # Amplitude from the last sample before to the last sample of the saccade
+            s0 = np.maximum(s0 - 1, 0)
+            dot = vec[0][s0] * vec[0][s1] + vec[1][s0] * vec[1][s1] + vec[2][s0] * vec[2][s1]
+            events['amplitude'][issac] = np.degrees(np.arccos(np.clip(dot, -1.0, 1.0)))
+            events['peak_velocity'][issac] = np.fmax.reduceat(vel, starts)[issac]
+
+    cols = ['event', 'label', 'start_index', 'end_index', 'start', 'end', 'duration',
+            'x', 'y', 'amplitude', 'peak_velocity']
+    if _HAS_SCI_PKGS and isinstance(samples, pd.DataFrame):
+        return (labels, pd.DataFrame(events, columns=cols))
+    return (labels, events)
+
+
+if __name__ == '__main__':
+    """ If module is called directly, benchmark classification of simulated data """
+    import time
+
+    rng = np.random.default_rng(0)
+    n = 2000000
+    t = np.arange(n) * (1000.0 / 90.0)
+    # Fixations of random duration joined by 10 degree saccades
+    seg = np.cumsum(rng.integers(10, 60, size=n // 10))
+    fix_id = np.searchsorted(seg, np.arange(n), side='right')
+    yaw = (fix_id % 5) * 10.0 - 20.0 + rng.normal(0, 0.1, n)
+    pitch = rng.normal(0, 0.1, n)
+    blinks = rng.integers(0, n - 20, size=n // 500)
+    for k in range(0, 15):
+        yaw[blinks + k] = MISSING_VALUE
+    samples = {'time': t, 'gaze_dirX': yaw, 'gaze_dirY': pitch}
+
+    t0 = time.perf_counter()
+    (labels, events) = classifyGaze(samples)
+    dt = time.perf_counter() - t0
+    print('{:d} samples: {:.2f} s ({:.1f} M samples/s), {:d} events'.format(n, dt, n / dt / 1e6, len(events['event'])))
+    for (c, name) in enumerate(GAZE_EVENT_NAMES):
+        print('{:s}: {:d}'.format(name, int(np.sum(events['label'] == c))))
@@ -3,12 +3,26 @@
 # vexptoolbox: Vizard Toolbox for Behavioral Experiments
 # Data structures and classes that do not depend on Vizard
 
+import csv
 import json
+import re
 import copy
+import math
+import array
 import pickle
+import itertools
 
 from .stats import *
 
+try:
+    # NumPy on its own is enough for typed column output of recordings
+    import numpy as np
+    from .geometry import gazeTargetErrors
+    _HAS_NUMPY = True
+
+except ImportError:
+    _HAS_NUMPY = False
+
 try:
     # Some functionality such as plotting is only available when a scientific 
     # Python stack is installed, which by default is not the case in Vizard.
@@ -168,6 +182,524 @@ VAL_TAR_SQ15 = [[0.0,  0.0,   6.0],
 
 MISSING_VALUE = -99999.0
 
+_TARGET_LAYOUTS = {}
+
+
+def targetLayout(targets):
+    """ Compute head-relative (HMD space) positions of validation targets,
+    i.e. the point where the line of sight at the given horizontal and 
+    vertical angle crosses a fronto-parallel plane at target depth.
+    Results are cached per target set.
+
+    Args:
+        targets: List of targets (x, y, depth), x/y in visual degrees, depth in m
+
+    Returns: list of (x, y, z) positions in meters
+    """
+    key = tuple(tuple(float(v) for v in tgt[0:3]) for tgt in targets)
+    if key not in _TARGET_LAYOUTS:
+        layout = []
+        for (x, y, d) in key:
+            xr = math.radians(x)
+            yr = math.radians(y)
+            layout.append((d * math.tan(xr), d * math.tan(yr) / math.cos(xr), d))
+        _TARGET_LAYOUTS[key] = layout
+    return list(_TARGET_LAYOUTS[key])
+
+
+def transposeSamples(samples, count=None, fields=None, missing=None, output='dict'):
+    """ Transpose a list of sample dicts into a dict of columns, one entry 
+    per data field. Fields missing from individual samples are filled with 
+    the missing value, so all columns have the same length.
+
+    Args:
+        samples: List of sample (or event) dicts
+        count (int): Number of samples to use from the start of the list 
+            (e.g., the filled part of a preallocated list), default: all
+        fields (list): Fields to always include, even if no sample contains them
+        missing: Value to use for fields not present in a sample
+        output (str): Column type to return:
+            - 'dict': dict of lists (default, works without NumPy)
+            - 'numpy': dict of NumPy arrays. Numeric columns with missing
+              data are returned as float arrays with NaN for missing values.
+            - 'pandas': pandas DataFrame
+
+    Returns: dict of columns sorted by field name, or DataFrame
+    """
+    if count is None:
+        count = len(samples)
+    else:
+        count = min(count, len(samples))
+
+    # Union of all fields, then fill preallocated columns in a single pass
+    if fields is None:
+        fields = set()
+    else:
+        fields = set(fields)
+    for s in itertools.islice(samples, count):
+        fields.update(s)
+    cols = {f: [missing] * count for f in fields}
+    for idx, s in enumerate(itertools.islice(samples, count)):
+        for key, value in s.items():
+            cols[key][idx] = value
+    cols = {f: cols[f] for f in sorted(fields)}
+
+    if output == 'dict':
+        return cols
+    elif output not in ['numpy', 'pandas']:
+        raise ValueError('Unknown output type: {:s}'.format(str(output)))
+
+    if not _HAS_NUMPY:
+        raise RuntimeError('output="{:s}" requires NumPy to be installed!'.format(output))
+    arrays = {}
+    for f, col in cols.items():
+        arr = np.array(col)
+        if arr.dtype == object:
+            # Numeric column with missing entries: mark as NaN
+            try:
+                arr = np.array(col, dtype=float)
+            except (TypeError, ValueError):
+                pass
+        arrays[f] = arr
+
+    if output == 'pandas':
+        if not _HAS_SCI_PKGS:
+            raise RuntimeError('output="pandas" requires pandas and matplotlib to be installed!')
+        return pd.DataFrame(arrays)
+    return arrays
+
+
+# Column types used by loadSampleFile()
+_COL_INT = 0
+_COL_FLOAT = 1
+_COL_STR = 2
+
+try:
+    array.array('q')
+    _INT_TYPECODE = 'q'
+except ValueError:
+    _INT_TYPECODE = 'l'
+
+
+def _parseValue(data):
+    """ Convert a text value to int or float if possible """
+    try:
+        return int(data)
+    except ValueError:
+        try:
+            return float(data)
+        except ValueError:
+            return data
+
+
+def _cellType(data):
+    """ Column type needed to store a text value (empty cells are missing numbers) """
+    if data == '':
+        return _COL_FLOAT
+    value = _parseValue(data)
+    if isinstance(value, float):
+        return _COL_FLOAT
+    elif isinstance(value, str):
+        return _COL_STR
+    return _COL_INT
+
+
+def _parseColumn(values, kind, strings):
+    """ Convert a column of text values to the given column type, or to the
+    next more general type if that fails. String values are interned using
+    the strings dict, so repeated values are only stored once. 
+
+    Returns: tuple of (value list, column type)
+    """
+    if kind == _COL_INT:
+        try:
+            return ([int(v) for v in values], kind)
+        except ValueError:
+            kind = _COL_FLOAT
+    if kind == _COL_FLOAT:
+        try:
+            return ([float(v) if v != '' else float('nan') for v in values], kind)
+        except ValueError:
+            kind = _COL_STR
+    values = [_parseValue(v) for v in values]
+    return ([strings.setdefault(v, v) if type(v) == str else v for v in values], kind)
+
+
+def _readColumns(sample_file, fields, kinds, indices, sep='\t', chunk_rows=50000):
+    """ Read the given columns of a delimited text file in chunks of rows and 
+    store them as typed arrays (int and float columns) or lists (strings).
+
+    Returns: dict of columns
+    """
+    if len(indices) == 0:
+        return {}
+    parts = {fields[i]: [] for i in indices}
+    kinds = list(kinds)
+    strings = {}
+    with open(sample_file, 'r') as sf:
+        reader = csv.reader(sf, delimiter=sep)
+        next(reader)
+        while True:
+            rows = list(itertools.islice(reader, chunk_rows))
+            if len(rows) == 0:
+                break
+            cols = list(zip(*rows))
+            for i in indices:
+                (values, kinds[i]) = _parseColumn(cols[i], kinds[i], strings)
+                if kinds[i] != _COL_STR:
+                    values = _typedArray(values, kinds[i])
+                parts[fields[i]].append(values)
+
+    # Chunks read before a column turned out to contain text were parsed as
+    # numbers, losing empty cells and the int / float distinction. Read these
+    # columns again as text, so every chunk is parsed the same way.
+    redo = [i for i in indices if kinds[i] == _COL_STR 
+            and any(type(chunk) != list for chunk in parts[fields[i]])]
+    if len(redo) > 0:
+        text = _readColumns(sample_file, fields, [_COL_STR] * len(fields), redo, 
+                            sep=sep, chunk_rows=chunk_rows)
+        for i in redo:
+            parts[fields[i]] = [list(text[fields[i]])]
+
+    columns = {}
+    for i in indices:
+        if kinds[i] == _COL_STR:
+            values = []
+            for chunk in parts[fields[i]]:
+                values.extend(chunk)
+            if _HAS_NUMPY:
+                col = np.empty(len(values), dtype=object)
+                col[:] = values
+                values = col
+        else:
+            # Earlier chunks may still hold int values in a float column
+            values = _typedArray([], kinds[i])
+            if _HAS_NUMPY:
+                values = np.concatenate([values] + parts[fields[i]]).astype(values.dtype)
+            else:
+                for chunk in parts[fields[i]]:
+                    values.extend(_typedArray(chunk, kinds[i]))
+        columns[fields[i]] = values
+    return columns
+
+
+def _typedArray(values, kind):
+    """ Store numeric values as NumPy array, or array.array without NumPy """
+    if _HAS_NUMPY:
+        return np.array(values, dtype=np.int64 if kind == _COL_INT else float)
+    return array.array(_INT_TYPECODE if kind == _COL_INT else 'd', values)
+
+
+def loadSampleFile(sample_file, sep='\t', infer_rows=1000):
+    """ Load a sample or event file written by SampleRecorder.saveRecording() 
+    as a dict of typed columns. Column types are inferred once from the first
+    rows, then each column is parsed in bulk:
+
+    - int and float columns become NumPy arrays (or array.array if NumPy is not
+      available). Empty cells in float columns are read as NaN.
+    - Text columns (e.g., gaze3d_object_name) become object arrays (or lists) 
+      of interned strings, so each distinct value is only stored once.
+      Columns with mixed content keep per-cell int/float/str values.
+
+    Args:
+        sample_file (str): File name of sample file
+        sep (str): Field separator in input file
+        infer_rows (int): Number of rows used to infer column types
+
+    Returns: dict of columns, in file column order
+    """
+    with open(sample_file, 'r') as sf:
+        reader = csv.reader(sf, delimiter=sep)
+        try:
+            fields = next(reader)
+        except StopIteration:
+            return {}
+        kinds = [_COL_INT] * len(fields)
+        filled = [False] * len(fields)
+        nrows = 0
+        for row in itertools.islice(reader, infer_rows):
+            for i, data in enumerate(row):
+                kinds[i] = max(kinds[i], _cellType(data))
+                filled[i] = filled[i] or data != ''
+            nrows += 1
+
+    indices = list(range(0, len(fields)))
+    columns = {}
+    if _HAS_NUMPY and nrows > 0:
+        # Parse columns with NumPy's C reader, one pass for numeric and one for
+        # text columns. Numeric parsing fails on empty cells or late text values,
+        # text parsing on NumPy versions without quote support. The slower 
+        # chunked reader below then handles the remaining columns.
+        # Columns that are empty in all inferred rows (e.g. gaze3d_object_name
+        # before the first hit) have unknown type and are left to the chunked reader.
+        num = [i for i in indices if kinds[i] != _COL_STR and filled[i]]
+        txt = [i for i in indices if kinds[i] == _COL_STR]
+        if len(num) > 0:
+            try:
+                data = np.loadtxt(sample_file, delimiter=sep, skiprows=1, usecols=num, 
+                                  dtype=float, ndmin=2, comments=None)
+                for (k, i) in enumerate(num):
+                    col = data[:, k]
+                    if kinds[i] == _COL_INT:
+                        col_int = col.astype(np.int64)
+                        if np.array_equal(col_int, col):
+                            col = col_int
+                    columns[fields[i]] = np.ascontiguousarray(col)
+            except ValueError:
+                pass
+        if len(txt) > 0:
+            try:
+                data = np.loadtxt(sample_file, delimiter=sep, skiprows=1, usecols=txt, 
+                                  dtype=str, ndmin=2, comments=None, quotechar='"')
+                for (k, i) in enumerate(txt):
+                    # Categorical storage: each distinct value is converted only once
+                    (cats, codes) = np.unique(data[:, k], return_inverse=True)
+                    values = np.empty(len(cats), dtype=object)
+                    values[:] = [_parseValue(str(c)) for c in cats]
+                    columns[fields[i]] = values[codes.ravel()]
+            except (TypeError, ValueError):
+                pass
+        indices = [i for i in indices if fields[i] not in columns]
+
+    columns.update(_readColumns(sample_file, fields, kinds, indices, sep=sep))
+    return {f: columns[f] for f in fields}
+
+
+# Field names and legacy message format of built-in structured events
+EVENT_FORMATS = {
+    'TRIAL_START': (('index',), '{:d}'),
+    'TRIAL_END': (('index',), '{:d}'),
+    'VAL_START': (('index', 'x', 'y', 'z'), '{:d} {:.1f} {:.1f} {:.1f}'),
+    'VAL_END': (('index', 'x', 'y', 'z'), '{:d} {:.1f} {:.1f} {:.1f}'),
+    'VAL_RESULT': (('acc', 'rmsi', 'sd'), '{:.2f} {:.2f} {:.2f}'),
+    'FIX_START': (('start', 'x', 'y'), '{:.1f} {:.2f} {:.2f}'),
+    'FIX_END': (('start', 'duration', 'x', 'y'), '{:.1f} {:.1f} {:.2f} {:.2f}'),
+}
+
+_EVENT_RESERVED = ['time', 'message', 'kind']
+
+# Legacy message string: kind, then whitespace and message text
+_EVENT_MESSAGE = re.compile(r'(\S+)(\s[\s\S]*)$')
+
+
+class EventBuffer(object):
+
+    def __init__(self, formats=None):
+        """ Columnar storage of time-stamped events. Each event has a kind 
+        (interned, stored as an integer code) and optional typed fields, e.g.
+        add(t, 'VAL_START', index=0, x=0.0, y=1.5, z=6.0). Legacy message strings
+        ('VAL_START 0 0.0 1.5 6.0') are only rendered when needed, e.g. when 
+        writing a text file, so adding an event does not format any strings.
+
+        Plain message strings are split into the kind (first word) and the 
+        remaining text, e.g. 'RESPONSE 0.734' is an event of kind 'RESPONSE'.
+
+        Iterating yields legacy event dicts ({'time': t, 'message': msg}), so an 
+        EventBuffer can be used wherever a list of event dicts is expected.
+
+        Args:
+            formats (dict): Field names and message format per event kind,
+                default: EVENT_FORMATS (see define())
+        """
+        self.kinds = []
+        self._codes = {}
+        self._schemas = []
+        self._schema_ids = {}
+        self._lookup = {}
+        self._formats = {}
+        if formats is None:
+            formats = EVENT_FORMATS
+        for (kind, (fields, fmt)) in formats.items():
+            self.define(kind, fields, fmt)
+        self.clear()
+
+
+    def clear(self):
+        """ Remove all events (definitions and interned kinds are kept) """
+        self.time = array.array('d')
+        self.kind = array.array('i')
+        self._values = []
+
+
+    def __len__(self):
+        return len(self.time)
+
+
+    def __iter__(self):
+        for i in range(0, len(self.time)):
+            yield self.row(i)
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.row(k) for k in range(*i.indices(len(self.time)))]
+        return self.row(i)
+
+
+    def __copy__(self):
+        c = EventBuffer.__new__(EventBuffer)
+        c.kinds = list(self.kinds)
+        c._codes = dict(self._codes)
+        c._schemas = list(self._schemas)
+        c._schema_ids = dict(self._schema_ids)
+        c._lookup = dict(self._lookup)
+        c._formats = dict(self._formats)
+        c.time = array.array('d', self.time)
+        c.kind = array.array('i', self.kind)
+        c._values = list(self._values)
+        return c
+
+
+    def define(self, kind, fields, fmt=None):
+        """ Define the fields and legacy message format of an event kind
+
+        Args:
+            kind (str): Event kind, e.g. 'VAL_START'
+            fields (list): Field names, in message order
+            fmt (str): Format string for the field values in the legacy message,
+                default: values separated by spaces
+        """
+        for f in fields:
+            if f in _EVENT_RESERVED:
+                raise ValueError('Event field name is reserved: {:s}'.format(f))
+        self._formats[kind] = (tuple(fields), fmt)
+        code = self._intern(kind)
+        self._lookup = {k: v for (k, v) in self._lookup.items() if k[0] != code}
+
+
+    def _intern(self, kind):
+        """ Return the integer code of an event kind """
+        code = self._codes.get(kind)
+        if code is None:
+            code = len(self.kinds)
+            self.kinds.append(kind)
+            self._codes[kind] = code
+        return code
+
+
+    def add(self, time, kind, **fields):
+        """ Add an event
+
+        Args:
+            time (float): Time stamp (ms)
+            kind (str): Event kind, or a legacy message string (first word is the kind)
+            **fields: Typed event fields
+        """
+        code = self._codes.get(kind)
+        if code is None:
+            msg = _EVENT_MESSAGE.match(kind)
+            if msg is not None and not fields:
+                # Only the first word of a message string is interned as kind
+                (kind, text) = msg.groups()
+                self.time.append(time)
+                self.kind.append(self._intern(kind))
+                self._values.append(text)
+                return
+            code = self._intern(kind)
+        self.time.append(time)
+        self.kind.append(code)
+        if not fields:
+            self._values.append(None)
+            return
+        keys = tuple(fields)
+        found = self._lookup.get((code, keys))
+        if found is None:
+            found = self._schemaFor(code, kind, keys)
+        if found[1] is keys or found[1] == keys:
+            self._values.append((found[0], tuple(fields.values())))
+        else:
+            self._values.append((found[0], tuple([fields[f] for f in found[1]])))
+
+
+    def _schemaFor(self, code, kind, keys):
+        """ Find or create the field schema for an event kind and field names,
+        using the defined field order if the names match a definition """
+        fdef = self._formats.get(kind)
+        if fdef is not None and sorted(fdef[0]) == sorted(keys):
+            names = fdef[0]
+        else:
+            names = keys
+            for f in names:
+                if f in _EVENT_RESERVED:
+                    raise ValueError('Event field name is reserved: {:s}'.format(f))
+        key = (code, names)
+        schema = self._schema_ids.get(key)
+        if schema is None:
+            schema = len(self._schemas)
+            self._schemas.append(key)
+            self._schema_ids[key] = schema
+        self._lookup[(code, keys)] = (schema, names)
+        return (schema, names)
+
+
+    def fields(self, i):
+        """ Dict of typed fields of event i """
+        if self._values[i] is None or type(self._values[i]) == str:
+            return {}
+        (sid, values) = self._values[i]
+        return dict(zip(self._schemas[sid][1], values))
+
+
+    def message(self, i):
+        """ Legacy message string of event i """
+        kind = self.kinds[self.kind[i]]
+        if self._values[i] is None:
+            return kind
+        if type(self._values[i]) == str:
+            return kind + self._values[i]
+        (sid, values) = self._values[i]
+        names = self._schemas[sid][1]
+        fdef = self._formats.get(kind)
+        if fdef is not None and fdef[0] == names and fdef[1] is not None:
+            try:
+                return '{:s} {:s}'.format(kind, fdef[1].format(*values))
+            except (TypeError, ValueError):
+                pass
+        return ' '.join([kind] + [str(v) for v in values])
+
+
+    def row(self, i, fields=False):
+        """ Event i as dict with 'time' and 'message' keys
+
+        Args:
+            fields (bool): if True, also include 'kind' and typed field values
+        """
+        ev = {'time': self.time[i], 'message': self.message(i)}
+        if fields:
+            ev['kind'] = self.kinds[self.kind[i]]
+            ev.update(self.fields(i))
+        return ev
+
+
+    def rows(self, fields=False):
+        """ List of all events as dicts (see row()) """
+        return [self.row(i, fields=fields) for i in range(0, len(self.time))]
+
+
+    def find(self, kind):
+        """ Indices of all events of a given kind, without parsing any messages """
+        code = self._codes.get(kind)
+        if code is None:
+            return []
+        return [i for (i, k) in enumerate(self.kind) if k == code]
+
+
+    def toColumns(self, output='dict'):
+        """ Events as columns 'time', 'message', 'kind' and one column per typed 
+        field (missing where an event does not have this field)
+
+        Args:
+            output (str): 'dict', 'numpy' or 'pandas' (see transposeSamples())
+        """
+        return transposeSamples(self.rows(fields=True), fields=['time', 'message', 'kind'], output=output)
+
+
+    def toPickleFile(self, pickle_file='events.pkl'):
+        """ Save events with native field types (dict of columns) to a pickle file """
+        with open(pickle_file, 'wb') as f:
+            pickle.dump(self.toColumns(output='dict'), f, protocol=2)
+
+
 
 class ParamSet(object):
     """ Stores study or trial parameters that can be accessed 
@@ -259,8 +791,149 @@ class ParamSet(object):
 
 
 
+def _unshare(data):
+    """ Copy the list and dict structure of nested lists of sample or target 
+    dicts. Values are not copied, as sample data only contains scalars. """
+    if isinstance(data, (list, tuple)):
+        return [_unshare(d) for d in data]
+    if isinstance(data, dict):
+        return dict(data)
+    return data
+
+
+
+class TargetAccumulator(object):
+    """ Streaming computation of validation metrics for a single target.
+    Samples are added as they arrive and are not retained, so memory use
+    is constant regardless of sampling duration. Produces the same target 
+    dict as a regular validation, plus repeated sample fractions.
+    Medians are P-square estimates (see RunningQuantile).
+
+    Attributes:
+        n (int): Number of samples used so far
+    """
+    def __init__(self, c, tarpos, tgtHMD, eyes=('',), skip=0):
+        """
+        Args:
+            c (int): Target number in the target set
+            tarpos: Target as (x, y, depth), x/y in visual degrees
+            tgtHMD: Target position in HMD space
+            eyes: Eyes to compute metrics for ('' for combined gaze, 'L', 'R')
+            skip (int): Number of initial samples to ignore
+        """
+        self.c = c
+        self.tarpos = tarpos
+        self.tgtHMD = tgtHMD
+        self.eyes = tuple(eyes)
+        self.skip = skip
+        self.n = 0
+        self._skipped = 0
+        self._ipd = RunningStats()
+        self._any_repeats = {'repeated': 0, 'repeated_any': 0}
+        self._last = None
+
+        self._stats = {}
+        for eye in self.eyes:
+            for var in ['delta', 'deltaX', 'deltaY', 'absX', 'absY', 'gazeX', 'gazeY']:
+                self._stats[(eye, var)] = RunningStats()
+            for var in ['delta', 'absX', 'absY', 'gazeX', 'gazeY']:
+                self._stats[(eye, 'med_' + var)] = RunningQuantile(0.5)
+
+
+    def add(self, sam):
+        """ Add a single validation sample, annotated with targetErr* 
+        and targetGaze* fields """
+        if self._skipped < self.skip:
+            self._skipped += 1
+            return
+        self.n += 1
+
+        for eye in self.eyes:
+            vals = {'delta': sam['targetErr{:s}'.format(eye)],
+                    'deltaX': sam['targetErr{:s}_X'.format(eye)],
+                    'deltaY': sam['targetErr{:s}_Y'.format(eye)],
+                    'gazeX': sam['targetGaze{:s}_X'.format(eye)],
+                    'gazeY': sam['targetGaze{:s}_Y'.format(eye)]}
+            vals['absX'] = abs(vals['deltaX'])
+            vals['absY'] = abs(vals['deltaY'])
+            for var, val in vals.items():
+                self._stats[(eye, var)].add(val)
+                if (eye, 'med_' + var) in self._stats:
+                    self._stats[(eye, 'med_' + var)].add(val)
+
+        if 'L' in self.eyes:
+            self._ipd.add(abs(sam['trackerR_posX'] - sam['trackerL_posX']) * 1000.0)
+
+        # Repeated samples in either eye, or in any data stream
+        errs = [sam['targetErr{:s}'.format(eye)] for eye in self.eyes]
+        if self._last is not None:
+            same = [e == l for (e, l) in zip(errs, self._last)]
+            if 'L' in self.eyes and 'R' in self.eyes:
+                if same[self.eyes.index('L')] or same[self.eyes.index('R')]:
+                    self._any_repeats['repeated'] += 1
+                if any(same):
+                    self._any_repeats['repeated_any'] += 1
+        self._last = errs
+
+
+    def result(self):
+        """ Return dict of target results """
+        d = {}
+        d['set_no'] = self.c
+        d['x'] =  self.tarpos[0]
+        d['y'] =  self.tarpos[1]
+        d['d'] =  self.tarpos[2]
+        d['xm'] =  self.tgtHMD[0] # in m 
+        d['ym'] =  self.tgtHMD[1]
+
+        if 'L' in self.eyes:
+            d['ipd'] = self._ipd.mean
+
+        for eye in self.eyes:
+            sfx = '' if eye == '' else '_{:s}'.format(eye)
+            st = dict([(var, s) for ((e, var), s) in self._stats.items() if e == eye])
+
+            # Gaze position and offset
+            d['avgX' + sfx] = st['gazeX'].mean
+            d['avgY' + sfx] = st['gazeY'].mean
+            d['medX' + sfx] = st['med_gazeX'].value
+            d['medY' + sfx] = st['med_gazeY'].value
+            d['offX' + sfx] = st['deltaX'].mean
+            d['offY' + sfx] = st['deltaY'].mean
+
+            # Accuracy 
+            d['acc' + sfx] = st['delta'].mean
+            d['accX' + sfx] = st['absX'].mean
+            d['accY' + sfx] = st['absY'].mean
+            d['medacc' + sfx] = st['med_delta'].value
+            d['medaccX' + sfx] = st['med_absX'].value
+            d['medaccY' + sfx] = st['med_absY'].value
+
+            # Precision
+            d['sd' + sfx] = st['delta'].sd
+            d['sdX' + sfx] = st['deltaX'].sd
+            d['sdY' + sfx] = st['deltaY'].sd
+            d['rmsi' + sfx] = st['delta'].rmsi
+            d['rmsiX' + sfx] = st['deltaX'].rmsi
+            d['rmsiY' + sfx] = st['deltaY'].rmsi
+
+            # Fraction of repeated samples
+            if self.n > 1:
+                d['repeated_{:s}'.format(eye if eye != '' else 'C')] = st['delta'].repeats / float(self.n - 1)
+
+        if self.n > 1 and 'L' in self.eyes and 'R' in self.eyes:
+            for var, count in self._any_repeats.items():
+                d[var] = count / float(self.n - 1)
+
+        return d
+
+
+
 class ValidationResult(object):
-    """ Container to hold results and raw data of a gaze validation sequence 
+    """ Container to hold results and raw data of a gaze validation sequence.
+    Target and sample data are shared between copies of a result (copy-on-write):
+    a result makes its own copy the first time its targets or samples are
+    accessed, so changes never affect other results.
     
     Attributes:
         result (dict): Dict of result measures
@@ -271,8 +944,9 @@ class ValidationResult(object):
     def __init__(self, result=None, metadata={}, targets=None, samples=None):
 
         self.metadata = metadata
-        self.targets = targets	# by-target list of validation result dicts
-        self.samples = samples	# by-target list of raw sample data
+        self._targets = targets		# by-target list of validation result dicts
+        self._samples = samples		# by-target list of raw sample data
+        self._shared = False		# True if _targets / _samples are shared with a copy
         self._results = {}
 
         self._setResults(result)
@@ -298,7 +972,7 @@ class ValidationResult(object):
         """ Printable validation summary """
         s = 'Validation Result: Acc: {:.2f} (x: {:.2f}, y: {:.2f}), RMSi: {:.2f}, SD: {:.2f}'
         out = s.format(self.acc, self.accX, self.accY, self.rmsi, self.sd)
-        for tar in self.targets:
+        for tar in self._targets:
             s = '\n  Target #{:d} - x: {:+.1f}, y: {:+.1f}, d: {:.1f} - Acc: {:.2f} (x: {:.2f}, y: {:.2f})\t RMSi: {:.2f}, SD: {:.2f}'
             out += s.format(tar['set_no'], tar['x'], tar['y'], tar['d'], tar['acc'], tar['accX'], tar['accY'], tar['rmsi'], tar['sd'])
         return out
@@ -309,14 +983,92 @@ class ValidationResult(object):
         return self._results.copy()
 
 
+    @property
+    def targets(self):
+        """ By-target list of validation result dicts """
+        self._unshare()
+        return self._targets
+
+
+    @targets.setter
+    def targets(self, targets):
+        self._unshare()
+        self._targets = targets
+
+
+    @property
+    def samples(self):
+        """ By-target list of raw sample data """
+        self._unshare()
+        return self._samples
+
+
+    @samples.setter
+    def samples(self, samples):
+        self._unshare()
+        self._samples = samples
+
+
+    def _unshare(self):
+        """ Make a private copy of target and sample data shared with other results """
+        if self._shared:
+            self._targets = _unshare(self._targets)
+            self._samples = _unshare(self._samples)
+            self._shared = False
+
+
+    def _share(self, result):
+        """ Share target and sample data with another result until either is accessed """
+        result._targets = self._targets
+        result._samples = self._samples
+        result._shared = True
+        self._shared = True
+        return result
+
+
+    def copy(self):
+        """ Return a new ValidationResult with its own metadata dict. Target and
+        sample data are only copied when first accessed on either result. """
+        return self._share(ValidationResult(result=self._results, metadata=dict(self.metadata)))
+
+
+    def __copy__(self):
+        return self.copy()
+
+
+    def __deepcopy__(self, memo):
+        vr = ValidationResult.__new__(ValidationResult)
+        vr.__setstate__(copy.deepcopy(self.__getstate__(), memo))
+        return vr
+
+
+    def __getstate__(self):
+        """ Attribute dict with target and sample data under their public names """
+        state = {}
+        for (key, value) in self.__dict__.items():
+            if key in ['_targets', '_samples']:
+                state[key[1:]] = value
+            elif key != '_shared':
+                state[key] = value
+        return state
+
+
+    def __setstate__(self, state):
+        state = dict(state)
+        self._targets = state.pop('targets', None)
+        self._samples = state.pop('samples', None)
+        self._shared = False
+        self.__dict__.update(state)
+
+
     def toDict(self):
         """ Return a copy of all results as a dict """
-        return copy.deepcopy(self.__dict__)
+        return copy.deepcopy(self.__getstate__())
 
     
     def toJSON(self):
         """ Return JSON representation of validation data """
-        return json.dumps(self.__dict__)
+        return json.dumps(self.__getstate__())
 
 
     def toJSONFile(self, json_file):
@@ -326,7 +1078,7 @@ class ValidationResult(object):
             json_file (str): Output file name
         """
         with open(json_file, 'w') as jf:
-            jf.write(json.dumps(self.__dict__))
+            jf.write(json.dumps(self.__getstate__()))
 
 
     def toPickleFile(self, pickle_file='val_result.pkl'):
@@ -393,7 +1145,7 @@ class ValidationResult(object):
                     raise ValueError('depth_range values cannot be negative!')
 
             # By-target metrics
-            for tar, sam in zip(self.targets, self.samples):
+            for tar, sam in zip(self._targets, self._samples):
                 
                 d = tar.copy()
                 if end_sample is None:
@@ -422,28 +1174,17 @@ class ValidationResult(object):
                         deltaM = np.array([s.targetErrL.values, s.targetErrR.values])
 
                 else:
-                    for ix in s.iterrows():
-
-                        # Combined gaze vector
-                        vEyeGaze = np.array((ix[1].trackVec_X, ix[1].trackVec_Y, ix[1].trackVec_Z))
-
-                        # Compute eye-target vector using actual eye origin on each sample
-                        # This is necessary to account for eye tracker jitter
-                        gazeOri = (ix[1].tracker_posX, ix[1].tracker_posY, ix[1].tracker_posZ)
-                        vEyeTar = tgtHMD - gazeOri
-                        vEyeTar = vEyeTar / np.linalg.norm(vEyeTar)
-
-                        # Compute angular error
-                        delta.append(np.degrees(np.arccos(np.clip(np.dot(vEyeTar, vEyeGaze), -1.0, 1.0))))
-
-                        # Compute error for monocular data, if available
-                        for eyei, eye in enumerate(['L', 'R']):
-                            if 'tracker{:s}_posX'.format(eye) in ix[1]:
-                                vEyeGazeM = (ix[1]['trackVec{:s}_X'.format(eye)], ix[1]['trackVec{:s}_Y'.format(eye)], ix[1]['trackVec{:s}_Z'.format(eye)])
-                                gazeOriM = (ix[1]['tracker{:s}_posX'.format(eye)], ix[1]['tracker{:s}_posY'.format(eye)], ix[1]['tracker{:s}_posZ'.format(eye)])
-                                vEyeTarM = tgtHMD - gazeOriM
-                                vEyeTarM = vEyeTarM / np.linalg.norm(vEyeTarM)
-                                deltaM[eyei].append(np.degrees(np.arccos(np.clip(np.dot(vEyeTarM, vEyeGazeM), -1.0, 1.0))))
+                    # Use actual eye origin on each sample to account for eye tracker jitter
+                    ori = ['tracker_posX', 'tracker_posY', 'tracker_posZ']
+                    vec = ['trackVec_X', 'trackVec_Y', 'trackVec_Z']
+                    delta = gazeTargetErrors(s.loc[:, ori].values, s.loc[:, vec].values, tgtHMD)[0]
+
+                    # Compute error for monocular data, if available
+                    for eyei, eye in enumerate(['L', 'R']):
+                        if 'tracker{:s}_posX'.format(eye) in s.columns:
+                            oriM = ['tracker{:s}_pos{:s}'.format(eye, ax) for ax in 'XYZ']
+                            vecM = ['trackVec{:s}_{:s}'.format(eye, ax) for ax in 'XYZ']
+                            deltaM[eyei] = gazeTargetErrors(s.loc[:, oriM].values, s.loc[:, vecM].values, tgtHMD)[0]
 
                 # Accuracy
                 d['acc'] = mean(delta)
@@ -536,10 +1277,9 @@ class ValidationResult(object):
             avg_data['start_sample'] = start_sample
             avg_data['end_sample'] = end_sample
 
-            return ValidationResult(result=avg_data, 
-                                    metadata=self.metadata, 
-                                    samples=self.samples, 
-                                    targets=tar_data)
+            vr = self._share(ValidationResult(result=avg_data, metadata=self.metadata))
+            vr._targets = tar_data
+            return vr
 
 
         def plotAccuracy(self):
@@ -548,7 +1288,7 @@ class ValidationResult(object):
 
             # One subplot per depth plane
             depths = []
-            for t in self.targets:
+            for t in self._targets:
                 if t['d'] not in depths:
                     depths.append(t['d'])
             
@@ -561,7 +1301,7 @@ class ValidationResult(object):
                 ax.set_ylabel('Vertical Position (degrees)')
 
                 legend_handles = []
-                for t in self.targets:
+                for t in self._targets:
                     if t['d'] == d:
                         ax.plot(t['x'], t['y'], 'k+', markersize=12)
                         ax.plot([t['x'], t['avgX']], [t['y'], t['avgY']], 'r-', linewidth=1)
@@ -595,7 +1335,7 @@ class ValidationResult(object):
 
             # One subplot per depth plane
             depths = []
-            for t in self.targets:
+            for t in self._targets:
                 if t['d'] not in depths:
                     depths.append(t['d'])
             
@@ -607,8 +1347,8 @@ class ValidationResult(object):
                 ax.set_xlabel('Horizontal Position (degrees)')
                 ax.set_ylabel('Vertical Position (degrees)')
 
-                for idx, t in enumerate(self.targets):
-                    sam = self.samples[idx]
+                for idx, t in enumerate(self._targets):
+                    sam = self._samples[idx]
                     if t['d'] == d:
                         ax.plot(t['x'], t['y'], 'k+', markersize=12)
                         tar_samX = []
@@ -630,7 +1370,7 @@ class ValidationResult(object):
 
         def getTargetDataFrame(self):
             """ Return pandas.DataFrame of individual target results """
-            return pd.DataFrame(self.targets)
+            return pd.DataFrame(self._targets)
 
 
         def getSamplesDataFrame(self, target):
@@ -639,7 +1379,7 @@ class ValidationResult(object):
             Args:
                 target (int): Target index in self.targets to retrieve
             """
-            return pd.DataFrame(self.samples[target])
+            return pd.DataFrame(self._samples[target])
             
 
 
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+# vexptoolbox: Vizard Toolbox for Behavioral Experiments
+# Central per-frame tracking of gaze dwell times and proximity conditions
+
+
+class Waiter(object):
+
+    def __init__(self, callback=None):
+        """ Handle for a pending dwell or proximity wait, resolved by a
+        DwellTracker. Use as viztask.waitTrue(waiter.done) in Vizard tasks.
+
+        Args:
+            callback: Function to call with the result when resolved
+        """
+        self.result = None
+        self.callback = callback
+        self._done = False
+        self._targets = None
+        self._offsets = {}
+
+
+    def done(self):
+        """ Returns True once the wait condition was met """
+        return self._done
+
+
+    def _resolve(self, result):
+        self.result = result
+        self._done = True
+        if self.callback is not None:
+            self.callback(result)
+
+
+
+class DwellTracker(object):
+
+    def __init__(self):
+        """ Tracks how long the current gaze target has been hit, keyed by
+        target ID, and resolves any number of pending waits when their dwell
+        threshold is crossed. Each update only touches the current target,
+        so the cost per frame does not depend on the number of waits.
+        Additional conditions (e.g., proximity tests) are evaluated once
+        per update.
+
+        Attributes:
+            target: ID of the current gaze target (or None)
+            visible: ID of the target currently reported to listeners,
+                None while gaze is invalid
+            dwell (dict): Dwell time on the current target, as {id: seconds}
+        """
+        self.target = None
+        self.visible = None
+        self.dwell = {}
+        self._epoch = 0
+        self._waiters = {}
+        self._conditions = []
+        self._listeners = []
+
+
+    def update(self, target, dt):
+        """ Add one frame of gaze data. Samples without a valid target (e.g.,
+        during blinks) keep the current dwell time, hitting a different
+        target resets it. Listeners are notified with (old, None) while
+        gaze is invalid, and with (None, target) when it returns.
+
+        Args:
+            target: Hashable ID of the object currently hit by gaze, or None
+            dt (float): Time since last update in seconds
+        """
+        if target != self.visible:
+            old = self.visible
+            self.visible = target
+            for fn in self._listeners:
+                fn(old, target)
+
+        if target is not None:
+            if target != self.target:
+                self.dwell.pop(self.target, None)
+                self.target = target
+                self._epoch += 1
+
+            t = self.dwell.get(target, 0.0) + dt
+            self.dwell[target] = t
+            waiters = self._waiters.get(target)
+            if waiters:
+                for (threshold, w) in list(waiters):
+                    (epoch, offset) = w._offsets.get(target, (None, 0.0))
+                    if epoch != self._epoch:
+                        offset = 0.0
+                    if t - offset >= threshold:
+                        self.cancel(w)
+                        w._resolve(target)
+
+        if self._conditions:
+            for (fn, w) in list(self._conditions):
+                if fn():
+                    self.cancel(w)
+                    w._resolve(True)
+
+
+    def addDwell(self, targets, threshold, callback=None):
+        """ Wait until any of the given targets has been hit for a given time.
+        Dwell time before this call is not counted.
+
+        Args:
+            targets: List of target IDs
+            threshold (float): Dwell time in seconds
+            callback: Function to call with the selected target ID
+
+        Returns: Waiter object, result is the selected target ID
+        """
+        w = Waiter(callback)
+        w._targets = list(targets)
+        for tid in w._targets:
+            if tid == self.target:
+                w._offsets[tid] = (self._epoch, self.dwell.get(tid, 0.0))
+            if tid not in self._waiters:
+                self._waiters[tid] = []
+            self._waiters[tid].append((threshold, w))
+        return w
+
+
+    def addCondition(self, fn, callback=None):
+        """ Wait until a condition function returns True, tested on each update
+
+        Args:
+            fn: Function without arguments returning a bool
+            callback: Function to call when the condition is met
+
+        Returns: Waiter object
+        """
+        w = Waiter(callback)
+        self._conditions.append((fn, w))
+        return w
+
+
+    def cancel(self, waiter):
+        """ Remove a pending wait (safe to call more than once) """
+        if waiter._targets is None:
+            self._conditions = [c for c in self._conditions if c[1] is not waiter]
+            return
+        for tid in waiter._targets:
+            if tid in self._waiters:
+                self._waiters[tid] = [e for e in self._waiters[tid] if e[1] is not waiter]
+                if len(self._waiters[tid]) == 0:
+                    del self._waiters[tid]
+
+
+    def addListener(self, fn):
+        """ Register a function to call as fn(old_id, new_id) when the visible gaze target changes """
+        self._listeners.append(fn)
+
+
+    def removeListener(self, fn):
+        """ Remove a target change listener """
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+
+    def reset(self):
+        """ Reset dwell times, pending waits are kept """
+        self.dwell = {}
+        self.target = None
+        self.visible = None
+        self._epoch += 1
@@ -47,7 +47,8 @@ class Experiment(object):
             config (dict): Optional initial config parameters
             debug (bool): it True, print additional debug output
             output_file (str): Base file name (without extension) for output files
-            auto_save (bool): if True, automatically save data after each trial
+            auto_save (bool): if True, automatically append each finished trial to
+                a trial journal, and write the full trial file after the last trial
         """
         if name is None:
             print('Note: Experiment name is not set, using "Experiment1". You can specify the name='' argument when creating an Experiment() object.')
@@ -78,6 +79,7 @@ class Experiment(object):
         self.debug = debug
         self._base_filename = output_file
         self._auto_save = auto_save
+        self._journal = {} # trial index -> base file name of journaled trials
         
         self._recorder = None
         self._auto_record = True
@@ -537,7 +539,7 @@ class Experiment(object):
 
         if self._recorder is not None and self._auto_record:
             self._recorder.startRecording()
-            self._recorder.recordEvent('TRIAL_START {:d}'.format(trial_idx))
+            self._recorder.recordEvent('TRIAL_START', index=trial_idx)
 
         if print_summary:
             print(self.trials[self._cur_trial].summary)
@@ -557,11 +559,13 @@ class Experiment(object):
             raise RuntimeError('There is no running trial to be ended!')
 
         if self._recorder is not None and self._auto_record:
-            self._recorder.recordEvent('TRIAL_END {:d}'.format(self.trials[self._cur_trial].index))
+            self._recorder.recordEvent('TRIAL_END', index=self.trials[self._cur_trial].index)
             self._recorder.stopRecording()
-            sam, ev = self._recorder._getRawRecording(clear=True)
+            sam, ev, summary = self._recorder._getRawRecording(clear=True, summary=True)
             self.trials[self._cur_trial].samples = sam
             self.trials[self._cur_trial].events = ev
+            self.trials[self._cur_trial].stats = summary['stats']
+            self.trials[self._cur_trial].overview = summary['overview']
 
         self.trials[self._cur_trial]._end()
         if self._cur_trial + 1 >= len(self.trials):
@@ -573,7 +577,9 @@ class Experiment(object):
         self._trial_running = False
 
         if self._auto_save:
-            self.saveTrialData('{:s}.tsv'.format(self.output_file_name), rec_data='separate')
+            self.journalTrial(self.trials[self._cur_trial])
+            if self.done:
+                self.rebuildTrialData()
 
         if print_summary:
             print(self.trials[self._cur_trial].summary)
@@ -642,6 +648,8 @@ class Experiment(object):
                 - 'single': One large file with all samples (default)
                 - 'separate' Or True: one sample file per trial
                 - 'none' or False: Do not save sample data
+                Recording statistics and overviews are saved per trial in both 
+                cases, e.g. <file_name>_samples_1_stats.json.
         """
         if file_name is None:
             file_name = '{:s}.tsv'.format(self.output_file_name)
@@ -654,31 +662,7 @@ class Experiment(object):
 
         # Trial data
         self._dlog('Saving trial data...')
-        all_keys = []
-        tdicts = []
-        for t in self.trials:
-            td = dict(t.params)
-            td.update(dict(t.results))
-            td['_trial_index'] = t.index
-            td['_trial_number'] = t.number
-            td['_start_tick'] = t._start_tick
-            td['_end_tick'] = t._end_tick
-            td['_start_time'] = t._start_time
-            td['_end_time'] = t._end_time
-
-            # Collect superset of all param and result keys
-            for key in list(td.keys()):
-                if key not in all_keys:
-                    all_keys.append(key)
-            tdicts.append(td)
-
-        all_keys.sort()
-        with open(file_name, 'w') as of:
-            writer = csv.DictWriter(of, delimiter=sep, lineterminator='\n', 
-                                    fieldnames=all_keys)
-            writer.writeheader()
-            for td in tdicts:
-                writer.writerow(td)
+        self._writeTrialRows(file_name, [self._trialRow(t) for t in self.trials], sep=sep)
 
         # Sample and event data
         if rec_data.lower() == 'single' and self._recorder is not None:
@@ -696,21 +680,138 @@ class Experiment(object):
                     self.recorder.saveRecording(sample_file=file_name_s, event_file=file_name_e, _append=True,
                                                 _data=(t.samples, t.events), meta_cols={'trial_number': t.number})
 
+                # Recording summaries are kept per trial, e.g. <file>_samples_1_stats.json
+                self.recorder._saveSummary('{:s}_samples_{:d}'.format(os.path.splitext(file_name)[0], t.number), 
+                                           self._trialSummary(t))
+
         elif rec_data.lower() == 'separate' and self._recorder is not None:
+            base = os.path.splitext(file_name)[0]
             for t in self.trials:
+                if self._journal.get(t.index) == base:
+                    continue # Sample files were already written by journalTrial()
                 try:
-                    file_name_s = '{:s}_samples_{:d}.tsv'.format(os.path.splitext(file_name)[0], t.number)
-                    file_name_e = '{:s}_events_{:d}.tsv'.format(os.path.splitext(file_name)[0], t.number)
-                    if os.path.isfile(file_name_s) and os.path.isfile(file_name_e):
-                        continue # This is called on each trial, so skip existing files
-                    
-                    self.recorder.saveRecording(sample_file=file_name_s, event_file=file_name_e, 
-                                                _data=(t.samples, t.events), meta_cols={'trial_number': t.number})
-                
+                    self._saveTrialRecording(t, base)
                 except AttributeError:
                     pass # Skip trials without recorded data
 
 
+    def _trialRow(self, t):
+        """ Return a flat dict of a trial's parameters, results and timing 
+        
+        Args:
+            t: Trial object
+        """
+        td = dict(t.params)
+        td.update(dict(t.results))
+        td['_trial_index'] = t.index
+        td['_trial_number'] = t.number
+        td['_start_tick'] = t._start_tick
+        td['_end_tick'] = t._end_tick
+        td['_start_time'] = t._start_time
+        td['_end_time'] = t._end_time
+        return td
+
+
+    def _writeTrialRows(self, file_name, tdicts, sep='\t'):
+        """ Write a list of trial row dicts to a CSV file, using the
+        superset of all param and result keys as columns """
+        all_keys = []
+        for td in tdicts:
+            for key in list(td.keys()):
+                if key not in all_keys:
+                    all_keys.append(key)
+
+        all_keys.sort()
+        with open(file_name, 'w') as of:
+            writer = csv.DictWriter(of, delimiter=sep, lineterminator='\n', 
+                                    fieldnames=all_keys)
+            writer.writeheader()
+            for td in tdicts:
+                writer.writerow(td)
+
+
+    def _saveTrialRecording(self, t, base):
+        """ Save sample and event data of a single trial to separate files 
+        
+        Args:
+            t: Trial object (raises AttributeError if nothing was recorded)
+            base (str): Base file name without extension
+        """
+        file_name_s = '{:s}_samples_{:d}.tsv'.format(base, t.number)
+        file_name_e = '{:s}_events_{:d}.tsv'.format(base, t.number)
+        self.recorder.saveRecording(sample_file=file_name_s, event_file=file_name_e, 
+                                    _data=(t.samples, t.events), _summary=self._trialSummary(t),
+                                    meta_cols={'trial_number': t.number})
+
+
+    def _trialSummary(self, t):
+        """ Return recording summaries stored with a trial (see SampleRecorder._getRawRecording())
+        
+        Args:
+            t: Trial object
+        """
+        return {'stats': t.__dict__.get('stats'), 'overview': t.__dict__.get('overview')}
+
+
+    def journalTrial(self, trial, file_name=None):
+        """ Append a finished trial to the trial journal file (one JSON line per 
+        trial, named <file_name>_journal.jsonl) and save its sample and event data. 
+        Each trial is written only once, so the cost per trial does not grow with 
+        the number of trials run. Called automatically after each trial if auto_save 
+        is enabled. Use rebuildTrialData() to generate the full trial file.
+        An existing journal from an earlier run is overwritten by the first trial 
+        journaled to it.
+
+        Args:
+            trial: Trial object or index of trial to save
+            file_name (str): Name of trial data file the journal belongs to
+        """
+        if type(trial) != Trial:
+            trial = self.trials[trial]
+        if file_name is None:
+            file_name = '{:s}.tsv'.format(self.output_file_name)
+        base = os.path.splitext(file_name)[0]
+
+        # Start a new journal file instead of appending to one from an earlier run
+        writemode = 'a'
+        if base not in self._journal.values():
+            writemode = 'w'
+        with open('{:s}_journal.jsonl'.format(base), writemode) as jf:
+            jf.write(json.dumps(self._trialRow(trial), default=str) + '\n')
+
+        if self._recorder is not None:
+            try:
+                self._saveTrialRecording(trial, base)
+            except AttributeError:
+                pass # Trial without recorded data
+        
+        self._journal[trial.index] = base
+        self._dlog('Trial {:d} added to journal: {:s}_journal.jsonl'.format(trial.index, base))
+
+
+    def rebuildTrialData(self, file_name=None, sep='\t'):
+        """ Write the full trial data file from the trial journal. If a trial 
+        was journaled more than once (repeated), only its last entry is kept. 
+
+        Args:
+            file_name (str): Name of CSV file to write to
+            sep (str): Field separator string (default: Tab)
+        """
+        if file_name is None:
+            file_name = '{:s}.tsv'.format(self.output_file_name)
+        journal_file = '{:s}_journal.jsonl'.format(os.path.splitext(file_name)[0])
+
+        rows = {}
+        with open(journal_file, 'r') as jf:
+            for line in jf:
+                if line.strip():
+                    td = json.loads(line)
+                    rows[td['_trial_index']] = td
+
+        self._writeTrialRows(file_name, [rows[ix] for ix in sorted(rows.keys())], sep=sep)
+        self._dlog('Rebuilt trial data ({:d} trials) from journal: {:s}'.format(len(rows), journal_file))
+
+
     def toDict(self):
         """ Return all experiment data and results as dict """
         e = {'name': self.name,
@@ -883,6 +984,8 @@ class Trial(object):
             d['samples'] = self.samples
         if 'events' in self.__dict__.keys():
             d['events'] = self.events
+        if 'stats' in self.__dict__.keys():
+            d['stats'] = self.stats
         return d
 
 
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+# vexptoolbox: Vizard Toolbox for Behavioral Experiments
+# Online fixation detection (I-VT and I-DT), updated once per gaze sample
+
+import math
+from collections import deque
+
+
+def _angles(v):
+    """ Yaw and pitch (degrees) of a direction vector, same convention
+    as the *_dirX / *_dirY sample fields """
+    n = math.sqrt(v[0] * v[0] + v[1] * v[1] + v[2] * v[2])
+    yaw = math.degrees(math.atan2(v[0], v[2]))
+    pitch = math.degrees(math.asin(max(-1.0, min(1.0, -v[1] / n))))
+    return (yaw, pitch)
+
+
+
+class FixationDetector(object):
+
+    def __init__(self, method='ivt', velocity=30.0, dispersion=1.0, min_duration=100.0):
+        """ Incremental fixation detector for a stream of gaze direction vectors.
+        All state is updated in constant (I-VT) or amortized constant (I-DT) time
+        per sample, so it can run on every display frame.
+
+        - I-VT: samples with an angular velocity below the velocity threshold
+          belong to a fixation (Salvucci & Goldberg, 2000, ETRA)
+        - I-DT: samples within a window of (horizontal + vertical) angular
+          dispersion below the dispersion threshold belong to a fixation
+
+        update() returns an event dict when a fixation has lasted min_duration
+        ('FIX_START') or when it ends ('FIX_END'). Event dicts contain 'type',
+        'start', 'end' and 'duration' (ms), 'start_index' and 'end_index'
+        (sample numbers, end exclusive), 'samples', and the fixation centroid
+        as 'x' and 'y' (yaw, pitch in degrees).
+
+        Args:
+            method (str): 'ivt' or 'idt'
+            velocity (float): I-VT velocity threshold in degrees/s
+            dispersion (float): I-DT dispersion threshold in degrees
+            min_duration (float): Minimum fixation duration in ms
+        """
+        if method not in ['ivt', 'idt']:
+            raise ValueError('Unknown fixation detection method "{:s}", use "ivt" or "idt"'.format(str(method)))
+        self.method = method
+        self.velocity = float(velocity)
+        self.dispersion = float(dispersion)
+        self.min_duration = float(min_duration)
+        self.reset()
+
+
+    def reset(self):
+        """ Clear all state, e.g. after a gap in the data """
+        self.index = 0
+        self.fixation = False
+        self._last = None
+        self._win = deque()
+        self._minx = deque()
+        self._maxx = deque()
+        self._miny = deque()
+        self._maxy = deque()
+        self._sum = [0.0, 0.0, 0.0]
+
+
+    @property
+    def current(self):
+        """ Event dict of the ongoing fixation, or None """
+        if not self.fixation:
+            return None
+        return self._event('FIX_START')
+
+
+    def _event(self, etype):
+        """ Build an event dict for the current fixation window """
+        (t0, i0) = (self._win[0][0], self._win[0][3])
+        (t1, i1) = (self._win[-1][0], self._win[-1][3])
+        (x, y) = _angles(self._sum)
+        return {'type': etype, 'start': t0, 'end': t1, 'duration': t1 - t0,
+                'start_index': i0, 'end_index': i1 + 1, 'samples': len(self._win),
+                'x': x, 'y': y}
+
+
+    def _push(self, t, v):
+        """ Add a sample to the current window """
+        (x, y) = _angles(v)
+        self._win.append((t, x, y, self.index, v))
+        for k in range(0, 3):
+            self._sum[k] += v[k]
+        if self.method == 'idt':
+            # Monotonic queues for running min / max of the window
+            for (q, val, sign) in [(self._minx, x, 1), (self._maxx, x, -1),
+                                   (self._miny, y, 1), (self._maxy, y, -1)]:
+                while q and (q[-1][0] - val) * sign > 0:
+                    q.pop()
+                q.append((val, self.index))
+
+
+    def _pop(self):
+        """ Remove the oldest sample from the current window """
+        (t, x, y, idx, v) = self._win.popleft()
+        for k in range(0, 3):
+            self._sum[k] -= v[k]
+        for q in [self._minx, self._maxx, self._miny, self._maxy]:
+            if q and q[0][1] == idx:
+                q.popleft()
+
+
+    def _clear(self):
+        """ Empty the current window """
+        self._win.clear()
+        self._sum = [0.0, 0.0, 0.0]
+        for q in [self._minx, self._maxx, self._miny, self._maxy]:
+            q.clear()
+
+
+    def _dispersion(self):
+        return (self._maxx[0][0] - self._minx[0][0]) + (self._maxy[0][0] - self._miny[0][0])
+
+
+    def update(self, t, v):
+        """ Add a gaze sample
+
+        Args:
+            t (float): Time stamp in ms
+            v (3-tuple): Gaze direction vector, or None for missing data
+
+        Returns: event dict, or None
+        """
+        ev = None
+        if v is None:
+            # Missing data ends the current fixation
+            if self.fixation:
+                ev = self._event('FIX_END')
+            self.fixation = False
+            self._clear()
+            self._last = None
+            self.index += 1
+            return ev
+
+        if self.method == 'ivt':
+            if self._last is not None:
+                (lt, lv) = self._last
+                dt = (t - lt) / 1000.0
+                if dt > 0:
+                    dot = sum([a * b for (a, b) in zip(lv, v)])
+                    norm = math.sqrt(sum([a * a for a in lv]) * sum([b * b for b in v]))
+                    ang = math.degrees(math.acos(max(-1.0, min(1.0, dot / norm))))
+                    if ang / dt >= self.velocity:
+                        # Saccade sample: end fixation, start a new candidate
+                        if self.fixation:
+                            ev = self._event('FIX_END')
+                        self.fixation = False
+                        self._clear()
+            self._push(t, v)
+
+        else:
+            self._push(t, v)
+            if self.fixation:
+                if self._dispersion() > self.dispersion:
+                    # New sample does not fit: fixation ends before it
+                    self._win.pop()
+                    for k in range(0, 3):
+                        self._sum[k] -= v[k]
+                    ev = self._event('FIX_END')
+                    self.fixation = False
+                    self._clear()
+                    self._push(t, v)
+            else:
+                while len(self._win) > 1 and self._dispersion() > self.dispersion:
+                    self._pop()
+
+        if not self.fixation and len(self._win) > 0 and t - self._win[0][0] >= self.min_duration:
+            self.fixation = True
+            ev = self._event('FIX_START')
+
+        self._last = (t, v)
+        self.index += 1
+        return ev
+
+
+    def flush(self):
+        """ End the ongoing fixation, e.g. at the end of a recording
+
+        Returns: 'FIX_END' event dict, or None
+        """
+        ev = None
+        if self.fixation:
+            ev = self._event('FIX_END')
+        self.fixation = False
+        self._clear()
+        self._last = None
+        return ev
+
+
+
+def detectFixations(times, vectors, method='ivt', **kwargs):
+    """ Run a FixationDetector over a list of samples
+
+    Args:
+        times: List of time stamps in ms
+        vectors: List of gaze direction vectors (None for missing data)
+        method (str): 'ivt' or 'idt'
+        **kwargs: Threshold arguments for FixationDetector
+
+    Returns: list of 'FIX_END' event dicts, i.e. complete fixations
+    """
+    det = FixationDetector(method=method, **kwargs)
+    fixations = []
+    for (t, v) in zip(times, vectors):
+        ev = det.update(t, v)
+        if ev is not None and ev['type'] == 'FIX_END':
+            fixations.append(ev)
+    ev = det.flush()
+    if ev is not None:
+        fixations.append(ev)
+    return fixations
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+# vexptoolbox: Vizard Toolbox for Behavioral Experiments
+# Batched gaze geometry functions that do not depend on Vizard
+#
+# All functions take (N, 3) arrays (or a single 3-vector) in Vizard's
+# coordinate system (left-handed, X right, Y up, Z forward) and return
+# angles in degrees. Euler angles follow vizmat conventions, i.e. yaw is
+# positive to the right and pitch is positive downwards.
+
+import numpy as np
+
+
+def normalize(v):
+    """ Scale vectors to unit length
+
+    Args:
+        v: (N, 3) array of vectors
+    """
+    v = np.asarray(v, dtype=float)
+    n = np.linalg.norm(v, axis=-1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return v / n
+
+
+def vectorToPoint(origins, points):
+    """ Unit vectors pointing from origins to points (cf. vizmat.VectorToPoint)
+
+    Args:
+        origins: (N, 3) array of start positions
+        points: (N, 3) array or single 3-vector of end positions
+    """
+    return normalize(np.asarray(points, dtype=float) - np.asarray(origins, dtype=float))
+
+
+def angleBetween(a, b):
+    """ Angle between vectors in degrees (cf. vizmat.AngleBetweenVector)
+
+    Args:
+        a, b: (N, 3) arrays or single 3-vectors
+    """
+    dot = np.sum(normalize(a) * normalize(b), axis=-1)
+    return np.degrees(np.arccos(np.clip(dot, -1.0, 1.0)))
+
+
+def vectorEuler(v):
+    """ Yaw and pitch of a rotation that turns the forward axis (0, 0, 1)
+    into the given direction (cf. vizmat.Transform().makeVecRotVec([0, 0, 1], v)
+    followed by getEuler())
+
+    Args:
+        v: (N, 3) array of direction vectors
+
+    Returns: tuple of (yaw, pitch) arrays
+    """
+    v = normalize(v)
+    yaw = np.degrees(np.arctan2(v[..., 0], v[..., 2]))
+    pitch = np.degrees(np.arcsin(np.clip(-v[..., 1], -1.0, 1.0)))
+    return (yaw, pitch)
+
+
+def eulerVector(yaw, pitch):
+    """ Forward direction vectors of euler rotations, as stored in the 
+    *_dirX / *_dirY sample fields (inverse of vectorEuler())
+
+    Args:
+        yaw, pitch: arrays of yaw and pitch angles in degrees
+
+    Returns: (N, 3) array of unit vectors
+    """
+    yaw = np.radians(np.asarray(yaw, dtype=float))
+    pitch = np.radians(np.asarray(pitch, dtype=float))
+    cp = np.cos(pitch)
+    return np.stack([np.sin(yaw) * cp, -np.sin(pitch), np.cos(yaw) * cp], axis=-1)
+
+
+def eulerQuat(yaw, pitch, roll):
+    """ Quaternions (x, y, z, w) of euler rotations as used by Vizard 
+    (yaw about Y, then pitch about X, then roll about Z)
+
+    Args:
+        yaw, pitch, roll: arrays of euler angles in degrees
+
+    Returns: (N, 4) array of unit quaternions
+    """
+    h = [np.radians(np.asarray(a, dtype=float)) / 2.0 for a in (yaw, pitch, roll)]
+    (cy, cp, cr) = [np.cos(a) for a in h]
+    (sy, sp, sr) = [np.sin(a) for a in h]
+    return np.stack([cy * sp * cr + sy * cp * sr,
+                     sy * cp * cr - cy * sp * sr,
+                     cy * cp * sr - sy * sp * cr,
+                     cy * cp * cr + sy * sp * sr], axis=-1)
+
+
+def vecRotVecEuler(a, b):
+    """ Yaw and pitch of the shortest-arc rotation that turns vector a
+    into vector b (cf. vizmat.Transform().makeVecRotVec(a, b) followed
+    by getEuler()). The rotation is applied to the forward axis using
+    Rodrigues' formula, then converted to euler angles.
+
+    Args:
+        a, b: (N, 3) arrays or single 3-vectors
+
+    Returns: tuple of (yaw, pitch) arrays
+    """
+    a = normalize(a)
+    b = normalize(b)
+    a, b = np.broadcast_arrays(a, b)
+    v = np.cross(a, b)
+    c = np.sum(a * b, axis=-1)
+
+    # R * z = z + v x z + v x (v x z) / (1 + c), with z = (0, 0, 1)
+    vxz = np.stack([v[..., 1], -v[..., 0], np.zeros_like(c)], axis=-1)
+    vxvxz = np.cross(v, vxz)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fwd = vxz + vxvxz / (1.0 + c)[..., np.newaxis]
+    fwd[..., 2] += 1.0
+    return vectorEuler(fwd)
+
+
+def gazeAngles(gaze):
+    """ Horizontal and vertical gaze angles of direction vectors, as stored
+    in the targetGaze_X/Y fields (positive values: right / up)
+
+    Args:
+        gaze: (N, 3) array of gaze direction vectors
+
+    Returns: tuple of (horizontal, vertical) arrays
+    """
+    (x, y) = vectorEuler(gaze)
+    return (x, -y)
+
+
+def gazeTargetErrors(origins, gaze, targets):
+    """ Angular error between gaze vectors and eye-target vectors, as stored
+    in the targetErr and targetErr_X/Y fields.
+
+    Args:
+        origins: (N, 3) array of gaze origins
+        gaze: (N, 3) array of gaze direction vectors
+        targets: (N, 3) array or single 3-vector of target positions
+
+    Returns: tuple of (error, horizontal error, vertical error) arrays
+    """
+    tar = vectorToPoint(origins, targets)
+    err = angleBetween(gaze, tar)
+    (x, y) = vecRotVecEuler(tar, gaze)
+    return (err, x, -y)
+
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+
+# vexptoolbox: Vizard Toolbox for Behavioral Experiments
+# Metrics for the VOR and free-viewing blocks of a gaze evaluation session.
+# All metrics are computed on whole sample columns at once; sessions are
+# cut into blocks using a SegmentIndex and processed in parallel threads.
+
+import numpy as np
+from multiprocessing.pool import ThreadPool
+
+from .data import MISSING_VALUE
+from .geometry import vectorToPoint, angleBetween, eulerQuat
+from .aoi import AOISet, sceneAOIs, mapGazeToAOIs
+from .classify import classifyGaze, GAZE_FIXATION, GAZE_SACCADE
+from .segments import SegmentIndex
+
+# World position of the VOR fixation target in gaze_evaluation.py
+VOR_TARGET = [0.0, 1.5, 6.0]
+
+# Default head velocity bins (degrees/s)
+HEAD_VELOCITY_BINS = [0.0, 10.0, 20.0, 40.0, 80.0, 160.0, np.inf]
+
+
+def _directions(samples, prefix):
+    """ (N, 3) array of unit forward vectors from <prefix>_dirX/Y columns,
+    NaN where data is missing """
+    yaw = np.asarray(samples['{:s}_dirX'.format(prefix)], dtype=float)
+    pitch = np.asarray(samples['{:s}_dirY'.format(prefix)], dtype=float)
+    invalid = (yaw == MISSING_VALUE) | (pitch == MISSING_VALUE)
+    yaw = np.radians(np.where(invalid, np.nan, yaw))
+    pitch = np.radians(np.where(invalid, np.nan, pitch))
+    cp = np.cos(pitch)
+    return np.stack([np.sin(yaw) * cp, -np.sin(pitch), np.cos(yaw) * cp], axis=-1)
+
+
+def _positions(samples, prefix):
+    """ (N, 3) array of <prefix>_posX/Y/Z columns, NaN where data is missing """
+    pos = np.stack([np.asarray(samples['{:s}_pos{:s}'.format(prefix, ax)], dtype=float)
+                    for ax in 'XYZ'], axis=-1)
+    pos[np.any(pos == MISSING_VALUE, axis=-1)] = np.nan
+    return pos
+
+
+def angularVelocity(times, vec):
+    """ Angular velocity vectors of a sequence of direction vectors, from the
+    rotation between consecutive samples (backward difference, first sample NaN).
+    The magnitude is the angular speed in degrees/s.
+
+    Args:
+        times: (N,) array of time stamps in ms
+        vec: (N, 3) array of unit direction vectors
+
+    Returns: (N, 3) array of angular velocity vectors (degrees/s)
+    """
+    t = np.asarray(times, dtype=float)
+    vec = np.asarray(vec, dtype=float)
+    omega = np.full(vec.shape, np.nan)
+    if len(t) < 2:
+        return omega
+    axis = np.cross(vec[:-1], vec[1:])
+    sin = np.linalg.norm(axis, axis=-1)
+    cos = np.sum(vec[:-1] * vec[1:], axis=-1)
+    angle = np.degrees(np.arctan2(sin, cos))
+    dt = np.diff(t) / 1000.0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scale = np.where(sin > 0.0, angle / (sin * dt), 0.0)
+        scale[dt <= 0.0] = np.nan
+    omega[1:] = axis * scale[:, np.newaxis]
+    return omega
+
+
+def binnedStats(values, by, bins, percentiles=(25, 50, 75, 95)):
+    """ Statistics of values grouped by bins of another variable. Counts, means
+    and SDs use np.digitize and np.bincount, percentiles sort all values by bin
+    and value once. Samples where either array is NaN are ignored.
+
+    Args:
+        values: (N,) array of values to summarize (e.g., gaze error)
+        by: (N,) array of the binning variable (e.g., head velocity)
+        bins: Monotonic bin edges, values outside all bins are ignored
+        percentiles (list): Percentiles to compute per bin (0-100), linearly
+            interpolated as in np.percentile()
+
+    Returns: dict of arrays, one entry per bin: bin_min, bin_max, count, mean, sd,
+        median and p<N> for each requested percentile (e.g., p95)
+    """
+    values = np.asarray(values, dtype=float)
+    by = np.asarray(by, dtype=float)
+    bins = np.asarray(bins, dtype=float)
+    nb = len(bins) - 1
+    valid = np.isfinite(values) & ~np.isnan(by)
+    idx = np.digitize(by[valid], bins) - 1
+    keep = (idx >= 0) & (idx < nb)
+    (idx, x) = (idx[keep], values[valid][keep])
+
+    count = np.bincount(idx, minlength=nb).astype(float)
+    total = np.bincount(idx, weights=x, minlength=nb)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        dev = x - mean[idx]
+        var = np.bincount(idx, weights=dev * dev, minlength=nb) / (count - 1)
+    var[count < 2] = np.nan
+    out = {'bin_min': bins[:-1], 'bin_max': bins[1:], 'count': count.astype(int),
+           'mean': mean, 'sd': np.sqrt(var)}
+
+    # Grouped percentiles: values sorted within bins, bins stored consecutively.
+    # Sorting by value, then stably by bin (radix sort for small integers) is
+    # much faster than a lexsort on both keys.
+    order = np.argsort(x)
+    key = idx[order].astype(np.int16 if nb < 32767 else int)
+    xs = x[order[np.argsort(key, kind='stable')]]
+    n = count.astype(int)
+    first = np.concatenate(([0], np.cumsum(n)[:-1]))
+    has = n > 0
+    for p in sorted(set(list(percentiles) + [50])):
+        pos = first + (n - 1) * (p / 100.0)
+        lo = np.floor(pos).astype(int)
+        hi = np.minimum(lo + 1, first + n - 1)
+        res = np.full(nb, np.nan)
+        res[has] = xs[lo[has]] + (xs[hi[has]] - xs[lo[has]]) * (pos[has] - lo[has])
+        if p == 50:
+            out['median'] = res
+        if p in percentiles:
+            out['p{:g}'.format(p)] = res
+    return out
+
+
+def headVelocity(samples, group=None):
+    """ Angular speed of the head (view) rotation in degrees/s, including roll.
+    Uses view_quatX/Y/Z/W columns if present, otherwise view_dirX/Y/Z euler angles.
+    The first sample, and with a group column the first sample of each group
+    (e.g., of each recording in a concatenated table), is NaN.
+
+    Args:
+        samples: DataFrame or dict of columns with time and view orientation
+        group (str): Optional column identifying recordings in a concatenated table
+
+    Returns: (N,) array of head angular speed
+    """
+    t = np.asarray(samples['time'], dtype=float)
+    if 'view_quatW' in samples:
+        q = np.stack([np.asarray(samples['view_quat{:s}'.format(ax)], dtype=float)
+                      for ax in 'XYZW'], axis=-1)
+        q[np.any(q == MISSING_VALUE, axis=-1)] = np.nan
+    else:
+        euler = [np.asarray(samples['view_dir{:s}'.format(ax)], dtype=float) for ax in 'XY']
+        euler.append(np.asarray(samples['view_dirZ'], dtype=float) if 'view_dirZ' in samples else 0.0)
+        q = eulerQuat(*euler)
+        q[(euler[0] == MISSING_VALUE) | (euler[1] == MISSING_VALUE)] = np.nan
+    speed = np.full(len(t), np.nan)
+    if len(t) < 2:
+        return speed
+    dot = np.abs(np.sum(q[:-1] * q[1:], axis=-1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        angle = 2.0 * np.degrees(np.arccos(np.clip(dot, 0.0, 1.0)))
+        speed[1:] = angle / (np.diff(t) / 1000.0)
+    speed[1:][np.diff(t) <= 0.0] = np.nan
+    if group is not None:
+        g = np.asarray(samples[group])
+        speed[1:][g[1:] != g[:-1]] = np.nan
+    return speed
+
+
+def headMotionAccuracy(samples, target, prefix='gaze', bins=HEAD_VELOCITY_BINS,
+                       percentiles=(25, 50, 75, 95), group=None):
+    """ Gaze accuracy as a function of head angular velocity while fixating a
+    known world target, e.g. during the VOR block (see vorMetrics()).
+
+    Args:
+        samples: Recording or concatenated sample table (DataFrame or dict of
+            columns) with time, view orientation, <prefix>_posX/Y/Z and 
+            <prefix>_dirX/Y fields
+        target (3-tuple): World position of the fixation target
+        prefix (str): Gaze field prefix, e.g. 'gazeL' for left eye data
+        bins: Head velocity bin edges (degrees/s)
+        percentiles (list): Percentiles of gaze error to compute per bin
+        group (str): Column identifying recordings in a concatenated table
+
+    Returns: dict with per-sample arrays 'error' (degrees) and 'head_velocity'
+        (degrees/s), and 'binned' (see binnedStats())
+    """
+    with np.errstate(invalid='ignore'):
+        error = angleBetween(_directions(samples, prefix), 
+                             vectorToPoint(_positions(samples, prefix), target))
+    speed = headVelocity(samples, group=group)
+    return {'error': error, 'head_velocity': speed,
+            'binned': binnedStats(error, speed, bins, percentiles=percentiles)}
+
+
+def vorMetrics(samples, target=VOR_TARGET, prefix='gaze', bins=HEAD_VELOCITY_BINS, min_velocity=10.0):
+    """ Metrics of a VOR block, i.e. fixating a static world target while moving
+    the head. Eye-in-head angular velocity is estimated as gaze-in-world minus head
+    (view) angular velocity; head translation is not taken into account.
+
+    Args:
+        samples: Samples of the VOR block as DataFrame or dict of columns, with
+            time, view_dirX/Y, and <prefix>_posX/Y/Z, <prefix>_dirX/Y fields
+        target (3-tuple): World position of the fixation target
+        prefix (str): Gaze field prefix, e.g. 'gazeL' for left eye data
+        bins: Head velocity bin edges (degrees/s) for binned accuracy
+        min_velocity (float): Minimum head velocity (degrees/s) for gain estimation
+
+    Returns: dict with per-sample arrays 'time', 'error' (degrees to target),
+        'head_velocity' and 'gaze_velocity' (degrees/s), and summary values
+        'accuracy' (mean error), 'precision' (SD of error), 'gain' (VOR gain,
+        1.0 for perfect compensation of head rotation) and 'binned' (error per
+        head velocity bin, see headMotionAccuracy())
+    """
+    t = np.asarray(samples['time'], dtype=float)
+    gaze = _directions(samples, prefix)
+    head = _directions(samples, 'view')
+    acc = headMotionAccuracy(samples, target, prefix=prefix, bins=bins)
+    error = acc['error']
+    w_gaze = angularVelocity(t, gaze)
+    w_head = angularVelocity(t, head)
+    w_eye = w_gaze - w_head
+    head_speed = np.linalg.norm(w_head, axis=-1)
+
+    # Regression gain of eye velocity against (opposite) head velocity
+    with np.errstate(invalid='ignore'):
+        use = np.all(np.isfinite(w_eye), axis=-1) & (head_speed >= min_velocity)
+    gain = np.nan
+    if use.any():
+        gain = -np.sum(w_eye[use] * w_head[use]) / np.sum(w_head[use] * w_head[use])
+
+    return {'time': t, 'error': error, 'head_velocity': acc['head_velocity'],
+            'gaze_velocity': np.linalg.norm(w_gaze, axis=-1),
+            'accuracy': np.nanmean(error) if np.isfinite(error).any() else np.nan,
+            'precision': np.nanstd(error) if np.isfinite(error).any() else np.nan,
+            'gain': gain,
+            'binned': acc['binned']}
+
+
+def freeViewMetrics(samples, aois=None, prefix='gaze', **kwargs):
+    """ Metrics of a free-viewing block: fixation statistics and AOI dwell times
+
+    Args:
+        samples: Samples of the free-viewing block as DataFrame or dict of columns
+        aois: AOISet or scene description (see sceneAOIs()) to map gaze to. If None,
+            the recorded gaze3d_object_name column is used for dwell times, if present.
+        prefix (str): Gaze field prefix
+        **kwargs: Passed on to classifyGaze()
+
+    Returns: dict with 'duration' (block duration, ms), 'fixation_count',
+        'fixation_rate' (per s), 'fixation_duration_mean', 'fixation_duration_median'
+        (ms), 'saccade_amplitude_mean' (degrees), 'events' (see classifyGaze()), and
+        'dwell' (dict of dwell time in ms per AOI name) and 'fixations_per_aoi'
+    """
+    t = np.asarray(samples['time'], dtype=float)
+    (labels, ev) = classifyGaze(samples, prefix=prefix, **kwargs)
+    ev = {k: np.asarray(ev[k]) for k in ev.keys()}
+    fix = ev['label'] == GAZE_FIXATION
+    sac = ev['label'] == GAZE_SACCADE
+    duration = t[-1] - t[0] if len(t) > 1 else 0.0
+
+    out = {'duration': duration,
+           'fixation_count': int(fix.sum()),
+           'fixation_rate': fix.sum() / (duration / 1000.0) if duration > 0 else np.nan,
+           'fixation_duration_mean': np.mean(ev['duration'][fix]) if fix.any() else np.nan,
+           'fixation_duration_median': np.median(ev['duration'][fix]) if fix.any() else np.nan,
+           'saccade_amplitude_mean': np.nanmean(ev['amplitude'][sac]) if sac.any() else np.nan,
+           'events': ev}
+
+    # AOI of each sample
+    names = None
+    if aois is not None:
+        if not isinstance(aois, AOISet):
+            aois = sceneAOIs(aois)
+        idx = mapGazeToAOIs(samples, aois, prefix=prefix, angles=False)['aoi_index']
+        names = list(aois.names)
+    elif 'gaze3d_object_name' in samples:
+        obj = np.asarray(samples['gaze3d_object_name'])
+        if obj.dtype.kind == 'f':
+            # Column without any object hit is read as missing numbers
+            obj = np.full(obj.shape, '')
+        obj = obj.astype(str)
+        valid = np.isin(obj, ['', 'None'], invert=True)
+        (names, idx) = np.unique(obj, return_inverse=True)
+        idx = np.where(valid, idx.ravel(), -1)
+        names = names.tolist()
+
+    out['dwell'] = {}
+    out['fixations_per_aoi'] = {}
+    if names is not None and len(t) > 0:
+        # Each sample lasts until the next one
+        dt = np.diff(t, append=t[-1])
+        hit = idx >= 0
+        dwell = np.bincount(idx[hit], weights=dt[hit], minlength=len(names))
+        mid = (ev['start_index'][fix] + ev['end_index'][fix] - 1) // 2
+        fidx = idx[mid.astype(int)]
+        nfix = np.bincount(fidx[fidx >= 0], minlength=len(names))
+        for (k, name) in enumerate(names):
+            if dwell[k] > 0 or nfix[k] > 0:
+                out['dwell'][name] = dwell[k]
+                out['fixations_per_aoi'][name] = int(nfix[k])
+    return out
+
+
+def _sessionMetrics(args):
+    """ Block metrics of one session (worker function for analyzeSessions()) """
+    (session, target, aois, prefix) = args
+    if not isinstance(session, SegmentIndex):
+        session = SegmentIndex(*session)
+    return {'vor': [vorMetrics(s, target=target, prefix=prefix) for s in session.get('VOR')],
+            'freeview': [freeViewMetrics(s, aois=aois, prefix=prefix) for s in session.get('FREEVIEW')]}
+
+
+def analyzeSessions(sessions, target=VOR_TARGET, aois=None, prefix='gaze', workers=4):
+    """ Compute VOR and free-viewing block metrics for many sessions in parallel.
+    Blocks are located by their VOR_START/END and FREEVIEW_START/END events.
+
+    Args:
+        sessions: List of SegmentIndex objects or (samples, events) tuples
+        target (3-tuple): World position of the VOR fixation target
+        aois: AOISet or scene description for free-viewing dwell times, or a
+            list with one entry per session (e.g., each session's random scene)
+        prefix (str): Gaze field prefix
+        workers (int): Number of worker threads
+
+    Returns: list of dicts, one per session, with keys 'vor' and 'freeview', each
+        a list of metrics dicts (see vorMetrics(), freeViewMetrics()), one per block
+    """
+    if not isinstance(aois, (list, tuple)) or (len(aois) > 0 and isinstance(aois[0], dict)):
+        aois = [aois,] * len(sessions)
+    jobs = [(s, target, a, prefix) for (s, a) in zip(sessions, aois)]
+    if workers is None or workers <= 1:
+        return [_sessionMetrics(j) for j in jobs]
+    pool = ThreadPool(workers)
+    try:
+        return pool.map(_sessionMetrics, jobs)
+    finally:
+        pool.close()
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+# vexptoolbox: Vizard Toolbox for Behavioral Experiments
+# Live frame timing and sample repeat statistics for recordings
+
+import json
+
+
+class IntervalHistogram(object):
+
+    def __init__(self, bin_width=1.0, max_interval=100.0):
+        """ Fixed-bucket histogram of time intervals, updated in O(1).
+        Intervals above max_interval are counted in an overflow bucket.
+
+        Args:
+            bin_width (float): Bucket width in ms
+            max_interval (float): Upper edge of the last regular bucket, in ms
+        """
+        self.bin_width = float(bin_width)
+        self.max_interval = float(max_interval)
+        self.reset()
+
+
+    def reset(self):
+        """ Clear all counts """
+        self.counts = [0,] * (int(self.max_interval / self.bin_width) + 1)
+        self.n = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+
+    def add(self, interval):
+        """ Count a single interval (in ms) """
+        b = int(interval / self.bin_width)
+        if b < 0:
+            b = 0
+        elif b >= len(self.counts):
+            b = len(self.counts) - 1
+        self.counts[b] += 1
+        self.n += 1
+        self.total += interval
+        if self.min is None or interval < self.min:
+            self.min = interval
+        if self.max is None or interval > self.max:
+            self.max = interval
+
+
+    @property
+    def mean(self):
+        if self.n == 0:
+            return None
+        return self.total / self.n
+
+
+    def percentile(self, p):
+        """ Approximate percentile from bucket counts (bucket center)
+
+        Args:
+            p (float): Percentile, 0-100
+        """
+        if self.n == 0:
+            return None
+        target = self.n * p / 100.0
+        cum = 0
+        for b, c in enumerate(self.counts):
+            cum += c
+            if cum >= target and c > 0:
+                if b == len(self.counts) - 1:
+                    return self.max
+                return (b + 0.5) * self.bin_width
+        return self.max
+
+
+    def toDict(self):
+        """ Return histogram and summary statistics as a dict """
+        return {'n': self.n,
+                'mean': self.mean,
+                'min': self.min,
+                'max': self.max,
+                'p50': self.percentile(50),
+                'p95': self.percentile(95),
+                'p99': self.percentile(99),
+                'bin_width': self.bin_width,
+                'counts': list(self.counts)}
+
+
+
+class RecordingMonitor(object):
+
+    def __init__(self, eyes=('', 'L', 'R'), bin_width=1.0, max_interval=100.0, max_run=100):
+        """ Live data quality instrumentation for sample recordings. Keeps
+        inter-frame interval histograms, run-lengths of identical consecutive
+        gaze samples per eye (the online equivalent of the repeated_* metrics
+        in ValidationResult.recomputeMetrics), and frame number gaps. All
+        counters are updated in constant time per sample.
+
+        Args:
+            eyes (tuple): Eye labels to track ('' for combined gaze)
+            bin_width (float): Interval histogram bucket width in ms
+            max_interval (float): Largest interval histogram bucket in ms
+            max_run (int): Longest repeat run-length counted separately
+        """
+        self.eyes = tuple(eyes)
+        self.max_run = int(max_run)
+        self.time_hist = IntervalHistogram(bin_width, max_interval)
+        self.systime_hist = IntervalHistogram(bin_width, max_interval)
+        self.reset()
+
+
+    def reset(self):
+        """ Clear all statistics, e.g. when a new recording starts """
+        self.time_hist.reset()
+        self.systime_hist.reset()
+        self.samples = 0
+        self.frame_gaps = 0
+        self.dropped_frames = 0
+        self._last = None
+        self._last_gaze = {eye: None for eye in self.eyes}
+        self._run = {eye: 0 for eye in self.eyes}
+        self._eye_samples = {eye: 0 for eye in self.eyes}
+        self.repeats = {eye: 0 for eye in self.eyes}
+        self.longest_run = {eye: 0 for eye in self.eyes}
+        self.run_lengths = {eye: [0,] * (self.max_run + 1) for eye in self.eyes}
+
+
+    def newSegment(self):
+        """ Start a new data segment, e.g. when recording is resumed, so that
+        the pause is not counted as a frame interval or repeated sample. """
+        self._last = None
+        for eye in self.eyes:
+            self._endRun(eye)
+            self._last_gaze[eye] = None
+
+
+    def update(self, time, systime, frameno, gaze=None):
+        """ Add a single sample to the statistics
+
+        Args:
+            time (float): Vizard time stamp in ms
+            systime (float): System time stamp in ms
+            frameno (int): Vizard frame number
+            gaze (dict): Gaze direction per eye label, as {eye: (x, y, z)}
+        """
+        if self._last is not None:
+            (ltime, lsystime, lframeno) = self._last
+            self.time_hist.add(time - ltime)
+            self.systime_hist.add(systime - lsystime)
+            if frameno - lframeno > 1:
+                self.frame_gaps += 1
+                self.dropped_frames += frameno - lframeno - 1
+        self._last = (time, systime, frameno)
+        self.samples += 1
+
+        if gaze is not None:
+            for eye, vec in gaze.items():
+                if eye not in self._run:
+                    continue
+                self._eye_samples[eye] += 1
+                if vec == self._last_gaze[eye]:
+                    self._run[eye] += 1
+                    self.repeats[eye] += 1
+                    if self._run[eye] > self.longest_run[eye]:
+                        self.longest_run[eye] = self._run[eye]
+                else:
+                    self._endRun(eye)
+                    self._last_gaze[eye] = vec
+
+
+    def _endRun(self, eye):
+        """ Count a finished run of repeated samples """
+        run = self._run[eye]
+        if run > 0:
+            self.run_lengths[eye][min(run, self.max_run)] += 1
+            self._run[eye] = 0
+
+
+    def summary(self):
+        """ Return current statistics as a dict. Can be called at any time,
+        e.g. to abort a session with poor data quality early. """
+        s = {'samples': self.samples,
+             'frame_gaps': self.frame_gaps,
+             'dropped_frames': self.dropped_frames,
+             'interval_time': self.time_hist.toDict(),
+             'interval_systime': self.systime_hist.toDict()}
+
+        for eye in self.eyes:
+            label = eye if eye != '' else 'C'
+            runs = list(self.run_lengths[eye])
+            if self._run[eye] > 0:
+                runs[min(self._run[eye], self.max_run)] += 1 # include ongoing run
+            s['repeated_{:s}'.format(label)] = None
+            if self._eye_samples[eye] > 1:
+                s['repeated_{:s}'.format(label)] = self.repeats[eye] / float(self._eye_samples[eye] - 1)
+            s['longest_run_{:s}'.format(label)] = self.longest_run[eye]
+            s['run_lengths_{:s}'.format(label)] = runs
+        return s
+
+
+    def toJSONFile(self, json_file):
+        """ Save current statistics to a JSON file
+
+        Args:
+            json_file (str): Output file name
+        """
+        with open(json_file, 'w') as jf:
+            jf.write(json.dumps(self.summary()))
+
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+
+# vexptoolbox: Vizard Toolbox for Behavioral Experiments
+# Multi-resolution min/max/mean overview of recorded signals
+
+import csv
+import array
+import pickle
+import bisect
+
+from .data import MISSING_VALUE, _HAS_SCI_PKGS
+
+if _HAS_SCI_PKGS:
+    import matplotlib.pyplot as plt
+
+# Signals included in the overview by default
+OVERVIEW_SIGNALS = ['gaze_dirX', 'gaze_dirY', 'view_dirX', 'view_dirY', 'view_dirZ',
+                    'pupil_size', 'gaze3d_valid']
+
+
+class OverviewPyramid(object):
+
+    def __init__(self, signals=None, min_level=3):
+        """ Min / max / mean pyramid of recorded signals at power-of-two decimation
+        levels, built in a single streaming pass (one add() call per sample,
+        amortized constant time). Level k summarizes buckets of 2^(min_level + k)
+        samples, so a timeline or plot of any time range can be drawn from about
+        as many buckets as there are pixels (see query()).
+
+        Missing values (None, NaN, or the MISSING_VALUE marker) are ignored.
+        Buckets without valid data have NaN statistics.
+
+        Args:
+            signals (list): Sample fields to summarize, default: OVERVIEW_SIGNALS
+            min_level (int): Finest level stored, as log2 of the bucket size
+        """
+        if signals is None:
+            signals = OVERVIEW_SIGNALS
+        self.signals = list(signals)
+        self.min_level = int(min_level)
+        self.reset()
+
+
+    def reset(self):
+        """ Clear all data """
+        self.count = 0
+        self.levels = []
+        self._acc = []
+        self._frozen = False
+
+
+    def _newLevel(self):
+        """ Add storage and accumulator for the next coarser level """
+        level = {'t0': array.array('d'), 't1': array.array('d')}
+        for stat in ['min', 'max', 'mean']:
+            level[stat] = {sig: array.array('d') for sig in self.signals}
+        self.levels.append(level)
+        self._acc.append(None)
+
+
+    def _emptyAcc(self, t0):
+        """ Accumulator for one bucket: [t0, t1, children, {signal: [min, max, sum, n]}] """
+        return [t0, t0, 0, {sig: [None, None, 0.0, 0] for sig in self.signals}]
+
+
+    def add(self, sample):
+        """ Add a single sample dict (with 'time' and signal fields) """
+        if self._frozen:
+            raise RuntimeError('Overview loaded from file cannot be extended!')
+        if len(self.levels) == 0:
+            self._newLevel()
+
+        t = sample['time']
+        acc = self._acc[0]
+        if acc is None:
+            acc = self._emptyAcc(t)
+            self._acc[0] = acc
+        acc[1] = t
+        acc[2] += 1
+        stats = acc[3]
+        get = sample.get
+        for sig in self.signals:
+            v = get(sig)
+            if v is None or v != v or v == MISSING_VALUE:
+                continue
+            s = stats[sig]
+            if s[3] == 0:
+                s[0] = v
+                s[1] = v
+            elif v < s[0]:
+                s[0] = v
+            elif v > s[1]:
+                s[1] = v
+            s[2] += v
+            s[3] += 1
+        self.count += 1
+
+        if acc[2] == 2 ** self.min_level:
+            self._emit(0)
+
+
+    def _emit(self, k):
+        """ Store the completed bucket of level k and merge it into level k+1 """
+        acc = self._acc[k]
+        self._store(self.levels[k], acc)
+        self._acc[k] = None
+
+        if k + 1 == len(self.levels):
+            self._newLevel()
+        parent = self._acc[k + 1]
+        if parent is None:
+            parent = self._emptyAcc(acc[0])
+            self._acc[k + 1] = parent
+        self._merge(parent, acc)
+        parent[2] += 1
+        if parent[2] == 2:
+            self._emit(k + 1)
+
+
+    def _merge(self, acc, other):
+        """ Combine statistics of another bucket accumulator into acc """
+        acc[1] = other[1]
+        for sig in self.signals:
+            (s, o) = (acc[3][sig], other[3][sig])
+            if o[3] == 0:
+                continue
+            if s[3] == 0 or o[0] < s[0]:
+                s[0] = o[0]
+            if s[3] == 0 or o[1] > s[1]:
+                s[1] = o[1]
+            s[2] += o[2]
+            s[3] += o[3]
+
+
+    def _store(self, level, acc):
+        """ Append bucket statistics to the arrays of a level """
+        level['t0'].append(acc[0])
+        level['t1'].append(acc[1])
+        for sig in self.signals:
+            s = acc[3][sig]
+            if s[3] == 0:
+                s = [float('nan'), float('nan'), float('nan'), 1]
+            level['min'][sig].append(s[0])
+            level['max'][sig].append(s[1])
+            level['mean'][sig].append(s[2] / s[3])
+
+
+    def _tail(self, k):
+        """ Accumulator for the incomplete last bucket of level k, or None """
+        tail = None
+        # Higher levels hold the older samples
+        for j in range(min(k, len(self._acc) - 1), -1, -1):
+            acc = self._acc[j]
+            if acc is None:
+                continue
+            if tail is None:
+                tail = self._emptyAcc(acc[0])
+            self._merge(tail, acc)
+        return tail
+
+
+    def getLevel(self, k):
+        """ Returns a copy of level k, including the incomplete last bucket
+
+        Returns: dict with 't0', 't1' (bucket start and end times) and 'min',
+            'max', 'mean' dicts of value arrays per signal
+        """
+        level = self.levels[k]
+        out = {'t0': array.array('d', level['t0']), 't1': array.array('d', level['t1'])}
+        for stat in ['min', 'max', 'mean']:
+            out[stat] = {sig: array.array('d', level[stat][sig]) for sig in self.signals}
+        tail = self._tail(k)
+        if tail is not None:
+            self._store(out, tail)
+        return out
+
+
+    def query(self, signal, start=None, end=None, pixels=1000):
+        """ Return bucket statistics of one signal for a time range, at the finest
+        level with no more than the given number of buckets. Reads O(pixels)
+        values. If the range is shorter than pixels * 2^min_level samples, the
+        finest stored level is returned (raw samples can be read instead).
+
+        Args:
+            signal (str): Signal name
+            start, end (float): Time range in recorded time stamps (ms), default: all
+            pixels (int): Maximum number of buckets to return
+
+        Returns: dict of lists 't0', 't1', 'min', 'max', 'mean' and 'level' (int)
+        """
+        if signal not in self.signals:
+            raise ValueError('Signal not included in overview: {:s}'.format(str(signal)))
+        out = {'level': None, 't0': [], 't1': [], 'min': [], 'max': [], 'mean': []}
+        if len(self.levels) == 0:
+            return out
+        if start is None:
+            start = float('-inf')
+        if end is None:
+            end = float('inf')
+
+        for k in range(0, len(self.levels)):
+            level = self.levels[k]
+            i0 = bisect.bisect_left(level['t1'], start)
+            i1 = bisect.bisect_right(level['t0'], end)
+            tail = self._tail(k)
+            n = i1 - i0
+            if tail is not None and tail[0] <= end and tail[1] >= start:
+                n += 1
+            if n <= pixels or k == len(self.levels) - 1:
+                break
+
+        out['level'] = k
+        out['t0'] = level['t0'][i0:i1].tolist()
+        out['t1'] = level['t1'][i0:i1].tolist()
+        for stat in ['min', 'max', 'mean']:
+            out[stat] = level[stat][signal][i0:i1].tolist()
+        if tail is not None and tail[0] <= end and tail[1] >= start:
+            s = tail[3][signal]
+            out['t0'].append(tail[0])
+            out['t1'].append(tail[1])
+            if s[3] == 0:
+                s = [float('nan'), float('nan'), float('nan'), 1]
+            out['min'].append(s[0])
+            out['max'].append(s[1])
+            out['mean'].append(s[2] / s[3])
+        return out
+
+
+    def toFile(self, overview_file):
+        """ Save overview to a pickle file, including incomplete last buckets
+
+        Args:
+            overview_file (str): Output file name
+        """
+        data = {'version': 1,
+                'signals': self.signals,
+                'min_level': self.min_level,
+                'count': self.count,
+                'levels': [self.getLevel(k) for k in range(0, len(self.levels))]}
+        with open(overview_file, 'wb') as of:
+            pickle.dump(data, of, protocol=2)
+
+
+    @classmethod
+    def fromFile(cls, overview_file):
+        """ Load a saved overview (read-only)
+
+        Args:
+            overview_file (str): File name written by toFile()
+        """
+        with open(overview_file, 'rb') as f:
+            data = pickle.load(f)
+        ov = cls(signals=data['signals'], min_level=data['min_level'])
+        ov.count = data['count']
+        ov.levels = data['levels']
+        ov._acc = [None,] * len(ov.levels)
+        ov._frozen = True
+        return ov
+
+
+    if _HAS_SCI_PKGS:
+        def plot(self, signals=None, start=None, end=None, pixels=1000):
+            """ Plot min/max range and mean of signals over time
+
+            Args:
+                signals (list): Signals to plot, default: all
+                start, end (float): Time range in recorded time stamps (ms)
+                pixels (int): Maximum number of buckets per signal
+            """
+            if signals is None:
+                signals = self.signals
+            fig, axes = plt.subplots(len(signals), 1, sharex=True, squeeze=False,
+                                     figsize=(10, 1.5 * len(signals)))
+            for (ax, sig) in zip(axes[:, 0], signals):
+                q = self.query(sig, start=start, end=end, pixels=pixels)
+                t = [(a + b) / 2000.0 for (a, b) in zip(q['t0'], q['t1'])]
+                ax.fill_between(t, q['min'], q['max'], color='0.8', linewidth=0)
+                ax.plot(t, q['mean'], 'k-', linewidth=0.8)
+                ax.set_ylabel(sig)
+            axes[-1, 0].set_xlabel('Time (s)')
+            return fig
+
+
+
+def buildOverview(sample_file, overview_file=None, signals=None, min_level=3, sep='\t'):
+    """ Build an overview pyramid from a saved sample file in one streaming pass
+
+    Args:
+        sample_file (str): Sample file written by SampleRecorder.saveRecording()
+        overview_file (str): if set, save overview to this file
+        signals (list): Signals to summarize, default: OVERVIEW_SIGNALS
+        min_level (int): Finest level stored, as log2 of the bucket size
+        sep (str): Field separator in sample file
+
+    Returns: OverviewPyramid object
+    """
+    with open(sample_file, 'r') as sf:
+        reader = csv.reader(sf, delimiter=sep)
+        header = next(reader)
+        if signals is None:
+            signals = [s for s in OVERVIEW_SIGNALS if s in header]
+        ov = OverviewPyramid(signals=signals, min_level=min_level)
+        cols = [(f, header.index(f)) for f in ['time'] + ov.signals if f in header]
+        for row in reader:
+            sample = {}
+            for (f, i) in cols:
+                try:
+                    sample[f] = float(row[i])
+                except ValueError:
+                    pass
+            ov.add(sample)
+
+    if overview_file is not None:
+        ov.toFile(overview_file)
+    return ov
@@ -3,12 +3,15 @@
 # vexptoolbox: Vizard Toolbox for Behavioral Experiments
 # Gaze and object tracking and recording class
 
+import os
 import sys
 import csv
+import json
 import time
 import math
 import copy 
 import random 
+import itertools
 import pickle
 
 import viz
@@ -18,8 +21,19 @@ import viztask
 import vizshape
 
 from .data import *
+from .data import _HAS_NUMPY
 from .stats import *
 from .eyeball import Eyeball
+from .sampler import ThreadedSampler, TaskWorker
+from .monitor import RecordingMonitor
+from .dwell import DwellTracker
+from .fixation import FixationDetector, detectFixations
+from .overview import OverviewPyramid
+
+if _HAS_NUMPY:
+    import numpy as np
+    from .geometry import gazeTargetErrors, gazeAngles
+    from .aoi import AOISet
 
 # Python version compatibility
 if sys.version_info[0] == 3:
@@ -27,10 +41,16 @@ if sys.version_info[0] == 3:
 else:
     from time import clock as perf_counter	
 
+# Eye tracker plugins that are safe to read outside the Vizard main thread (see eye_rate)
+THREADED_EYE_TRACKERS = ['ViveProEyeTracker']
+
 VALIDATION_START_EVENT = viz.getEventID('EyeTrackerValidationStart')
 VALIDATION_END_EVENT = viz.getEventID('EyeTrackerValidationEnd')
 RECORDING_START_EVENT = viz.getEventID('RecordingStartEvent')
 RECORDING_END_EVENT = viz.getEventID('RecordingEndEvent')
+GAZE_DWELL_EVENT = viz.getEventID('GazeDwellEvent')
+FIXATION_START_EVENT = viz.getEventID('FixationStartEvent')
+FIXATION_END_EVENT = viz.getEventID('FixationEndEvent')
 
 
 class SampleRecorder(object):
@@ -38,7 +58,8 @@ class SampleRecorder(object):
     def __init__(self, eye_tracker=None, tracked_nodes=None, DEBUG=False, missing_val=-99999.0,
                  cursor=False, key_calibrate='c', key_preview='p', key_validate='v',
                  targets=VAL_TAR_CR10, prealloc=324000, priority=viz.PRIORITY_PLUGINS+1,
-                 tracked_nodes_rf=viz.ABS_GLOBAL):
+                 tracked_nodes_rf=viz.ABS_GLOBAL, eye_rate=None, fixations=None,
+                 overview=False):
         """ Eye movement recording and accuracy/precision measurement class.
 
         Args:
@@ -55,6 +76,15 @@ class SampleRecorder(object):
                 Python list extension. Default should be good for 60 min at 90 Hz.
             priority: Vizard priority value to apply to sample collection task
             tracked_nodes_rf: Reference frame for tracked nodes, default: viz.ABS_GLOBAL
+            eye_rate (float): if set, poll the eye tracker at this rate (Hz) in a separate 
+                thread while recording, and add the closest eye sample to each frame.
+                Only supported for trackers listed in THREADED_EYE_TRACKERS.
+            fixations: 'ivt' or 'idt' to detect fixations in gaze-in-world data on each
+                frame using default thresholds, or a FixationDetector object. Fixation
+                start and end are logged as FIX_START / FIX_END events while recording.
+            overview (bool): if True, build a min/max/mean overview pyramid of key
+                signals while recording (see getOverview()), saved with the recording
+                as <sample_file>_overview.pkl
         """
         self.debug = DEBUG
         self.priority = priority
@@ -63,6 +93,8 @@ class SampleRecorder(object):
         self._tracker = None
         self._tracker_type = None
         self._tracker_has_eye_flag = False
+        self._eye_rate = eye_rate
+        self._eye_sampler = None
         if eye_tracker is not None:
             self.addEyeTracker(eye_tracker)
 
@@ -85,6 +117,20 @@ class SampleRecorder(object):
         self._gaze3d_intersect = None
         self._gaze3d_intersect_name = ''
         self._gaze3d_last_valid = None
+        self._dwell = DwellTracker()
+
+        # Online fixation detection
+        self._fixations = None
+        if fixations is not None:
+            if isinstance(fixations, FixationDetector):
+                self._fixations = fixations
+            else:
+                self._fixations = FixationDetector(method=fixations)
+
+        # Registered areas of interest (see addAOI())
+        self._aois = None
+        self._aoi_hit = None
+        self.aoi_fallback = False # if True, intersect the full scene when no AOI is hit
 
         # Sample recording task
         self.recording = False
@@ -93,8 +139,13 @@ class SampleRecorder(object):
         self._samples_idx = 0
         self._prealloc = prealloc
         self._val_samples = []
-        self._events = []
+        self._val_acc = None
+        self._events = EventBuffer()
         self._customvars = ParamSet()
+        self._monitor = RecordingMonitor()
+        self._overview = None
+        if overview:
+            self._overview = OverviewPyramid()
         self._recorder = vizact.onupdate(self.priority, self._onUpdate)
 
         # Gaze validation
@@ -103,6 +154,10 @@ class SampleRecorder(object):
         self.tar_plane_color = [0.4, 0.4, 0.4]
         self._validation_results = []
         self._default_targets = targets
+        self._val_root = None
+        self._val_bg = None
+        self._val_planes = {}
+        self._val_pool = {}
         
         # Gaze cursor
         self._cursor = vizshape.addSphere(radius=0.05, color=[1.0, 0.0, 0.0])
@@ -201,7 +256,14 @@ class SampleRecorder(object):
             s['{:s}_X'.format(lbl)] = vec[0]
             s['{:s}_Y'.format(lbl)] = vec[1]
             s['{:s}_Z'.format(lbl)] = vec[2]
-        
+
+        # Low-memory mode: update target metrics, discard sample
+        if self._val_acc is not None:
+            for eye in self._val_acc.eyes:
+                self._sampleErrors([s], eye, self._val_acc.tgtHMD)
+            self._val_acc.add(s)
+            return
+
         self._val_samples.append(s)
  
     
@@ -212,6 +274,51 @@ class SampleRecorder(object):
         return s
         
     
+    def _pollEyeTracker(self):
+        """ Read current tracker-space eye data, called by the sampling thread """
+        if self._tracker is None:
+            return None
+
+        # Note: this runs outside the Vizard main thread, and is only enabled for
+        # tracker plugins listed in THREADED_EYE_TRACKERS (see addEyeTracker()).
+        # These keep their own device data thread, and getMatrix() returns a copy
+        # of the last received sample. Python-side sensors that are updated from
+        # the Vizard update loop (e.g. linked nodes) are not safe to read here.
+
+        eyes = {'eye': self._tracker.getMatrix()}
+        if self._tracker_has_eye_flag:
+            eyes['eyeL'] = self._tracker.getMatrix(flag=viz.LEFT_EYE)
+            eyes['eyeR'] = self._tracker.getMatrix(flag=viz.RIGHT_EYE)
+
+        s = {}
+        for lbl, eye_matrix in eyes.items():
+            p = eye_matrix.getPosition()
+            d = eye_matrix.getEuler()
+            s['{:s}_posX'.format(lbl)] = p[0]
+            s['{:s}_posY'.format(lbl)] = p[1]
+            s['{:s}_posZ'.format(lbl)] = p[2]
+            s['{:s}_dirX'.format(lbl)] = d[0]
+            s['{:s}_dirY'.format(lbl)] = d[1]
+            s['{:s}_dirZ'.format(lbl)] = d[2]
+
+        if self._tracker_type == 'ViveProEyeTracker':
+            s['eye_pupil_size'] = self._tracker.getPupilDiameter(viz.BOTH_EYE)
+        return s
+
+
+    def getEyeSamples(self, since=0):
+        """ Return samples recorded by the high-rate eye sampling thread 
+        (see eye_rate argument) as a list of dicts. Eye data is in tracker
+        space, time stamps ('eye_time') use the same clock as 'systime'.
+
+        Args:
+            since (int): Return only samples with eye_index >= since
+        """
+        if self._eye_sampler is None:
+            raise RuntimeError('High-rate eye sampling is not enabled, set eye_rate when creating the SampleRecorder and use a tracker listed in THREADED_EYE_TRACKERS!')
+        return self._eye_sampler.buffer.read(since=since)
+
+
     def addEyeTracker(self, eye_tracker, replace=False):
         """ Sets the eye tracking device to record samples from.
         
@@ -229,6 +336,18 @@ class SampleRecorder(object):
         if self._tracker_type in ['ViveProEyeTracker']:
             # Trackers supporting monocular data via the sensor flag parameter
             self._tracker_has_eye_flag = True
+
+        # Optional high-rate eye tracker sampling thread
+        if self._eye_sampler is not None:
+            self._eye_sampler.stop()
+            self._eye_sampler = None
+        if self._eye_rate is not None:
+            if self._tracker_type in THREADED_EYE_TRACKERS:
+                self._eye_sampler = ThreadedSampler(self._pollEyeTracker, rate=self._eye_rate)
+            else:
+                err = 'Warning: {:s} is not known to be safe to read from a separate thread, eye_rate is ignored. '
+                err += 'Add it to vexptoolbox.THREADED_EYE_TRACKERS to enable high-rate sampling.'
+                print(err.format(self._tracker_type))
         self._dlog('Added eye tracker: {:s}.'.format(self._tracker_type))
 
 
@@ -248,6 +367,98 @@ class SampleRecorder(object):
         self._dlog('Added tracked node: {:s} (ID: {:d}).'.format(label, node.id))
 
 
+    def addAOI(self, node, shape='sphere', size=None, name=None, axis='y', static=True):
+        """ Register a node as area of interest (AOI) for fast gaze hit testing.
+        Registered AOIs are tested against the gaze ray on each frame using simple
+        bounding shapes, and the current AOI is stored as 'gaze3d_aoi' sample field.
+        Once AOIs are registered, the current gaze target is determined from AOIs 
+        only and full scene intersection is skipped. Set the aoi_fallback attribute
+        to True to intersect the scene on frames where no AOI is hit.
+
+        Args:
+            node: Vizard node to register
+            shape (str): Bounding shape, 'sphere', 'box', or 'plane'
+            size: Sphere radius, box size (X, Y, Z), or plane size (see AOISet.add()),
+                in node coordinates. Default: use the node's bounding sphere or box
+            name (str): AOI name for log files, default: 'aoi_<node id>'
+            axis (str): Normal axis of a plane AOI ('x', 'y' or 'z')
+            static (bool): Set to False for nodes that move during the experiment
+        """
+        if not _HAS_NUMPY:
+            raise RuntimeError('AOI hit testing requires NumPy, which could not be imported!')
+        if self._aois is None:
+            self._aois = AOISet()
+
+        center = [0.0, 0.0, 0.0]
+        if size is None:
+            if shape == 'sphere':
+                bs = node.getBoundingSphere(viz.REL_LOCAL)
+                (size, center) = (bs.radius, bs.center)
+            else:
+                bb = node.getBoundingBox(viz.REL_LOCAL)
+                (size, center) = (bb.size, bb.center)
+                if shape == 'plane':
+                    size = [v for (i, v) in enumerate(size) if i != 'xyz'.index(axis.lower())]
+        if name is None:
+            name = 'aoi_{:d}'.format(node.id)
+
+        self._aois.add(shape=shape, size=size, matrix=node.getMatrix(viz.ABS_GLOBAL).get(), center=center,
+                       axis=axis, name=name, key=node, static=static)
+        self._dlog('Added AOI: {:s} (ID: {:d}, {:s}).'.format(name, node.id, shape))
+
+
+    def removeAOI(self, node):
+        """ Remove all AOIs registered for the given node """
+        if self._aois is not None:
+            self._aois.remove(node)
+
+
+    def updateAOIs(self, static=False):
+        """ Update AOI positions from their nodes. Dynamic AOIs are updated 
+        automatically on each frame. 
+        
+        Args:
+            static (bool): if True, also update static AOIs (e.g., after 
+                repositioning scene objects)
+        """
+        if self._aois is None:
+            return
+        if static:
+            indices = range(0, len(self._aois))
+        else:
+            indices = self._aois.dynamic
+        for i in indices:
+            self._aois.setMatrix(i, self._aois.keys[i].getMatrix(viz.ABS_GLOBAL).get())
+
+
+    def getCurrentAOI(self):
+        """ Returns the node of the AOI currently hit by the gaze ray, or None """
+        if self._aoi_hit is None:
+            return None
+        return self._aois.keys[self._aoi_hit[0]]
+
+
+    def getCurrentFixation(self):
+        """ Returns the ongoing fixation as a dict (see FixationDetector), or None
+        if no fixation is in progress or fixation detection is disabled """
+        if self._fixations is None:
+            return None
+        return self._fixations.current
+
+
+    def _onFixation(self, ev):
+        """ Log and broadcast fixation events from the online detector """
+        if ev['type'] == 'FIX_START':
+            if self.recording:
+                self.recordEvent('FIX_START', start=ev['start'], x=ev['x'], y=ev['y'])
+            viz.sendEvent(FIXATION_START_EVENT, ev)
+        else:
+            if self.recording:
+                self.recordEvent('FIX_END', start=ev['start'], duration=ev['duration'],
+                                 x=ev['x'], y=ev['y'])
+            viz.sendEvent(FIXATION_END_EVENT, ev)
+
+
     def getCurrentGazePoint(self):
         """ Returns the current 3d gaze point if gaze intersects with the scene. """
         return self._gaze3d
@@ -286,6 +497,33 @@ class SampleRecorder(object):
         return self._gaze3d_last_valid
 
 
+    def _nodeDict(self, objects):
+        """ Return a dict of {node id: node} from a list or dict of nodes """
+        if type(objects) == dict:
+            return {obj.id: obj for obj in objects.values()}
+        return {obj.id: obj for obj in objects}
+
+
+    def _waitFor(self, waiter):
+        """ Task that waits until a DwellTracker waiter is resolved, and
+        removes the waiter if the task is killed before """
+        try:
+            yield viztask.waitTrue(waiter.done)
+        finally:
+            self._dwell.cancel(waiter)
+
+
+    def _onDwell(self, node_id):
+        """ Callback for completed dwell selections """
+        viz.sendEvent(GAZE_DWELL_EVENT, node_id)
+
+
+    def getDwellTime(self, node):
+        """ Returns the time in seconds for which the given node has been 
+        continuously fixated, or 0.0 if it is not the current gaze target """
+        return self._dwell.dwell.get(node.id, 0.0)
+
+
     def waitGazeNearTarget(self, target, tolerance=2.0):
         """ Wait until gaze is on (or close to) a target position 
         
@@ -293,43 +531,27 @@ class SampleRecorder(object):
             target (3-tuple): target position (X, Y, Z) in world space
             tolerance (float): Gaze error tolerance in degrees
         """
-        gaze_err = 9999
-        while gaze_err >= tolerance:
+        def gaze_near():
             eyeTarVec = vizmat.VectorToPoint(self._gazemat.getPosition(), target)
             eyeGazeVec = self._gazemat.getForward()
-            gaze_err = vizmat.AngleBetweenVector(eyeGazeVec, eyeTarVec) 
-            yield viztask.waitTime(0.008)
+            return vizmat.AngleBetweenVector(eyeGazeVec, eyeTarVec) < tolerance
+
+        yield self._waitFor(self._dwell.addCondition(gaze_near))
 
 
     def waitGazeDwell(self, objects, dwell=0.5):
         """ Wait until one out of multiple objects is fixated for a 
-        certain amount of time, return the fixated (selected) node 
+        certain amount of time, return the fixated (selected) node.
+        Sends a GAZE_DWELL_EVENT with the selected node ID.
 
         Args:
             objects: list of nodes, or dict with nodes as values
             dwell (float): Selection dwell time in seconds
         """
-        if type(objects) == dict:
-            o = {obj.id: obj for obj in objects.values()}
-        else:
-            o = {obj.id: obj for obj in objects}
-        d = {id: 0.0 for id in o.keys()}
-
-        while True:
-            dt = viz.getFrameElapsed()
-            if self._gaze3d_valid:
-                for id in o.keys():
-                    if self._gaze3d_intersect == o[id]:
-                        d[id] += dt
-                    else:
-                        # Reset dwell for all non-fixated targets
-                        d[id] = 0.0
-
-            yield viztask.waitTime(0.008)
-            
-            for id in d.keys():
-                if d[id] >= dwell:
-                    viztask.returnValue(o[id])
+        o = self._nodeDict(objects)
+        waiter = self._dwell.addDwell(o.keys(), dwell, callback=self._onDwell)
+        yield self._waitFor(waiter)
+        viztask.returnValue(o[waiter.result])
 
     
     def waitGazeSelectionFeedback(self, objects, dwell=0.5, highlight_color=None, 
@@ -337,6 +559,7 @@ class SampleRecorder(object):
         """ Wait until one out of multiple objects is selected by
         fixating for a given dwell time. Highlights the currently fixated
         object and gives visual feedback of selection.
+        Sends a GAZE_DWELL_EVENT with the selected node ID.
         
         Args:
             objects: list of nodes, or dict with nodes as values
@@ -345,43 +568,33 @@ class SampleRecorder(object):
             select_color (3-tuple): Color to set the selected object to
             feedback_dur (float): Duration of color feedback in seconds
         """
-        if type(objects) == dict:
-            o = {obj.id: obj for obj in objects.values()}
-        else:
-            o = {obj.id: obj for obj in objects}
-        d = {id: 0.0 for id in o.keys()}
+        o = self._nodeDict(objects)
         h = {id: o[id].getEmissive() for id in o.keys()}
         c = {id: o[id].getColor() for id in o.keys()}
 
-        while True:
-            last_id = -1
-            dt = viz.getFrameElapsed()
-            if self._gaze3d_valid:
-                for id in o.keys():
-                    if self._gaze3d_intersect == o[id]:
-                        d[id] += dt
-                        last_id = id
-                    else:
-                        d[id] = 0.0 # reset dwell
-
-            if highlight_color is not None:
-                for id in o.keys():
-                    if id == last_id:
-                        o[id].emissive(highlight_color)
-                    else:
-                        o[id].emissive(h[id])
-
-            yield viztask.waitTime(0.008)
-            
-            for id in d.keys():
+        def highlight(old_id, new_id):
+            if old_id in o:
+                o[old_id].emissive(h[old_id])
+            if new_id in o:
+                o[new_id].emissive(highlight_color)
+
+        if highlight_color is not None:
+            self._dwell.addListener(highlight)
+            highlight(None, self._dwell.visible)
+        waiter = self._dwell.addDwell(o.keys(), dwell, callback=self._onDwell)
+        try:
+            yield self._waitFor(waiter)
+        finally:
+            self._dwell.removeListener(highlight)
+            for id in o.keys():
                 o[id].emissive(h[id]) # make sure to reset all highlights
-                if d[id] >= dwell:
-                    
-                    if select_color is not None and feedback_dur > 0:
-                        o[id].color(select_color)
-                        yield viztask.waitTime(feedback_dur)
-                        o[id].color(c[id])
-                    viztask.returnValue(o[id])
+
+        id = waiter.result
+        if select_color is not None and feedback_dur > 0:
+            o[id].color(select_color)
+            yield viztask.waitTime(feedback_dur)
+            o[id].color(c[id])
+        viztask.returnValue(o[id])
 
 
     def waitNodeNearTarget(self, node, pos, distance=0.05):
@@ -394,13 +607,11 @@ class SampleRecorder(object):
             pos (3-tuple): 3D coordinate in world space
             distance (float): Minimal distance to trigger position
         """
-        d = 99999
-        while d >= distance:
-            p = node.getPosition(viz.ABS_GLOBAL)
-            d = vizmat.Distance(p, pos)
-            if d < distance:
-                return
-            yield viztask.waitTime(0.008)
+        def node_near():
+            return vizmat.Distance(node.getPosition(viz.ABS_GLOBAL), pos) < distance
+
+        if not node_near():
+            yield self._waitFor(self._dwell.addCondition(node_near))
 
     
     def waitObserverPosition(self, pos, radius=0.2):
@@ -414,16 +625,15 @@ class SampleRecorder(object):
                 the Y value is ignored)
             radius (float): Minimal distance to trigger position
         """
-        d = 99999
         if len(pos) == 2:
-            pos = [pos[0], 0, pos[2]]
-        while d >= radius:
+            pos = [pos[0], 0, pos[1]]
+
+        def observer_near():
             p = viz.MainView.getPosition(viz.ABS_GLOBAL)
-            d = vizmat.Distance([p[0], 0, p[2]], 
-                                [pos[0], 0, p[2]])
-            if d < radius:
-                return
-            yield viztask.waitTime(0.008)
+            return vizmat.Distance([p[0], 0, p[2]], [pos[0], 0, pos[2]]) < radius
+
+        if not observer_near():
+            yield self._waitFor(self._dwell.addCondition(observer_near))
 
 
     def showGazeCursor(self, visible):
@@ -432,76 +642,58 @@ class SampleRecorder(object):
 
 
     def getValResults(self):
-        """ Return results of all eye tracker validations performed as a list """
-        return copy.deepcopy(self._validation_results)
+        """ Return results of all eye tracker validations performed as a list.
+        Sample data is only copied if a returned result is accessed or changed. """
+        return [v.copy() for v in self._validation_results]
 
 
     def getLastValResult(self):
         """ Return a copy of the ValidationResult object resulting from the most
         recent gaze validation measurement. """
         if len(self._validation_results) > 0:
-            return copy.deepcopy(self._validation_results[-1])
+            return self._validation_results[-1].copy()
         else:
             return None
 
 
-    def _getRawRecording(self, clear=True):
-        """ Return last recording data as list of dicts """
+    def _getRawRecording(self, clear=True, summary=False):
+        """ Return last recording data as list of dicts. If summary is True, 
+        also return a dict of recording summaries ('stats': data quality statistics,
+        'overview': copy of the OverviewPyramid or None), which are otherwise lost 
+        when the recording is cleared. """
         sidx = self._samples_idx
         rec_s = copy.copy(self._samples)
-        rec_e = copy.copy(self._events)
+        rec_e = self._events.rows(fields=True)
         if sidx < self._prealloc:
             rec_s = rec_s[0:sidx]
+        if summary:
+            rec_sum = {'stats': self._monitor.summary(),
+                       'overview': copy.deepcopy(self._overview)}
         if clear:
             self.clearRecording(samples=True, events=True)        
+        if summary:
+            return (rec_s, rec_e, rec_sum)
         return (rec_s, rec_e)
 
 
-    def getLastRecording(self, clear=False):
+    def getLastRecording(self, clear=False, output='dict'):
         """ Return last sample recording as a (samples, events) tuple, each with 
         a dictionary of sample data lists for each data stream (i.e., samples.time[0:10]). 
 
         Args:
             clear (bool): if True, clear data afterwards (also stops recording if active)
+            output (str): 'dict' for lists (default), 'numpy' for NumPy arrays,
+                or 'pandas' for DataFrames (see vexptoolbox.transposeSamples())
         """
-        samples = {}
-        events = {}
-
         if self.recording:
             print('getLastRecording(): Recording is still active, data may be incomplete!')
 
-        sidx = self._samples_idx
-        rec_s = copy.copy(self._samples)
-        rec_e = copy.copy(self._events)
-        if sidx < self._prealloc:
-            rec_s = rec_s[0:sidx] # cut to size if preallocated
-
-        # Collect all data fields beforehand, so we can set None for missing data
-        s_fields = []
-        for s in rec_s:
-            for key in s.keys():
-                if key not in s_fields:
-                    s_fields.append(key)
-        s_fields = sorted(s_fields)                    
-        e_fields = ['time', 'message']
-
-        for f in s_fields:
-            if f not in samples.keys():
-                samples[f] = []
-            for s in rec_s:
-                try:
-                    samples[f].append(s[f])
-                except KeyError:
-                    samples[f].append(None)
-
-        for f in e_fields:
-            if f not in events.keys():
-                events[f] = []
-            for e in rec_e:
-                try:
-                    events[f].append(e[f])
-                except KeyError:
-                    events[f].append(None)
+        # Only the filled part of the preallocated sample list is read
+        count = None
+        if self._samples_idx < self._prealloc:
+            count = self._samples_idx
+        samples = transposeSamples(self._samples, count=count, output=output)
+        events = self._events.toColumns(output=output)
 
         if clear:
             self.clearRecording(samples=True, events=True)
@@ -592,7 +784,6 @@ class SampleRecorder(object):
         prev_headlight_state = viz.MainView.getHeadLight().getEnabled()
         viz.MainView.getHeadLight().enable()
         viz.MainWindow.setScene(self._scene)
-        root = viz.addGroup(scene=self._scene)
 
         if cursor:
             cursor_state = self._cursor.getVisible()
@@ -601,68 +792,126 @@ class SampleRecorder(object):
 
         # Set up depth planes and targets
         t_dists = []
-        t_planes = {}
         t_objs = {}
-        for tgt in targets:
+        for (tgt, tgtHMD, t, tplane) in self._setupTargets(targets):
             d = tgt[2]
             if d not in t_dists:
                 t_dists.append(d)
-                t_planes[d] = vizshape.addPlane(size=(1000.0, 1000.0), axis=vizshape.AXIS_Z, scene=self._scene,
-                                                     flipFaces=True, color=self.tar_plane_color, parent=root)
-                t_planes[d].setPosition([0.0, 0.0, d], mode=viz.REL_PARENT)
                 t_objs[d] = []
-            
-            # Find target position on depth plane using raycasting
-            tar_mat = vizmat.Transform()
-            tar_mat.makeEuler([tgt[0], -tgt[1], 0.0])
-            tar_dir = tar_mat.getLineForward(1000)
-            info = self._scene.intersect(tar_dir.begin, tar_dir.end, ignoreBackFace = False, all=True)
-            tar_pos = None
-            for obj in info:
-                # Only intersect the correct plane
-                if obj.object == t_planes[d]:
-                    tar_pos = obj.point
-            t = viz.addGroup(scene=self._scene, parent=root)
-            t_out = vizshape.addCylinder(radius=self._deg2m(self.fix_size, d), height=self._deg2m(self.fix_size/20.0, d), parent=t, scene=self._scene, axis=vizshape.AXIS_Z, color=(1, 1, 1))
-            t_in = vizshape.addSphere(radius=self._deg2m(self.fix_size/5.0, d), parent=t, scene=self._scene, color=(0,0,0))
-            t.setPosition(tar_pos, mode=viz.ABS_GLOBAL)
-            
+
             # Preview only: highlight each center target
             if tgt[0] == 0.0 and tgt[1] == 0.0:
                 t.color([0.0, 1.0, 0.0])
-            
-            t.visible(False)
             t_objs[d].append(t)
-        
         t_dists.sort(reverse=True)
-        for d in t_dists:
-            t_planes[d].visible(False)
 
         # Head-lock the completed target array
-        t_link = viz.link(viz.MainView, root, enabled=True)
+        t_link = viz.link(viz.MainView, self._val_root, enabled=True)
 
         # Preview targets, separately for each depth plane
         for d in t_dists:
-            t_planes[d].visible(True)
+            self._val_planes[d].visible(True)
             for t in t_objs[d]:
                 t.visible(True)
 
             dmsg = 'Previewing targets: {:.2f} m distance ({:d}/{:d})'
             self._dlog(dmsg.format(d, len(t_objs[d]), len(targets)))
             yield viztask.waitKeyDown(' ')
-            t_planes[d].visible(False)
+            self._val_planes[d].visible(False)
+            for t in t_objs[d]:
+                t.visible(False)
 
-        # Clear scene objects
+        # Hide scene objects
         if cursor:
             self._cursor.removeParent(viz.WORLD, scene=self._scene)
             self.showGazeCursor(cursor_state)
-        root.remove(children=True)
+        t_link.remove()
+        self._releaseTargets()
         if not prev_headlight_state:
             viz.MainView.getHeadLight().disable()
         viz.MainWindow.setScene(prev_scene)
         self._dlog('Original scene returned')
 
 
+    def _addTargetNode(self, d):
+        """ Create a new validation target node for the given depth, 
+        sized according to the current fix_size setting
+
+        Args:
+            d (float): Target depth in meters
+
+        Returns: tuple of (target group, outer disc, inner sphere)
+        """
+        t = viz.addGroup(scene=self._scene, parent=self._val_root)
+        t_out = vizshape.addCylinder(radius=self._deg2m(self.fix_size, d), height=self._deg2m(self.fix_size/20.0, d), parent=t, scene=self._scene, axis=vizshape.AXIS_Z, color=(1, 1, 1))
+        t_in = vizshape.addSphere(radius=self._deg2m(self.fix_size/5.0, d), parent=t, scene=self._scene, color=(0,0,0), pos=[0, 0, -self._deg2m(self.fix_size, d)])
+        t.visible(False)
+        return (t, t_out, t_in)
+
+
+    def _setupTargets(self, targets):
+        """ Place validation targets and their depth planes in the validation
+        scene. Target positions are computed analytically (see targetLayout()),
+        and target nodes are taken from a pool that is shared between 
+        validations and previews, so nodes are only created on first use. 
+        All nodes start out hidden.
+
+        Args:
+            targets: List of targets (x, y, depth), x/y in visual degrees, depth in m
+
+        Returns: list of (target, position in HMD space, target node, depth plane)
+        """
+        if self._val_root is None:
+            self._val_root = viz.addGroup(scene=self._scene)
+
+            # Background plane to prevent screen color switching between targets
+            self._val_bg = vizshape.addPlane(size=(1000.0, 1000.0), axis=vizshape.AXIS_Z, scene=self._scene,
+                                             flipFaces=True, color=self.tar_plane_color, parent=self._val_root)
+            self._val_bg.visible(False)
+
+        placed = []
+        used = {}
+        for (tgt, tgtHMD) in zip(targets, targetLayout(targets)):
+            # Add depth plane if it doesn't exist yet
+            d = tgt[2]
+            if d not in self._val_planes:
+                self._val_planes[d] = vizshape.addPlane(size=(1000.0, 1000.0), axis=vizshape.AXIS_Z, scene=self._scene,
+                                                        flipFaces=True, color=self.tar_plane_color, parent=self._val_root)
+                self._val_planes[d].setPosition([0.0, 0.0, d], mode=viz.REL_PARENT)
+                self._val_planes[d].visible(False)
+
+            # Reuse target nodes of the same size, add more if needed
+            key = (d, self.fix_size)
+            if key not in self._val_pool:
+                self._val_pool[key] = []
+            k = used.get(key, 0)
+            if k == len(self._val_pool[key]):
+                self._val_pool[key].append(self._addTargetNode(d))
+            used[key] = k + 1
+
+            t = self._val_pool[key][k][0]
+            t.setPosition(tgtHMD, mode=viz.REL_PARENT)
+            placed.append((tgt, tgtHMD, t, self._val_planes[d]))
+
+        self._val_bg.setPosition([0.0, 0.0, max([tgt[2] for tgt in targets]) + 1.0], mode=viz.REL_PARENT)
+        for plane in itertools.chain([self._val_bg], self._val_planes.values()):
+            plane.color(self.tar_plane_color)
+        return placed
+
+
+    def _releaseTargets(self):
+        """ Hide all validation scene nodes and reset target colors, so they 
+        can be reused by the next validation or preview """
+        for (t, t_out, t_in) in itertools.chain(*self._val_pool.values()):
+            t.visible(False)
+            t_out.color([1.0, 1.0, 1.0])
+            t_in.color([0.0, 0.0, 0.0])
+        for plane in self._val_planes.values():
+            plane.visible(False)
+        if self._val_bg is not None:
+            self._val_bg.visible(False)
+
+
     def calibrateEyeTracker(self):
         """ Calibrates the eye tracker via its calibrate() method """
         if self._tracker is None:
@@ -673,7 +922,8 @@ class SampleRecorder(object):
         self._dlog('Eye tracker calibration finished.')    
 
 
-    def validateEyeTracker(self, targets=None, dur=2000, tar_color=[1.0, 1.0, 1.0], randomize=True, metadata=None):
+    def validateEyeTracker(self, targets=None, dur=2000, tar_color=[1.0, 1.0, 1.0], randomize=True, metadata=None,
+                           keep_samples=True, fixation_window=False):
         """ Measure gaze accuracy and precision for a set of head-locked targets
         in a special validation scene. 
         
@@ -685,6 +935,12 @@ class SampleRecorder(object):
             tar_color (3-tuple): Target sphere color
             randomize (bool): if True, randomize target order in each validation
             metadata (dict): Dict of participant metadata to include with result
+            keep_samples (bool): if False, compute metrics on the fly while samples
+                arrive and do not store raw samples in the result (low-memory mode,
+                e.g. for repeated drift checks)
+            fixation_window (bool): if True, compute metrics from the longest fixation
+                on each target (I-VT in HMD space) instead of skipping the first 20
+                samples. Only applies if keep_samples is True.
         
         Returns: vexptoolbox.ValidationResult object 
         """
@@ -699,53 +955,16 @@ class SampleRecorder(object):
                 targets = VAL_TAR_C
 
         viz.sendEvent(VALIDATION_START_EVENT)
+        self._val_acc = None
 
         # Set up targets in validation scene
-        root = viz.addGroup(scene=self._scene)
-        t_dists = []
-        t_planes = {}
         all_targets = []
-        c = 0
-        for tgt in targets:
-            # Add depth plane if it doesn't exist yet
-            d = tgt[2]
-            if d not in t_dists:
-                t_dists.append(d)
-                t_planes[d] = vizshape.addPlane(size=(1000.0, 1000.0), axis=vizshape.AXIS_Z, scene=self._scene,
-                                                     flipFaces=True, color=self.tar_plane_color, parent=root)
-                t_planes[d].setPosition([0.0, 0.0, d], mode=viz.REL_PARENT)
-            
-            # Find target position on depth plane using raycasting
-            tar_mat = vizmat.Transform()
-            tar_mat.makeEuler([tgt[0], -tgt[1], 0.0])
-            tar_dir = tar_mat.getLineForward(1000)
-            info = self._scene.intersect(tar_dir.begin, tar_dir.end, ignoreBackFace = False, all=True)
-            tar_pos = None
-            for obj in info:
-                # Only intersect the correct plane
-                if obj.object == t_planes[d]:
-                    tar_pos = obj.point
-            t = viz.addGroup(scene=self._scene, parent=root)
-            #t_out = vizshape.addSphere(radius=self._deg2m(self.fix_size, d), parent=t, scene=self._scene, color=(1, 1, 1))
-            t_out = vizshape.addCylinder(radius=self._deg2m(self.fix_size, d), height=self._deg2m(self.fix_size/20.0, d), parent=t, scene=self._scene, axis=vizshape.AXIS_Z, color=(1, 1, 1))
-            t_in = vizshape.addSphere(radius=self._deg2m(self.fix_size/5.0, d), parent=t, scene=self._scene, color=(0,0,0), pos=[0, 0, -self._deg2m(self.fix_size, d)])
-            t.setPosition(tar_pos, mode=viz.ABS_GLOBAL)
-            t.visible(False)
-            tgtHMD = t.getPosition(mode=viz.REL_PARENT) # target in HMD space
-
-            all_targets.append((c, tgt, tgtHMD, t, t_planes[tgt[2]]))
-            c += 1
-
-        for d in t_dists:
-            t_planes[d].visible(False)
-
-        # Add a background plane to prevent screen color switching between targets
-        bg = vizshape.addPlane(size=(1000.0, 1000.0), axis=vizshape.AXIS_Z, scene=self._scene,
-                               flipFaces=True, color=self.tar_plane_color, parent=root)
-        bg.setPosition([0.0, 0.0, max(t_dists) + 1.0], mode=viz.REL_PARENT)
+        for c, (tgt, tgtHMD, t, tplane) in enumerate(self._setupTargets(targets)):
+            all_targets.append((c, tgt, tgtHMD, t, tplane))
+        self._val_bg.visible(True)
 
         # Head-lock the completed target array and switch scenes
-        t_link = viz.link(viz.MainView, root, enabled=True)
+        t_link = viz.link(viz.MainView, self._val_root, enabled=True)
         prev_scene = viz.MainWindow.getScene()
         viz.MainWindow.setScene(self._scene)
         prev_headlight_state = viz.MainView.getHeadLight().getEnabled()
@@ -762,178 +981,52 @@ class SampleRecorder(object):
         else:
             cal_targets = all_targets
 
-        # Calculate data quality measures per target
-        tar_data = []
+        # Data quality measures are calculated in a worker thread while
+        # the next target is presented, to avoid frame drops in the HMD
+        worker = TaskWorker(self._targetMetrics, name='vexptoolbox-validation')
         sam_data = []
-        for (c, tarpos, tgtHMD, ct, tplane) in cal_targets:
-
-            d = {}
+        acc_data = []
+        eyes = ['']
+        if self._tracker_has_eye_flag:
+            eyes += ['L', 'R']
 
-            # Record gaze samples
-            yield viztask.waitTime(1.0)
-            val_recorder.setEnabled(True)
-            if self.recording:
-                self.recordEvent('VAL_START {:d} {:.1f} {:.1f} {:.1f}'.format(c, *tarpos))
-            tplane.visible(True)
-            ct.visible(True)
-
-            yield viztask.waitTime(float(dur) / 1000)
-            val_recorder.setEnabled(False)
-            s = self._get_val_samples()
-            ct.color([0.1, 1.0, 0.1])
-            yield viztask.waitTime(0.2)
-
-            ct.visible(False)
-            tplane.visible(False)
-            if self.recording:
-                self.recordEvent('VAL_END {:d} {:.1f} {:.1f} {:.1f}'.format(c, *tarpos))
-            
-            # Binocular measures
-            delta = []
-            deltaX = []
-            deltaY = []
-            gazeX = []
-            gazeY = []
-
-            # Monocular measures, only used when supported
-            ipdM = []
-            deltaM = [[], []] # monocular as [L, R]
-            deltaXM = [[], []]
-            deltaYM = [[], []]
-            gazeXM = [[], []]
-            gazeYM = [[], []]
-            
-            d['set_no'] = c
-            d['x'] =  tarpos[0]
-            d['y'] =  tarpos[1]
-            d['d'] =  tarpos[2]
-            d['xm'] =  tgtHMD[0] # in m 
-            d['ym'] =  tgtHMD[1]
-            
-            # Select stable fixation samples
-            # TODO: use actual fixation detector here!
-            s = s[20:]
-
-            for sam in s:
-                # Calculate gaze-target angular errors in HMD space
-                gazeOri = (sam['tracker_posX'], sam['tracker_posY'], sam['tracker_posZ'])
-                eyeTarVec = vizmat.VectorToPoint(gazeOri, tgtHMD)
-                eyeGazeVec = (sam['trackVec_X'], sam['trackVec_Y'], sam['trackVec_Z'])
-
-                dC = vizmat.AngleBetweenVector(eyeGazeVec, eyeTarVec)
-                sam['targetErr'] = dC
-
-                angularDiff = vizmat.Transform()
-                angularDiff.makeVecRotVec(eyeTarVec, eyeGazeVec)
-                (dX, dY, _) = angularDiff.getEuler()
-                dY = -dY
-                sam['targetErr_X'], sam['targetErr_Y'] = dX, dY
-
-                delta.append(dC)
-                deltaX.append(dX)
-                deltaY.append(dY)
-
-                # Average gaze angle in HMD space
-                eyeHeadVec = (sam['trackVec_X'], sam['trackVec_Y'], sam['trackVec_Z'])
-                eyeHeadRot = vizmat.Transform()
-                eyeHeadRot.makeVecRotVec([0, 0, 1], eyeHeadVec)
-                (gX, gY, _) = eyeHeadRot.getEuler()
-                gY = -gY
-
-                gazeX.append(gX)
-                gazeY.append(gY)
-                sam['targetGaze_X'], sam['targetGaze_Y'] = gX, gY
-
-                # Monocular data, if available
-                if self._tracker_has_eye_flag:
-                    ipdM.append(abs(sam['trackerR_posX'] - sam['trackerL_posX']) * 1000.0)
-                    for eyei, eye in enumerate(['L', 'R']):
-                        # Angular gaze-target errors
-                        gazeOriM = (sam['tracker{:s}_posX'.format(eye)],
-                                    sam['tracker{:s}_posY'.format(eye)],
-                                    sam['tracker{:s}_posZ'.format(eye)])
-                        eyeTarVecM = vizmat.VectorToPoint(gazeOriM, tgtHMD)
-                        eyeGazeVecM = (sam['trackVec{:s}_X'.format(eye)],
-                                       sam['trackVec{:s}_Y'.format(eye)],
-                                       sam['trackVec{:s}_Z'.format(eye)])
-                        
-                        dCM = vizmat.AngleBetweenVector(eyeGazeVecM, eyeTarVecM)
-                        sam['targetErr{:s}'.format(eye)] = dCM
-
-                        angularDiffM = vizmat.Transform()
-                        angularDiffM.makeVecRotVec(eyeTarVecM, eyeGazeVecM)
-                        (dXM, dYM, _) = angularDiff.getEuler()
-                        dYM = -dYM                        
-                        sam['targetErr{:s}_X'.format(eye)] = dXM
-                        sam['targetErr{:s}_Y'.format(eye)] = dYM
-
-                        deltaM[eyei].append(dCM)
-                        deltaXM[eyei].append(dXM)
-                        deltaYM[eyei].append(dYM)
-
-                        # Average gaze angles
-                        eyeHeadVecM = (sam['trackVec{:s}_X'.format(eye)], 
-                                       sam['trackVec{:s}_Y'.format(eye)], 
-                                       sam['trackVec{:s}_Z'.format(eye)])
-                        eyeHeadRotM = vizmat.Transform()
-                        eyeHeadRotM.makeVecRotVec([0, 0, 1], eyeHeadVecM)
-                        (gXM, gYM, _) = eyeHeadRotM.getEuler()
-                        gYM = -gYM
-                        
-                        sam['targetGaze{:s}_X'.format(eye)] = gXM
-                        sam['targetGaze{:s}_Y'.format(eye)] = gYM
-                        gazeXM[eyei].append(gXM)
-                        gazeYM[eyei].append(gYM)
-
-            # Gaze position and offset
-            d['avgX'] = mean(gazeX)
-            d['avgY'] = mean(gazeY)
-            d['medX'] = median(gazeX)
-            d['medY'] = median(gazeY)
-            d['offX'] = mean(deltaX)
-            d['offY'] = mean(deltaY)
-
-            # Accuracy 
-            d['acc'] = mean(delta)
-            d['accX'] = mean([abs(v) for v in deltaX])
-            d['accY'] = mean([abs(v) for v in deltaY])
-            d['medacc'] = median(delta)
-            d['medaccX'] = median([abs(v) for v in deltaX])
-            d['medaccY'] = median([abs(v) for v in deltaY])
+        for (c, tarpos, tgtHMD, ct, tplane) in cal_targets:
 
-            # Precision
-            d['sd'] = sd(delta)
-            d['sdX'] = sd(deltaX)
-            d['sdY'] = sd(deltaY)
-            d['rmsi'] = rmsi(delta)
-            d['rmsiX'] = rmsi(deltaX)
-            d['rmsiY'] = rmsi(deltaY)
-
-            # Monocular measures and IPD
-            if self._tracker_has_eye_flag:
-                d['ipd'] = mean(ipdM)
-                for eyei, eye in enumerate(['L', 'R']):
-                    d['avgX_{:s}'.format(eye)] = mean(gazeXM[eyei])
-                    d['avgY_{:s}'.format(eye)] = mean(gazeYM[eyei])
-                    d['medX_{:s}'.format(eye)] = median(gazeXM[eyei])
-                    d['medY_{:s}'.format(eye)] = median(gazeYM[eyei])
-                    d['offX_{:s}'.format(eye)] = mean(deltaXM[eyei])
-                    d['offY_{:s}'.format(eye)] = mean(deltaYM[eyei])
-                    d['acc_{:s}'.format(eye)] = mean(deltaM[eyei])
-                    d['accX_{:s}'.format(eye)] = mean([abs(v) for v in deltaXM[eyei]])
-                    d['accY_{:s}'.format(eye)] = mean([abs(v) for v in deltaYM[eyei]])
-                    d['medacc_{:s}'.format(eye)] = median(deltaM[eyei])
-                    d['medaccX_{:s}'.format(eye)] = median([abs(v) for v in deltaXM[eyei]])
-                    d['medaccY_{:s}'.format(eye)] = median([abs(v) for v in deltaYM[eyei]])
-                    d['sd_{:s}'.format(eye)] = sd(deltaM[eyei])
-                    d['sdX_{:s}'.format(eye)] = sd(deltaXM[eyei])
-                    d['sdY_{:s}'.format(eye)] = sd(deltaYM[eyei])
-                    d['rmsi_{:s}'.format(eye)] = rmsi(deltaM[eyei])
-                    d['rmsiX_{:s}'.format(eye)] = rmsi(deltaXM[eyei])
-                    d['rmsiY_{:s}'.format(eye)] = rmsi(deltaYM[eyei])
-
-            tar_data.append(d)
-            sam_data.append(s)
+            # Low-memory accumulator is reset even if the validation task is killed
+            try:
+                # Record gaze samples
+                yield viztask.waitTime(1.0)
+                if not keep_samples:
+                    self._val_acc = TargetAccumulator(c, tarpos, tgtHMD, eyes=eyes, skip=20)
+                val_recorder.setEnabled(True)
+                if self.recording:
+                    self.recordEvent('VAL_START', index=c, x=tarpos[0], y=tarpos[1], z=tarpos[2])
+                tplane.visible(True)
+                ct.visible(True)
+
+                yield viztask.waitTime(float(dur) / 1000)
+                val_recorder.setEnabled(False)
+                s = self._get_val_samples()
+                ct.color([0.1, 1.0, 0.1])
+                yield viztask.waitTime(0.2)
+
+                ct.visible(False)
+                tplane.visible(False)
+                if self.recording:
+                    self.recordEvent('VAL_END', index=c, x=tarpos[0], y=tarpos[1], z=tarpos[2])
+                
+                if not keep_samples:
+                    acc_data.append(self._val_acc.result())
+                else:
+                    # Select stable fixation samples
+                    if fixation_window:
+                        s = self._fixationWindow(s)
+                    else:
+                        s = s[20:]
+                    worker.submit(s, c, tarpos, tgtHMD)
+                    sam_data.append(s)
+            finally:
+                self._val_acc = None
 
             self._dlog('VAL_END {:d} {:.1f} {:.1f} {:.1f}'.format(c, *tarpos))
 
@@ -941,6 +1034,13 @@ class SampleRecorder(object):
         val_recorder.setEnabled(False)
         val_recorder.remove()
 
+        # Wait for remaining per-target computations
+        if not worker.done():
+            self._dlog('Waiting for {:d} target(s) to be processed'.format(worker.pending))
+            yield viztask.waitTrue(worker.done)
+        tar_data = worker.results() + acc_data
+        d = tar_data[-1]
+
         # Calculate grand average for each measure
         avg_data = {}
         for tar in tar_data:
@@ -951,8 +1051,9 @@ class SampleRecorder(object):
         for var in avg_data.keys():
             avg_data[var] = mean(avg_data[var])
 
-        # Clear and return to previous scene
-        root.remove(children=True)
+        # Hide targets and return to previous scene
+        t_link.remove()
+        self._releaseTargets()
         if not prev_headlight_state:
             viz.MainView.getHeadLight().disable()
         viz.MainWindow.setScene(prev_scene)
@@ -967,24 +1068,161 @@ class SampleRecorder(object):
 
         rv = ValidationResult(result=avg_data, samples=sam_data, targets=tar_data, metadata=rmeta)
         if self.recording:
-                self.recordEvent('VAL_RESULT {:.2f} {:.2f} {:.2f}'.format(d['acc'], d['rmsi'], d['sd']))
+                self.recordEvent('VAL_RESULT', acc=d['acc'], rmsi=d['rmsi'], sd=d['sd'])
 
-        self._validation_results.append(copy.deepcopy(rv))
+        self._validation_results.append(rv)
         viz.sendEvent(VALIDATION_END_EVENT)
-        viztask.returnValue(rv)
+        viztask.returnValue(rv.copy())
+
+
+    def _fixationWindow(self, s, skip=20):
+        """ Select the samples of the longest fixation during a validation target,
+        using I-VT on gaze-in-HMD vectors. Falls back to skipping the first samples
+        if no fixation was found.
+
+        Args:
+            s: list of validation sample dicts
+            skip (int): Number of samples to skip if no fixation was detected
+        """
+        times = [sam['time'] for sam in s]
+        vecs = [(sam['trackVec_X'], sam['trackVec_Y'], sam['trackVec_Z']) for sam in s]
+        fix = detectFixations(times, vecs, method='ivt')
+        if len(fix) == 0:
+            self._dlog('No fixation detected, skipping first {:d} samples'.format(skip))
+            return s[skip:]
+        best = fix[0]
+        for f in fix[1:]:
+            if f['duration'] > best['duration']:
+                best = f
+        return s[best['start_index']:best['end_index']]
+
+
+    def _sampleErrors(self, s, eye, tgtHMD):
+        """ Annotate validation samples with angular gaze-target errors and
+        gaze angles in HMD space (targetErr*, targetGaze* fields) 
+
+        Args:
+            s: List of validation sample dicts
+            eye (str): '' for combined gaze, 'L' or 'R' for monocular data
+            tgtHMD: Target position in HMD space
+        """
+        k_ori = ['tracker{:s}_pos{:s}'.format(eye, ax) for ax in 'XYZ']
+        k_vec = ['trackVec{:s}_{:s}'.format(eye, ax) for ax in 'XYZ']
+        k_err = 'targetErr{:s}'.format(eye)
+        k_errX = 'targetErr{:s}_X'.format(eye)
+        k_errY = 'targetErr{:s}_Y'.format(eye)
+        k_gazeX = 'targetGaze{:s}_X'.format(eye)
+        k_gazeY = 'targetGaze{:s}_Y'.format(eye)
+
+        if _HAS_NUMPY:
+            # Batched computation for all samples of this target
+            ori = np.array([[sam[k] for k in k_ori] for sam in s], dtype=float).reshape(-1, 3)
+            vec = np.array([[sam[k] for k in k_vec] for sam in s], dtype=float).reshape(-1, 3)
+            (err, errX, errY) = gazeTargetErrors(ori, vec, tgtHMD)
+            (gazeX, gazeY) = gazeAngles(vec)
+            for sam, dC, dX, dY, gX, gY in zip(s, err.tolist(), errX.tolist(), errY.tolist(), 
+                                               gazeX.tolist(), gazeY.tolist()):
+                sam[k_err] = dC
+                sam[k_errX], sam[k_errY] = dX, dY
+                sam[k_gazeX], sam[k_gazeY] = gX, gY
+            return
+
+        for sam in s:
+            # Calculate gaze-target angular errors in HMD space
+            gazeOri = [sam[k] for k in k_ori]
+            eyeTarVec = vizmat.VectorToPoint(gazeOri, tgtHMD)
+            eyeGazeVec = [sam[k] for k in k_vec]
+            sam[k_err] = vizmat.AngleBetweenVector(eyeGazeVec, eyeTarVec)
+
+            angularDiff = vizmat.Transform()
+            angularDiff.makeVecRotVec(eyeTarVec, eyeGazeVec)
+            (dX, dY, _) = angularDiff.getEuler()
+            sam[k_errX], sam[k_errY] = dX, -dY
+
+            # Gaze angle in HMD space
+            eyeHeadRot = vizmat.Transform()
+            eyeHeadRot.makeVecRotVec([0, 0, 1], eyeGazeVec)
+            (gX, gY, _) = eyeHeadRot.getEuler()
+            sam[k_gazeX], sam[k_gazeY] = gX, -gY
+
+
+    def _targetMetrics(self, s, c, tarpos, tgtHMD):
+        """ Compute accuracy and precision measures for a single validation target
+
+        Args:
+            s: List of validation sample dicts (annotated in place)
+            c (int): Target number in the target set
+            tarpos: Target as (x, y, depth), x/y in visual degrees
+            tgtHMD: Target position in HMD space
+
+        Returns: dict of target results
+        """
+        d = {}
+        d['set_no'] = c
+        d['x'] =  tarpos[0]
+        d['y'] =  tarpos[1]
+        d['d'] =  tarpos[2]
+        d['xm'] =  tgtHMD[0] # in m 
+        d['ym'] =  tgtHMD[1]
+
+        # Binocular measures, then monocular measures if supported
+        eyes = ['']
+        if self._tracker_has_eye_flag:
+            eyes += ['L', 'R']
+
+        for eye in eyes:
+            self._sampleErrors(s, eye, tgtHMD)
+            sfx = '' if eye == '' else '_{:s}'.format(eye)
+
+            delta = [sam['targetErr{:s}'.format(eye)] for sam in s]
+            deltaX = [sam['targetErr{:s}_X'.format(eye)] for sam in s]
+            deltaY = [sam['targetErr{:s}_Y'.format(eye)] for sam in s]
+            gazeX = [sam['targetGaze{:s}_X'.format(eye)] for sam in s]
+            gazeY = [sam['targetGaze{:s}_Y'.format(eye)] for sam in s]
+
+            if eye == 'L':
+                d['ipd'] = mean([abs(sam['trackerR_posX'] - sam['trackerL_posX']) * 1000.0 for sam in s])
+
+            # Gaze position and offset
+            d['avgX' + sfx] = mean(gazeX)
+            d['avgY' + sfx] = mean(gazeY)
+            d['medX' + sfx] = median(gazeX)
+            d['medY' + sfx] = median(gazeY)
+            d['offX' + sfx] = mean(deltaX)
+            d['offY' + sfx] = mean(deltaY)
+
+            # Accuracy 
+            d['acc' + sfx] = mean(delta)
+            d['accX' + sfx] = mean([abs(v) for v in deltaX])
+            d['accY' + sfx] = mean([abs(v) for v in deltaY])
+            d['medacc' + sfx] = median(delta)
+            d['medaccX' + sfx] = median([abs(v) for v in deltaX])
+            d['medaccY' + sfx] = median([abs(v) for v in deltaY])
 
+            # Precision
+            d['sd' + sfx] = sd(delta)
+            d['sdX' + sfx] = sd(deltaX)
+            d['sdY' + sfx] = sd(deltaY)
+            d['rmsi' + sfx] = rmsi(delta)
+            d['rmsiX' + sfx] = rmsi(deltaX)
+            d['rmsiY' + sfx] = rmsi(deltaY)
+
+        return d
 
-    def checkEyeTrackerDrift(self, threshold=1.5, auto_calibrate=True):
+
+    def checkEyeTrackerDrift(self, threshold=1.5, auto_calibrate=True, keep_samples=False):
         """ Run single-target validation to check for eye tracker drift. 
 
         Args:
             threshold (float): Accuracy (gaze error) above which drift check is failed
             auto_calibrate (bool): if True, run calibration automatically when failed
+            keep_samples (bool): if True, store raw validation samples in the result
         """
         if self._tracker is None:
             raise RuntimeError('No eye tracker set up, checkEyeTrackerDrift() method not available!')
      
-        val_res = yield self.validateEyeTracker(targets=VAL_TAR_C, dur=2000, tar_color=[1.0, 1.0, 1.0])
+        val_res = yield self.validateEyeTracker(targets=VAL_TAR_C, dur=2000, tar_color=[1.0, 1.0, 1.0],
+                                                  keep_samples=keep_samples)
         if val_res.acc > threshold:
             self._dlog('Drift check FAILED, acc = {:.2f}°'.format(val_res.acc))
             if auto_calibrate:
@@ -1031,22 +1269,46 @@ class SampleRecorder(object):
                 nodes['trackerR'] = gTR
                 nodes['gazeL'] = gWL
                 nodes['gazeR'] = gWR
+
+            # Online fixation detection
+            if self._fixations is not None:
+                ev = self._fixations.update(time_ms, gW.getForward())
+                if ev is not None:
+                    self._onFixation(ev)
             
+            # Gaze hit test against registered AOIs
+            if self._aois is not None:
+                self.updateAOIs()
+                self._aoi_hit = self._aois.raycast(gW.getPosition(), gW.getForward(), max_dist=1000.0)
+
             # Update current gaze information and cursor position
-            g3D_line = gW.getLineForward(1000)
-            g3D_test = viz.intersect(g3D_line.begin, g3D_line.end)
-            if g3D_test.valid:
-                self._gaze3d = g3D_test.point
+            g3D = None
+            if self._aoi_hit is not None:
+                # Registered AOI hit, skip scene intersection
+                idx = self._aoi_hit[0]
+                g3D = (self._aoi_hit[2], self._aois.keys[idx], self._aois.names[idx])
+            elif self._aois is None or self.aoi_fallback:
+                g3D_line = gW.getLineForward(1000)
+                g3D_test = viz.intersect(g3D_line.begin, g3D_line.end)
+                if g3D_test.valid:
+                    g3D = (g3D_test.point, g3D_test.object, g3D_test.name)
+
+            if g3D is not None:
+                (self._gaze3d, self._gaze3d_intersect, self._gaze3d_intersect_name) = g3D
                 self._gaze3d_valid = True
-                self._gaze3d_intersect = g3D_test.object
-                self._gaze3d_intersect_name = g3D_test.name
-                self._gaze3d_last_valid = g3D_test.object
-                self._cursor.setPosition(g3D_test.point)
+                self._gaze3d_last_valid = self._gaze3d_intersect
+                self._cursor.setPosition(self._gaze3d)
             else:
                 self._gaze3d = [self.MISSING, self.MISSING, self.MISSING]
                 self._gaze3d_valid = False
                 self._gaze3d_intersect = None
 
+        # Update dwell times and resolve pending waits
+        dwell_target = None
+        if self._gaze3d_valid and self._gaze3d_intersect is not None:
+            dwell_target = self._gaze3d_intersect.id
+        self._dwell.update(dwell_target, viz.getFrameElapsed())
+
         # Record sample if enabled
         if self.recording:
             # Additional tracked nodes
@@ -1135,6 +1397,15 @@ class SampleRecorder(object):
                 s['gaze3d_object_id'] = -1
                 s['gaze3d_object_name'] = ''
 
+            # Registered AOI hit by gaze ray
+            if self._aois is not None:
+                if self._aoi_hit is not None:
+                    s['gaze3d_aoi'] = str(self._aois.names[self._aoi_hit[0]])
+                    s['gaze3d_aoi_dist'] = self._aoi_hit[1]
+                else:
+                    s['gaze3d_aoi'] = ''
+                    s['gaze3d_aoi_dist'] = self.MISSING
+
             # Device-specific eye tracking data
             if self._tracker_type == 'ViveProEyeTracker':
                 s['pupil_size'] = self._tracker.getPupilDiameter(viz.BOTH_EYE)
@@ -1144,6 +1415,19 @@ class SampleRecorder(object):
                 s['eye_stateL'] = self._tracker.getEyeOpen(viz.LEFT_EYE)
                 s['eye_stateR'] = self._tracker.getEyeOpen(viz.RIGHT_EYE)
 
+        # Live frame timing and repeated sample statistics
+        gaze = None
+        if self._tracker is not None:
+            gaze = {'': (s['tracker_dirX'], s['tracker_dirY'], s['tracker_dirZ'])}
+            if self._tracker_has_eye_flag:
+                gaze['L'] = (s['trackerL_dirX'], s['trackerL_dirY'], s['trackerL_dirZ'])
+                gaze['R'] = (s['trackerR_dirX'], s['trackerR_dirY'], s['trackerR_dirZ'])
+        self._monitor.update(s['time'], s['systime'], s['frameno'], gaze)
+
+        # Closest sample from high-rate eye sampling thread, if enabled
+        if self._eye_sampler is not None and self._eye_sampler.running:
+            self._eye_sampler.merge(s, s['systime'])
+
         # Additional data fields
         s.update(self._customvars)
         
@@ -1154,6 +1438,9 @@ class SampleRecorder(object):
         else:
             self._samples.append(s)
 
+        if self._overview is not None:
+            self._overview.add(s)
+
         if console:
             # Note: printing coordinates will likely slow down rendering a lot! Use for debugging only.
             cWp = nodes['view'].getPosition()
@@ -1171,16 +1458,47 @@ class SampleRecorder(object):
                 print(outformat.format(s['time'], s['frameno'], cWp[0], cWp[1], cWp[2], cWd[0], cWd[1], cWd[2]))
 
 
-    def recordEvent(self, event=''):
-        """ Record a time-stamped event string.
+    def getOverview(self):
+        """ Returns the OverviewPyramid of the current recording, e.g. to draw a
+        timeline with query() while recording, or None if not enabled """
+        return self._overview
+
+
+    def getRecordingStats(self):
+        """ Return live data quality statistics of the current recording as a dict:
+        inter-frame interval histograms (Vizard and system time), frame number gaps,
+        and proportion and run-lengths of repeated gaze samples per eye 
+        (repeated_C, repeated_L, repeated_R). Can be called at any time during recording.
+        """
+        return self._monitor.summary()
+
+
+    def recordEvent(self, event='', **fields):
+        """ Record a time-stamped event, either as a plain string or as an
+        event kind with typed fields, e.g. recordEvent('VAL_START', index=0, 
+        x=0.0, y=1.5, z=6.0). Typed fields are stored as-is and are available
+        as columns in getLastRecording(). Event files contain the legacy 
+        message string ('VAL_START 0 0.0 1.5 6.0', see defineEvent()).
         This always works regardless of sample recording status.
         
         Args:
-            event (str): event string to log
+            event (str): event string or kind to log
+            **fields: Typed event fields
         """
-        ev = {'time': viz.tick() * 1000,
-               'message': str(event)}
-        self._events.append(ev)
+        self._events.add(viz.tick() * 1000, str(event), **fields)
+
+
+    def defineEvent(self, kind, fields, fmt=None):
+        """ Define field order and message format of a structured event kind,
+        used to render the event message in saved event files
+
+        Args:
+            kind (str): Event kind, e.g. 'RESPONSE'
+            fields (list): Field names, in message order
+            fmt (str): Format string for the field values, e.g. '{:d} {:.3f}',
+                default: values separated by spaces
+        """
+        self._events.define(kind, fields, fmt)
 
 
     def startRecording(self, force_update=False):
@@ -1192,6 +1510,12 @@ class SampleRecorder(object):
         if not self.recording:
             self._force_update = force_update
             self.recording = True
+            if self._eye_sampler is not None and self._tracker is not None:
+                # Discard eye data from before a pause, so that samples of this
+                # segment are never matched to stale eye samples
+                self._eye_sampler.buffer.clear()
+                self._eye_sampler.start()
+            self._monitor.newSegment()
             self.recordEvent('REC_START')
             if force_update:
                 self._dlog('Recording started (forcing Vizard updates is on!)')
@@ -1204,6 +1528,8 @@ class SampleRecorder(object):
         """ Stop sample recording """
         if self.recording:
             self.recording = False
+            if self._eye_sampler is not None:
+                self._eye_sampler.stop()
             self.recordEvent('REC_STOP')
             self._dlog('Recording stopped.')
             self._force_update = False
@@ -1211,7 +1537,8 @@ class SampleRecorder(object):
 
 
     def saveRecording(self, sample_file=None, event_file=None, clear_samples=True, clear_events=True, 
-                      sep='\t', quat=False, meta_cols={}, _data=None, _append=False):
+                      sep='\t', quat=False, meta_cols={}, stats=True, _data=None, _summary=None, 
+                      _append=False):
         """ Save current gaze recording to a tab-separated CSV file 
         and clear the current recording by default.
         
@@ -1222,8 +1549,12 @@ class SampleRecorder(object):
             clear_events (bool): if True, clear recorded events after saving
             sep (str): Field separator in output file
             quat (bool): if True, also export rotation Quaternions
-            meta_cols (dict): Dict of values to add to each sample (e.g., trial number)
+            meta_cols (dict): Dict of constant values to add as columns to each sample
+                and event row (e.g., trial number). Stored samples are not modified.
+            stats (bool): if True, also save data quality statistics of the saved
+                recording (see getRecordingStats()) to <sample_file>_stats.json
             _data: Tuple (samples, events) to save, None for current recording (mostly internal use)
+            _summary: Dict of recording summaries belonging to _data (see _getRawRecording())
         """
         # Select data to save
         if _data is not None:
@@ -1251,11 +1582,25 @@ class SampleRecorder(object):
             # Tracker-specific fields (not always available)
             special = ['gazeL_posX', 'gazeL_posY', 'gazeL_posZ', 'gazeL_dirX', 'gazeL_dirY', 'gazeL_dirZ',
                     'gazeR_posX', 'gazeR_posY', 'gazeR_posZ', 'gazeR_dirX', 'gazeR_dirY', 'gazeR_dirZ',
-                    'pupil_size', 'pupil_sizeL', 'pupil_sizeR', 'eye_state', 'eye_stateL', 'eye_stateR']
+                    'pupil_size', 'pupil_sizeL', 'pupil_sizeR', 'eye_state', 'eye_stateL', 'eye_stateR',
+                    'gaze3d_aoi', 'gaze3d_aoi_dist']
             for field in special:
                 if field in samples[0].keys():
                     fields += [field,]
 
+            # High-rate eye sampler fields. The first samples of a recording usually
+            # precede the first eye sample, so columns depend on the configuration
+            if self._eye_sampler is not None:
+                eye_lbls = ['eye']
+                if self._tracker_has_eye_flag:
+                    eye_lbls += ['eyeL', 'eyeR']
+                fields += ['eye_time', 'eye_index']
+                for lbl in eye_lbls:
+                    fields += ['{:s}_posX'.format(lbl), '{:s}_posY'.format(lbl), '{:s}_posZ'.format(lbl),
+                               '{:s}_dirX'.format(lbl), '{:s}_dirY'.format(lbl), '{:s}_dirZ'.format(lbl)]
+                if self._tracker_type == 'ViveProEyeTracker':
+                    fields += ['eye_pupil_size']
+
         # Additional tracked nodes
         for lbl in self._tracked_nodes.keys():
             fields += ['{:s}_posX'.format(lbl), '{:s}_posY'.format(lbl), '{:s}_posZ'.format(lbl), 
@@ -1283,36 +1628,28 @@ class SampleRecorder(object):
 
         evfields = ['time', 'message']
 
-        # Optional metadata
-        for sample in samples:
-            sample.update(meta_cols)
-        fields += list(meta_cols.keys())
-        for event in events:
-            event.update(meta_cols)
-        evfields += list(meta_cols.keys())
-
-        # Custom sample variables
-        fields += list(self._customvars.__dict__.keys())
+        # Optional metadata columns are constant for the whole recording, so they
+        # are broadcast at write time instead of being added to each sample dict
+        fields = [f for f in fields if f not in meta_cols]
+        custom_fields = [f for f in self._customvars.__dict__.keys() if f not in meta_cols]
 
         # Samples
         if sample_file is not None:
             with open(sample_file, writemode) as of:
-                writer = csv.DictWriter(of, delimiter=sep, lineterminator='\n', 
-                                        fieldnames=fields, extrasaction='ignore')
-                if not _append:
-                    writer.writeheader()
-                for sample in samples:
-                    writer.writerow(sample)
+                self._writeRows(of, samples, fields, sep=sep, const_cols=meta_cols,
+                                tail_fields=custom_fields, header=not _append)
             self._dlog('Saved {:d} samples to file: {:s}'.format(len(samples), sample_file))
 
+            if _data is None:
+                _summary = {'stats': self._monitor.summary(), 'overview': self._overview}
+            if _summary is not None:
+                self._saveSummary(os.path.splitext(sample_file)[0], _summary, stats=stats)
+
         # Events
         if event_file is not None:
             with open(event_file, writemode) as ef:
-                writer = csv.DictWriter(ef, delimiter=sep, lineterminator='\n', fieldnames=evfields)
-                if not _append:
-                    writer.writeheader()
-                for event in events:
-                    writer.writerow(event)
+                self._writeRows(ef, events, evfields, sep=sep, const_cols=meta_cols,
+                                header=not _append)
             self._dlog('Saved {:d} events to file: {:s}'.format(len(events), event_file))
 
         if sample_file is None and event_file is None:
@@ -1322,6 +1659,45 @@ class SampleRecorder(object):
                 self.clearRecording(samples=clear_samples, events=clear_events)
 
 
+    def _saveSummary(self, base, summary, stats=True):
+        """ Save recording summaries next to a sample file
+
+        Args:
+            base (str): Sample file name without extension
+            summary (dict): Recording summaries (see _getRawRecording())
+            stats (bool): if True, save data quality statistics
+        """
+        if stats and summary.get('stats') is not None:
+            with open('{:s}_stats.json'.format(base), 'w') as jf:
+                jf.write(json.dumps(summary['stats']))
+        if summary.get('overview') is not None:
+            summary['overview'].toFile('{:s}_overview.pkl'.format(base))
+
+
+    def _writeRows(self, fh, rows, fields, sep='\t', const_cols={}, tail_fields=[], header=True):
+        """ Write a list of sample or event dicts to an open file as delimited text.
+        Constant columns are appended to every row at write time without touching
+        the row dicts themselves.
+
+        Args:
+            fh: File object opened for writing
+            rows: List of dicts to write, one per output line
+            fields (list): Keys to export from each row dict, in column order
+            sep (str): Field separator in output file
+            const_cols (dict): Constant values written after fields on every row
+            tail_fields (list): Keys to export after the constant columns
+            header (bool): if True, write column names first
+        """
+        writer = csv.writer(fh, delimiter=sep, lineterminator='\n')
+        const_keys = list(const_cols.keys())
+        const_vals = [const_cols[k] for k in const_keys]
+        if header:
+            writer.writerow(fields + const_keys + tail_fields)
+        for row in rows:
+            get = row.get
+            writer.writerow([get(f, '') for f in fields] + const_vals + [get(f, '') for f in tail_fields])
+
+
     def clearRecording(self, samples=True, events=True):
         """ Stops recording and clears both samples and events 
         
@@ -1334,9 +1710,15 @@ class SampleRecorder(object):
         if samples:
             self._samples = [None,] * self._prealloc
             self._samples_idx = 0
+            if self._eye_sampler is not None:
+                self._eye_sampler.stop()
+                self._eye_sampler.buffer.clear()
+            self._monitor.reset()
+            if self._overview is not None:
+                self._overview.reset()
             dtypes.append('samples')
         if events:
-            self._events = []
+            self._events.clear()
             dtypes.append('events')
         self._dlog('Cleared recording data ({:s})'.format(str(dtypes)))
 
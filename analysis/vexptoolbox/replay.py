@@ -3,7 +3,9 @@
 # vexptoolbox: Vizard Toolbox for Behavioral Experiments
 # Gaze and object position and orientation replay class
 
-import csv
+import math
+import array
+import bisect
 import random
 import colorsys
 from vexptoolbox.recorder import SampleRecorder
@@ -15,11 +17,56 @@ import vizinput
 import vizshape
 
 from .eyeball import Eyeball
+from .data import loadSampleFile, MISSING_VALUE, _HAS_NUMPY
+
+if _HAS_NUMPY:
+    import numpy as np
+    from .geometry import eulerQuat
+
+# Number of values per frame in precomputed pose arrays
+POSE_POS = 3        # position (X, Y, Z)
+POSE_POS_QUAT = 7   # position and orientation quaternion (x, y, z, w)
+
+
+def _eulerQuat(yaw, pitch, roll):
+    """ Quaternion (x, y, z, w) of a single euler rotation, 
+    see geometry.eulerQuat() for the vectorized version """
+    h = [math.radians(a) / 2.0 for a in (yaw, pitch, roll)]
+    (cy, cp, cr) = [math.cos(a) for a in h]
+    (sy, sp, sr) = [math.sin(a) for a in h]
+    return (cy * sp * cr + sy * cp * sr,
+            sy * cp * cr - cy * sp * sr,
+            cy * cp * sr - sy * sp * cr,
+            cy * cp * cr + sy * sp * sr)
+
+
+def _slerp(q0, q1, a):
+    """ Spherical linear interpolation between two quaternions (x, y, z, w)
+
+    Args:
+        q0, q1: Quaternions at a = 0 and a = 1
+        a (float): Interpolation factor between 0 and 1
+    """
+    dot = q0[0] * q1[0] + q0[1] * q1[1] + q0[2] * q1[2] + q0[3] * q1[3]
+    if dot < 0.0:
+        # Take the shorter arc
+        q1 = [-x for x in q1]
+        dot = -dot
+    if dot > 0.9995:
+        # Nearly identical rotations: normalized linear interpolation
+        q = [x + (y - x) * a for (x, y) in zip(q0, q1)]
+        n = math.sqrt(sum([x * x for x in q]))
+        return [x / n for x in q]
+    th = math.acos(dot)
+    w0 = math.sin((1.0 - a) * th) / math.sin(th)
+    w1 = math.sin(a * th) / math.sin(th)
+    return [x * w0 + y * w1 for (x, y) in zip(q0, q1)]
+
 
 class SampleReplay(object):
     
     def __init__(self, recording=None, ui=True, eyeball=True, console=False, eye='BINOCULAR',
-                 replay_view=True):
+                 replay_view=True, rate=1.0):
         """ Gaze and object position and orientation replay class
         
         Args:
@@ -36,6 +83,7 @@ class SampleReplay(object):
                     Note: "BOTH_EYE" will be used if input file only contains averaged gaze data!
                 - None: do not replay gaze data, even if it is available in the recording
             replay_view (bool): if True, move the MainView with recorded sample data
+            rate (float): Playback rate relative to recording time (0.25 - 8.0)
         """
         # Create gaze visualization nodes
         self._gaze = {'L': {}, 'R': {}, '': {}}
@@ -65,7 +113,7 @@ class SampleReplay(object):
             self._gaze['L']['node'] = None
             self._gaze['']['node'] = None
 
-        elif eye == viz.BOTH_EYE == 'BOTH_EYE':
+        elif eye == viz.BOTH_EYE or eye == 'BOTH_EYE':
             if eyeball:
                 self._gaze['']['node'] = 'eye'
             else:
@@ -91,13 +139,19 @@ class SampleReplay(object):
         self.setEyeColors(combined='brown', left='green', right='blue')
 
         self._frame = 0
-        self._samples = []
+        self._time = 0.0       # current replay time, in recorded time stamps (ms)
+        self._samples = {}     # dict of sample columns
+        self._sample_count = 0
+        self._events = {}
+        self._poses = {}       # precomputed per-frame pose arrays, as {label: (array, values per frame)}
         self._sample_time_offset = 0.0
         self._player = None
         self.replaying = False
         self.finished = False
         self.console = console
         self.replay_view = replay_view
+        self.rate = 1.0
+        self.setRate(rate)
 
         self.replay_nodes = []
         self._nodes = {}
@@ -133,7 +187,10 @@ class SampleReplay(object):
         # Load recording
         if recording is not None:
             if type(recording) == SampleRecorder:
-                self._samples = recording._samples
+                (samples, events) = recording.getLastRecording(output='numpy' if _HAS_NUMPY else 'dict')
+                self._events = events
+                self._setSamples(samples)
+                print('* Loaded {:d} replay samples from SampleRecorder.'.format(self._sample_count))
             else:
                 try:
                     self.loadRecording(recording)
@@ -145,14 +202,14 @@ class SampleReplay(object):
         """ Update GUI elements to display status (if enabled) """
         if self._ui is not None:
 
-            if len(self._samples) == 0:
+            if self._sample_count == 0:
                 self._ui_bar.message('No data')
             
-            elif self._frame < len(self._samples):
-                self._ui_bar.set(float(self._frame)/float(len(self._samples)))
-                self._ui_bar.message('{:d}/{:d}'.format(self._frame+1, len(self._samples)))
+            elif self._frame < self._sample_count:
+                self._ui_bar.set(float(self._frame)/float(self._sample_count))
+                self._ui_bar.message('{:d}/{:d}'.format(self._frame+1, self._sample_count))
 
-                t = self._samples[self._frame]['time'] - self._sample_time_offset
+                t = min(self._time, self._samples['time'][-1]) - self._sample_time_offset
                 if t > 10000:
                     self._ui_time.message('{:.1f} s'.format(t/1000.0))
                 else:
@@ -196,9 +253,9 @@ class SampleReplay(object):
 
 
     def _ui_set_frame(self, slider_pos):
-        """ Callback for progress bar click -> set current frame """
-        self._frame = int(slider_pos * len(self._samples))
-        self._set_ui()
+        """ Callback for progress bar click -> seek to corresponding time """
+        if self._sample_count > 0:
+            self.seekTime(slider_pos * (self._samples['time'][-1] - self._sample_time_offset))
 
 
     def _update_nodes(self):
@@ -235,6 +292,8 @@ class SampleReplay(object):
 
         # Enable / disable gaze settings based on data availability
         for eye_pos in list(self._gaze.keys()):
+            if self._ui is None:
+                break
             if self._gaze[eye_pos]['data']:
                 self._gaze[eye_pos]['ui'].enable()
                 if self._gaze[eye_pos]['node'] is None:
@@ -247,43 +306,43 @@ class SampleReplay(object):
                 self._gaze[eye_pos]['ui'].disable()
 
 
-    def loadRecording(self, sample_file=None, sep='\t'):
+    def loadRecording(self, sample_file=None, sep='\t', event_file=None):
         """ Load a SampleRecorder sample file for replay
         
         Args:
             sample_file (str): Filename of CSV file to load. If no 
                 file is specified, show Vizard file selection dialog.
             sep (str): Field separator in CSV input file
+            event_file (str): Filename of matching event file (optional,
+                enables seeking to events, see seekEvent())
         """
-        s = []
-
         if sample_file is None:
             sample_file = vizinput.fileOpen(filter=[('Samples files', '*.csv;*.tsv;*.dat;*.txt')])
 
-        with open(sample_file, 'r') as sf:
-            reader = csv.DictReader(sf, delimiter=sep)
-            if len(reader.fieldnames) == 1:
-                m = 'Warning: Only a single column read from recording file. Is the field separator set correctly (e.g., sep=";")?\n'
-                print(m)
-
-            HEADER = reader.fieldnames
-            for row in reader:
-                sample = {}
-                for field in reader.fieldnames:
-
-                    # Convert numeric values
-                    data = row[field]
-                    try:
-                        sample[field] = int(data)
-                    except ValueError:
-                        try:
-                            sample[field] = float(data)
-                        except ValueError:
-                            sample[field] = data
-                s.append(sample)
+        # Typed columns, parsed in bulk (see vexptoolbox.loadSampleFile())
+        s = loadSampleFile(sample_file, sep=sep)
+        if len(s) == 1:
+            m = 'Warning: Only a single column read from recording file. Is the field separator set correctly (e.g., sep=";")?\n'
+            print(m)
+
+        self._events = {}
+        if event_file is not None:
+            self._events = loadSampleFile(event_file, sep=sep)
+        self._setSamples(s)
+        print('* Loaded {:d} replay samples from {:s}.'.format(self._sample_count, sample_file))
+        if len(self.replay_nodes) > 1:
+            print('* Replay contains {:d} tracked nodes: {:s}.'.format(len(self.replay_nodes), ', '.join(self.replay_nodes)))
+
 
+    def _setSamples(self, s):
+        """ Set up replay for a dict of sample columns """
+        HEADER = list(s.keys())
         self._samples = s
-        self._sample_time_offset = s[0]['time']
+        self._sample_count = len(s['time']) if 'time' in s else 0
+        if self._sample_count > 0:
+            self._sample_time_offset = s['time'][0]
+        self._time = self._sample_time_offset
+        self._frame = 0
 
         # Only enable gaze data present in the recording
         for eye_pos in list(self._gaze.keys()):
@@ -298,22 +357,159 @@ class SampleReplay(object):
         # Find tracked nodes
         _nodes_builtin = ['gaze', 'gazeL', 'gazeR', 'tracker', 'trackerL', 'trackerR']
         for field in HEADER:
-            if field[-5:] == '_posX' and field[0:-5] not in _nodes_builtin:
+            if field[-5:] == '_posX' and field[0:-5] not in _nodes_builtin and field[0:-5] not in self.replay_nodes:
                 self.replay_nodes.append(field[0:-5])
         self._update_nodes()
+        self._buildPoses()
         self._set_ui()
-        print('* Loaded {:d} replay samples from {:s}.'.format(len(s), sample_file))
-        if len(self.replay_nodes) > 1:
-            print('* Replay contains {:d} tracked nodes: {:s}.'.format(len(self.replay_nodes), ', '.join(self.replay_nodes)))
+
+
+    def _buildPoses(self):
+        """ Precompute flat per-frame pose arrays for each eye, tracked node and
+        the view, so that replaying a frame only needs a slice of each array.
+        Gaze and view poses hold position and orientation quaternion 
+        (POSE_POS_QUAT values per frame), other nodes only position (POSE_POS).
+        """
+        s = self._samples
+        self._poses = {}
+        targets = {node: False for node in self.replay_nodes}
+        for eye_pos in self._gaze.keys():
+            if self._gaze[eye_pos]['data']:
+                targets['gaze' + eye_pos] = True
+        if 'view_posX' in s and 'view_dirX' in s:
+            targets['view'] = True
+
+        for (label, rotation) in targets.items():
+            w = POSE_POS_QUAT if rotation else POSE_POS
+            pos = [s['{:s}_pos{:s}'.format(label, ax)] for ax in 'XYZ']
+            if rotation:
+                euler = [s['{:s}_dir{:s}'.format(label, ax)] for ax in 'XYZ']
+
+            if _HAS_NUMPY:
+                data = [np.asarray(c, dtype=float) for c in pos]
+                if rotation:
+                    quat = eulerQuat(*[np.asarray(c, dtype=float) for c in euler])
+                    data += [quat[:, k] for k in range(0, 4)]
+                pose = np.stack(data, axis=1).ravel()
+            else:
+                pose = array.array('d')
+                for i in range(0, self._sample_count):
+                    pose.extend([pos[0][i], pos[1][i], pos[2][i]])
+                    if rotation:
+                        pose.extend(_eulerQuat(euler[0][i], euler[1][i], euler[2][i]))
+            self._poses[label] = (pose, w)
+
+
+    def _getPose(self, label, frame, a=0.0):
+        """ Returns the pose of a replayed node as list of values, interpolated
+        between a given frame and the next one (linear for position, slerp for
+        orientation). Samples with missing position data are not interpolated.
+
+        Args:
+            label (str): Node label
+            frame (int): Sample index
+            a (float): Interpolation factor towards the next sample
+        """
+        (pose, w) = self._poses[label]
+        p = pose[frame * w:(frame + 1) * w].tolist()
+        if a > 0.0 and frame + 1 < self._sample_count:
+            q = pose[(frame + 1) * w:(frame + 2) * w].tolist()
+            if MISSING_VALUE not in p[0:3] and MISSING_VALUE not in q[0:3]:
+                pos = [x + (y - x) * a for (x, y) in zip(p[0:3], q[0:3])]
+                if w == POSE_POS_QUAT:
+                    return pos + _slerp(p[3:7], q[3:7], a)
+                return pos
+        return p
+
+
+    def _locate(self, t):
+        """ Find the sample at or before a given time by binary search
+
+        Returns: tuple of (sample index, interpolation factor towards next sample)
+        """
+        times = self._samples['time']
+        if _HAS_NUMPY and isinstance(times, np.ndarray):
+            i = int(np.searchsorted(times, t, side='right')) - 1
+        else:
+            i = bisect.bisect_right(times, t) - 1
+        i = max(0, min(i, self._sample_count - 1))
+        a = 0.0
+        if i + 1 < self._sample_count and times[i + 1] > times[i]:
+            a = min(max((t - times[i]) / float(times[i + 1] - times[i]), 0.0), 1.0)
+        return (i, a)
+
+
+    def setRate(self, rate=1.0):
+        """ Set playback rate relative to recording time
+
+        Args:
+            rate (float): Playback rate between 0.25 (slow motion) and 8.0
+        """
+        if rate < 0.25 or rate > 8.0:
+            raise ValueError('Playback rate must be between 0.25 and 8.0!')
+        self.rate = float(rate)
+
+
+    def getTime(self):
+        """ Returns the current replay time in ms since the first sample """
+        if self._sample_count == 0:
+            return 0.0
+        return min(self._time, self._samples['time'][-1]) - self._sample_time_offset
+
+
+    def seekTime(self, t, absolute=False):
+        """ Jump to a given time in the recording
+
+        Args:
+            t (float): Time in ms since the first sample
+            absolute (bool): if True, t is a recorded time stamp (e.g., from the event file)
+        """
+        if self._sample_count == 0:
+            return
+        if not absolute:
+            t += self._sample_time_offset
+        self._time = min(max(t, self._sample_time_offset), self._samples['time'][-1])
+        self.finished = False
+        if not self.replaying:
+            self.replayCurrentFrame(advance=False)
+        self._set_ui()
+
+
+    def seekEvent(self, message, occurrence=0):
+        """ Jump to the time of a recorded event. Requires event data, i.e.
+        replay from a SampleRecorder or an event_file passed to loadRecording().
+
+        Args:
+            message (str): Event message, or its beginning (e.g., 'VAL_START')
+            occurrence (int): Which matching event to use (0: first, -1: last)
+        """
+        self.seekTime(self.getEventTime(message, occurrence), absolute=True)
+
+
+    def getEventTime(self, message, occurrence=0):
+        """ Returns the recorded time stamp of an event (see seekEvent())
+
+        Args:
+            message (str): Event message, or its beginning (e.g., 'VAL_START')
+            occurrence (int): Which matching event to use (0: first, -1: last)
+        """
+        if 'message' not in self._events:
+            raise RuntimeError('No event data available for this replay!')
+        matches = [t for (t, m) in zip(self._events['time'], self._events['message']) 
+                   if str(m).startswith(message)]
+        if len(matches) == 0:
+            raise ValueError('No event found matching "{:s}"'.format(message))
+        return matches[occurrence]
 
 
     def startReplay(self, from_start=True):
-        """ Play the current recording frame by frame 
+        """ Play the current recording in real time (scaled by the playback rate)
         
         Args:
             from_start (bool): if True, start replay from first frame 
         """
-        if from_start or self._frame >= len(self._samples):
+        if from_start or self.finished or self._frame >= self._sample_count:
+            self._time = self._sample_time_offset
             self._frame = 0
         if self._player is None:
             self._player = vizact.onupdate(0, self.replayCurrentFrame)
@@ -331,7 +527,7 @@ class SampleReplay(object):
             if self._player is not None:
                 self._player.setEnabled(False)
             self.replaying = False
-            print('Replay stopped at frame {:d}.'.format(self._frame))
+            print('Replay stopped at frame {:d}, t={:.1f} s.'.format(self._frame, self.getTime() / 1000.0))
             self._set_ui()
 
 
@@ -340,55 +536,72 @@ class SampleReplay(object):
         if self.replaying:
             self.stopReplay()
         self._frame = 0
+        self._time = self._sample_time_offset
         self._set_ui()
 
 
+    def _showFrame(self, i, a=0.0):
+        """ Place eyes, tracked nodes and (if enabled) the MainView at the pose
+        interpolated between sample i and the next one
+
+        Args:
+            i (int): Sample index
+            a (float): Interpolation factor towards the next sample
+        """
+        # Set up eye representation(s)
+        for eye_pos in list(self._gaze.keys()):
+            if self._gaze[eye_pos]['node'] is not None:
+                if self._gaze[eye_pos]['data']:
+                    node = self._gaze[eye_pos][self._gaze[eye_pos]['node']]
+                    p = self._getPose('gaze' + eye_pos, i, a)
+                    node.setPosition(p[0:3])
+                    node.setQuat(p[3:7])
+                    node.visible(True)
+                else:
+                    self._gaze[eye_pos][self._gaze[eye_pos]['node']].visible(False) 
+
+        # Position the 3D gaze cursor and other nodes
+        for node in self._nodes.keys():
+            if self._nodes[node]['visible']:
+                self._nodes[node]['obj'].setPosition(self._getPose(node, i, a)[0:3])
+
+        if self.replay_view and 'view' in self._poses:
+            p = self._getPose('view', i, a)
+            viz.MainView.setPosition(p[0:3])
+            viz.MainView.setQuat(p[3:7])
+
+
     def replayCurrentFrame(self, advance=True):
-        """ Replay task. Sets up gaze position for each upcoming frame 
+        """ Replay task. Sets up gaze position for each upcoming frame, 
+        interpolated at the current replay time
         
         Args:
-            advance (bool): if True, advance to next frame (default).
+            advance (bool): if True, advance replay time by the duration of 
+                the last display frame, times the playback rate (default).
         """
-        if self._frame < len(self._samples):
-            f = self._samples[self._frame]
-
-            # Set up eye representation(s)
-            for eye_pos in list(self._gaze.keys()):
-                if self._gaze[eye_pos]['node'] is not None:
-                    if self._gaze[eye_pos]['data']:
-                        node = self._gaze[eye_pos][self._gaze[eye_pos]['node']]
-                        eye_mat = viz.Matrix()
-                        eye_mat.setEuler([f['gaze{:s}_dirX'.format(eye_pos)],
-                                        f['gaze{:s}_dirY'.format(eye_pos)],
-                                        f['gaze{:s}_dirZ'.format(eye_pos)]])
-                        eye_mat.setPosition([f['gaze{:s}_posX'.format(eye_pos)],
-                                            f['gaze{:s}_posY'.format(eye_pos)],
-                                            f['gaze{:s}_posZ'.format(eye_pos)]])
-                        eye_mat.setScale(node.getScale())
-                        node.setMatrix(eye_mat)
-                        node.visible(True)
-                    else:
-                        self._gaze[eye_pos][self._gaze[eye_pos]['node']].visible(False) 
-
-            # Position the 3D gaze cursor and other nodes
-            for node in self._nodes.keys():
-                if self._nodes[node]['visible']:
-                    self._nodes[node]['obj'].setPosition([f['{:s}_posX'.format(node)], f['{:s}_posY'.format(node)], f['{:s}_posZ'.format(node)]])
-
-            if self.replay_view:
-                viz.MainView.setEuler([f['view_dirX'], f['view_dirY'], f['view_dirZ']])
-                viz.MainView.setPosition([f['view_posX'], f['view_posY'], f['view_posZ']])
+        if self._sample_count > 0 and self._time <= self._samples['time'][-1]:
+            f = self._samples
+            (i, a) = self._locate(self._time)
+            prev = self._frame
+            self._frame = i
+            self._showFrame(i, a)
 
             if self.console:
                 st = 't={:.2f}s, f={:d}\tgaze3d=[{:0.2f}, {:0.2f}, {:0.2f}]\tgaze=[{:0.2f}, {:0.2f}, {:0.2f}]'
-                print(st.format((f['time'] - self._sample_time_offset)/1000.0, self._frame, f['gaze3d_posX'], f['gaze3d_posY'], f['gaze3d_posZ'], f['gaze_dirX'], f['gaze_dirY'], f['gaze_dirZ']))
+                print(st.format((f['time'][i] - self._sample_time_offset)/1000.0, self._frame, f['gaze3d_posX'][i], f['gaze3d_posY'][i], f['gaze3d_posZ'][i], 
+                                f['gaze_dirX'][i], f['gaze_dirY'][i], f['gaze_dirZ'][i]))
             else:
-                if self._frame == 0 or self._frame == len(self._samples) or self._frame % 100 == 0:
-                    print('Replaying frame {:d}/{:d}, t={:.1f} s'.format(self._frame, len(self._samples), 
-                                                                    (f['time'] - self._sample_time_offset)/1000.0))
+                if i // 100 != prev // 100:
+                    print('Replaying frame {:d}/{:d}, t={:.1f} s'.format(self._frame, self._sample_count, 
+                                                                    (f['time'][i] - self._sample_time_offset)/1000.0))
 
             if advance:
-                self._frame += 1
+                # Always show the last sample before finishing
+                last = f['time'][-1]
+                if self._time >= last:
+                    self._time = float('inf')
+                else:
+                    self._time = min(self._time + viz.getFrameElapsed() * 1000.0 * self.rate, last)
 
         else:
             # Reached last frame, stop replay and reset
@@ -447,6 +660,233 @@ class SampleReplay(object):
             self._gaze['L']['eye'].setEyeColor(left)
         if right is not None:
             self._gaze['R']['eye'].setEyeColor(right)
-        
 
 
+class MultiReplay(object):
+
+    def __init__(self, recordings, align=None, occurrence=0, ui=True, eyeball=True,
+                 eye='BOTH_EYE', view=0, rate=1.0, sep='\t'):
+        """ Synchronized replay of several recordings on a shared timeline,
+        e.g. to compare sessions of the same task. All recordings are driven by
+        one replay clock, and each frame is looked up by time in each recording
+        (see SampleReplay).
+
+        Recordings are aligned at their first sample by default, or at the time of
+        an event marker present in all recordings (e.g., align='VAL_START'). Timeline
+        times are in ms relative to this alignment point and can be negative.
+        Outside of its recorded time range, each recording shows its first or last sample.
+
+        Args:
+            recordings (list): Recordings to replay. Each entry can be a SampleRecorder
+                instance, a sample file name, or a tuple of (sample file, event file)
+            align (str): Event message (or its beginning) to align recordings by,
+                or None to align by relative time since the first sample
+            occurrence (int): Which matching alignment event to use (0: first, -1: last)
+            ui (bool): if True, display a vizinfo panel with replay status
+            eyeball (bool): if True, show Eyeball shapes, else use axes objects
+            eye: Eye data to show for each recording (see SampleReplay)
+            view (int): Index of the recording that moves the MainView, or None
+            rate (float): Playback rate relative to recording time (0.25 - 8.0)
+            sep (str): Field separator in sample and event files
+        """
+        if len(recordings) == 0:
+            raise ValueError('MultiReplay requires at least one recording!')
+        self.replays = []
+        self._origins = []
+        for (idx, rec) in enumerate(recordings):
+            r = SampleReplay(ui=False, eyeball=eyeball, eye=eye, replay_view=(idx == view))
+            if type(rec) == SampleRecorder:
+                (samples, events) = rec.getLastRecording(output='numpy' if _HAS_NUMPY else 'dict')
+                r._events = events
+                r._setSamples(samples)
+            elif type(rec) in [tuple, list]:
+                r.loadRecording(rec[0], sep=sep, event_file=rec[1])
+            else:
+                r.loadRecording(rec, sep=sep)
+            if r._sample_count == 0:
+                raise ValueError('Recording {:d} contains no samples!'.format(idx))
+
+            # Distinguishable eye colors per recording
+            if len(recordings) > 1:
+                col = colorsys.hsv_to_rgb(float(idx) / len(recordings), 0.8, 0.9)
+                r.setEyeColors(combined=col, left=col, right=col)
+
+            if align is None:
+                self._origins.append(r._sample_time_offset)
+            else:
+                self._origins.append(r.getEventTime(align, occurrence))
+            self.replays.append(r)
+
+        # Shared timeline covering all recordings
+        self._start = min([float(r._samples['time'][0] - o) for (r, o) in zip(self.replays, self._origins)])
+        self._end = max([float(r._samples['time'][-1] - o) for (r, o) in zip(self.replays, self._origins)])
+        self._time = self._start
+        self._player = None
+        self.replaying = False
+        self.finished = False
+        self.rate = 1.0
+        self.setRate(rate)
+
+        # Set up status GUI
+        self._ui = None
+        if ui:
+            self._ui = vizinfo.InfoPanel('Multi Recording Replay', align=viz.ALIGN_RIGHT_TOP)
+            self._ui_bar = self._ui.addItem(viz.addProgressBar(''))
+            vizact.onslider(self._ui_bar, self._ui_set_frame)
+            self._ui_time = self._ui.addLabelItem('Time', viz.addText('NA'))
+            self._ui_play = self._ui.addItem(viz.addButtonLabel('Start Replay'))
+            vizact.onbuttondown(self._ui_play, self._ui_toggle_replay)
+        print('* Aligned {:d} recordings, timeline {:.1f} to {:.1f} s.'.format(len(self.replays), 
+                                                                           self._start / 1000.0, self._end / 1000.0))
+        self.replayCurrentFrame(advance=False)
+
+
+    def _set_ui(self):
+        """ Update GUI elements to display status (if enabled) """
+        if self._ui is not None:
+            t = min(self._time, self._end)
+            if self._end > self._start:
+                self._ui_bar.set((t - self._start) / float(self._end - self._start))
+            self._ui_bar.message('{:d} recordings'.format(len(self.replays)))
+            if abs(t) > 10000:
+                self._ui_time.message('{:.1f} s'.format(t/1000.0))
+            else:
+                self._ui_time.message('{:.1f} ms'.format(t))
+
+            if self.replaying and self._ui_play.getMessage() != 'Pause Replay':
+                self._ui_play.message('Pause Replay')
+            elif not self.replaying and self._ui_play.getMessage() != 'Start Replay':
+                self._ui_play.message('Start Replay')
+
+
+    def _ui_toggle_replay(self):
+        """ Callback for Play/Pause button """
+        if self.replaying:
+            self.stopReplay()
+        else:
+            self.startReplay(from_start=False)
+
+
+    def _ui_set_frame(self, slider_pos):
+        """ Callback for progress bar click -> seek to corresponding time """
+        self.seekTime(self._start + slider_pos * (self._end - self._start))
+
+
+    def setRate(self, rate=1.0):
+        """ Set playback rate relative to recording time
+
+        Args:
+            rate (float): Playback rate between 0.25 (slow motion) and 8.0
+        """
+        if rate < 0.25 or rate > 8.0:
+            raise ValueError('Playback rate must be between 0.25 and 8.0!')
+        self.rate = float(rate)
+
+
+    def getTime(self):
+        """ Returns the current timeline time in ms relative to the alignment point """
+        return min(self._time, self._end)
+
+
+    def getTimeRange(self):
+        """ Returns (start, end) of the shared timeline in ms """
+        return (self._start, self._end)
+
+
+    def seekTime(self, t):
+        """ Jump to a given time on the shared timeline
+
+        Args:
+            t (float): Time in ms relative to the alignment point
+        """
+        self._time = min(max(t, self._start), self._end)
+        self.finished = False
+        if not self.replaying:
+            self.replayCurrentFrame(advance=False)
+        self._set_ui()
+
+
+    def seekEvent(self, message, occurrence=0, recording=0):
+        """ Jump to the time of an event in one of the recordings
+
+        Args:
+            message (str): Event message, or its beginning
+            occurrence (int): Which matching event to use (0: first, -1: last)
+            recording (int): Index of the recording to take the event from
+        """
+        t = self.replays[recording].getEventTime(message, occurrence)
+        self.seekTime(t - self._origins[recording])
+
+
+    def startReplay(self, from_start=True):
+        """ Play all recordings in real time (scaled by the playback rate)
+
+        Args:
+            from_start (bool): if True, start replay at the start of the timeline
+        """
+        if from_start or self.finished:
+            self._time = self._start
+        if self._player is None:
+            self._player = vizact.onupdate(0, self.replayCurrentFrame)
+        if not self.replaying:
+            self._player.setEnabled(True)
+            self.replaying = True
+            self.finished = False
+            print('Replay started.')
+            self._set_ui()
+
+
+    def stopReplay(self):
+        """ Stop an ongoing replay """
+        if self.replaying:
+            if self._player is not None:
+                self._player.setEnabled(False)
+            self.replaying = False
+            print('Replay stopped at t={:.1f} s.'.format(self.getTime() / 1000.0))
+            self._set_ui()
+
+
+    def resetReplay(self):
+        """ Stop replay and reset to the start of the timeline """
+        if self.replaying:
+            self.stopReplay()
+        self.seekTime(self._start)
+
+
+    def replayCurrentFrame(self, advance=True):
+        """ Replay task. Shows each recording at the current timeline time
+
+        Args:
+            advance (bool): if True, advance replay time by the duration of 
+                the last display frame, times the playback rate (default).
+        """
+        if self._time <= self._end:
+            for (r, origin) in zip(self.replays, self._origins):
+                times = r._samples['time']
+                t = min(max(self._time + origin, times[0]), times[-1])
+                (i, a) = r._locate(t)
+                r._time = t
+                r._frame = i
+                r._showFrame(i, a)
+
+            if advance:
+                # Always show the end of the timeline before finishing
+                if self._time >= self._end:
+                    self._time = float('inf')
+                else:
+                    self._time = min(self._time + viz.getFrameElapsed() * 1000.0 * self.rate, self._end)
+        else:
+            self.replaying = False
+            self.finished = True
+            if self._player is not None:
+                self._player.setEnabled(False)
+            print('Replay finished.')
+
+        self._set_ui()
+
+
+    def replayDone(self):
+        """ Returns True if replay is finished,
+            use as viztask.waitTrue(object.replayDone)
+        """
+        return self.finished
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+
+# vexptoolbox: Vizard Toolbox for Behavioral Experiments
+# Threaded eye tracker sampling independent of the display frame rate
+
+import sys
+import math
+import random
+import threading
+
+# Python version compatibility
+if sys.version_info[0] == 3:
+    from time import perf_counter, sleep
+else:
+    from time import clock as perf_counter, sleep
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class SampleBuffer(object):
+
+    def __init__(self, size=524288):
+        """ Fixed-size ring buffer of time-stamped samples for a single
+        producer thread. The producer only ever writes a slot and then
+        increments the sample count, so readers in other threads never
+        need to take a lock. Once full, the oldest samples are overwritten.
+
+        Args:
+            size (int): Number of samples to keep. Default is good for
+                ~70 min at 120 Hz.
+        """
+        self.size = int(size)
+        self._times = [0.0,] * self.size
+        self._data = [None,] * self.size
+        self._count = 0
+
+
+    def __len__(self):
+        """ Number of samples currently available in the buffer """
+        return min(self._count, self.size)
+
+
+    @property
+    def count(self):
+        """ Total number of samples pushed since creation or last clear() """
+        return self._count
+
+
+    def push(self, t, sample):
+        """ Add a new sample (producer thread only)
+
+        Args:
+            t (float): Time stamp of this sample, must be monotonic
+            sample: Sample data (usually a dict)
+        """
+        slot = self._count % self.size
+        self._times[slot] = t
+        self._data[slot] = sample
+        self._count += 1
+
+
+    def clear(self):
+        """ Discard all samples. Do not call while the producer is running. """
+        self._times = [0.0,] * self.size
+        self._data = [None,] * self.size
+        self._count = 0
+
+
+    def _range(self):
+        """ Return (first, end) sample numbers that are safe to read. One slot
+        is left out at the start because the producer may be overwriting it. """
+        end = self._count
+        first = 0
+        if end > self.size:
+            first = end - self.size + 1
+        return (first, end)
+
+
+    def latest(self):
+        """ Return the most recent sample, or None if the buffer is empty """
+        end = self._count
+        if end == 0:
+            return None
+        return self._data[(end - 1) % self.size]
+
+
+    def nearest(self, t):
+        """ Return the sample whose time stamp is closest to t, using
+        a binary search over the available samples.
+
+        Args:
+            t (float): Time stamp to search for, same clock as push()
+
+        Returns: sample, or None if the buffer is empty
+        """
+        first, end = self._range()
+        if end <= first:
+            return None
+
+        size = self.size
+        times = self._times
+        lo, hi = first, end
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if times[mid % size] < t:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        # lo is the first sample at or after t, compare to its predecessor
+        if lo >= end:
+            lo = end - 1
+        elif lo > first and (t - times[(lo - 1) % size]) <= (times[lo % size] - t):
+            lo = lo - 1
+        return self._data[lo % size]
+
+
+    def read(self, since=0):
+        """ Return all available samples numbered since the given sample number.
+        Use the count property to read new samples incrementally.
+
+        Args:
+            since (int): Number of the first sample to return
+
+        Returns: list of samples in order of arrival
+        """
+        first, end = self._range()
+        start = max(first, since)
+        return [self._data[k % self.size] for k in range(start, end)]
+
+
+
+class ThreadedSampler(object):
+
+    def __init__(self, poll_fn, rate=120.0, buffer_size=524288, skip_repeats=True):
+        """ Poll a data source (e.g., an eye tracker) at a fixed rate in a
+        background thread, independent of the display frame rate. Each new
+        sample is time-stamped using the monotonic system clock (in ms,
+        same clock as the 'systime' sample field) and added to a SampleBuffer.
+
+        Args:
+            poll_fn: Function returning the current sample as a dict, or None
+                if no data is available
+            rate (float): Polling rate in Hz (use the tracker's native rate)
+            buffer_size (int): Number of samples to keep in the buffer
+            skip_repeats (bool): if True, only store samples that differ from
+                the previous one (i.e., the device has not produced new data)
+        """
+        self.rate = float(rate)
+        self.skip_repeats = skip_repeats
+        self.buffer = SampleBuffer(size=buffer_size)
+        self.polls = 0
+        self.repeats = 0
+        self._poll = poll_fn
+        self._thread = None
+        self._stop = threading.Event()
+
+
+    @property
+    def running(self):
+        """ True if the sampling thread is active """
+        return self._thread is not None and self._thread.is_alive()
+
+
+    def start(self):
+        """ Start the sampling thread """
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='vexptoolbox-sampler')
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def stop(self, timeout=1.0):
+        """ Stop the sampling thread and wait for it to finish
+
+        Args:
+            timeout (float): Maximum time to wait in seconds
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+
+    def merge(self, sample, t):
+        """ Add the fields of the buffered sample closest to time t to a sample
+        dict, e.g. to join each render-frame sample with the nearest eye sample
+
+        Args:
+            sample (dict): Sample to update
+            t (float): Time stamp of sample, same clock as the buffer (ms)
+
+        Returns: True if a buffered sample was found
+        """
+        nearest = self.buffer.nearest(t)
+        if nearest is None:
+            return False
+        sample.update(nearest)
+        return True
+
+
+    def _run(self):
+        """ Sampling loop, runs in the background thread """
+        interval = 1.0 / self.rate
+        next_t = perf_counter()
+        last = None
+        while not self._stop.is_set():
+            s = self._poll()
+            now = perf_counter()
+            self.polls += 1
+            if s is not None:
+                if self.skip_repeats and s == last:
+                    self.repeats += 1
+                else:
+                    last = s
+                    sample = dict(s)
+                    sample['eye_time'] = now * 1000.0
+                    sample['eye_index'] = self.buffer.count
+                    self.buffer.push(sample['eye_time'], sample)
+
+            # Schedule on a fixed grid so polling does not drift
+            next_t += interval
+            delay = next_t - perf_counter()
+            if delay > 0:
+                sleep(delay)
+            elif delay < -interval:
+                next_t = perf_counter() # fell behind, do not try to catch up
+
+
+
+class TaskWorker(object):
+
+    def __init__(self, fn, name='vexptoolbox-worker'):
+        """ Call a function on queued work items in a background thread,
+        e.g. to keep expensive computations off the Vizard render loop.
+        Results are kept in order of submission. An exception raised by fn
+        is stored and re-raised by results() in the calling thread.
+
+        Args:
+            fn: Function to call with the arguments passed to submit()
+            name (str): Thread name
+        """
+        self._fn = fn
+        self._queue = queue.Queue()
+        self._results = []
+        self._error = None
+        self._submitted = 0
+        self._finished = 0
+        self._thread = threading.Thread(target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    @property
+    def pending(self):
+        """ Number of submitted items that have not been processed yet """
+        return self._submitted - self._finished
+
+
+    def done(self):
+        """ Returns True if all submitted items have been processed,
+        use as viztask.waitTrue(worker.done) """
+        return self._finished == self._submitted
+
+
+    def submit(self, *args):
+        """ Queue a new work item. Returns immediately.
+
+        Args:
+            *args: Arguments for the worker function
+        """
+        self._results.append(None)
+        self._submitted += 1
+        self._queue.put((self._submitted - 1, args))
+
+
+    def _run(self):
+        """ Worker loop, runs in the background thread """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            (idx, args) = item
+            try:
+                self._results[idx] = self._fn(*args)
+            except Exception as e:
+                if self._error is None:
+                    self._error = e
+            self._finished += 1
+
+
+    def results(self):
+        """ Wait for all submitted items and return the list of results
+        in order of submission. Stops the worker thread. """
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return list(self._results)
+
+
+
+class FakeEyeTracker(object):
+
+    def __init__(self, rate=120.0, jitter=0.0, noise=0.0, gaze=(0.0, 0.0), seed=None):
+        """ Simulated eye tracker for testing sampling code without hardware.
+        New data is produced at the given rate with Gaussian timing jitter.
+        Between updates, poll() returns the previous sample unchanged, just
+        like Vizard sensors do when the device has not delivered new data.
+
+        Args:
+            rate (float): Native sampling rate in Hz
+            jitter (float): SD of sample timing jitter in ms
+            noise (float): SD of gaze angle noise in degrees
+            gaze (2-tuple): Mean horizontal and vertical gaze angle in degrees
+            seed: Random seed for reproducible data
+        """
+        self.rate = float(rate)
+        self.jitter = float(jitter)
+        self.noise = float(noise)
+        self.gaze = gaze
+        self.emitted = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next = perf_counter()
+        self._sample = None
+
+
+    def _newSample(self):
+        """ Generate a new gaze sample """
+        x = self.gaze[0] + self._rng.gauss(0.0, self.noise)
+        y = self.gaze[1] + self._rng.gauss(0.0, self.noise)
+        return {'eye_seq': self.emitted,
+                'eye_dirX': x,
+                'eye_dirY': y,
+                'eye_vecX': math.sin(math.radians(x)) * math.cos(math.radians(y)),
+                'eye_vecY': math.sin(math.radians(y)),
+                'eye_vecZ': math.cos(math.radians(x)) * math.cos(math.radians(y))}
+
+
+    def poll(self):
+        """ Return the most recent sample, generating new ones as they become due """
+        with self._lock:
+            now = perf_counter()
+            while now >= self._next:
+                self._sample = self._newSample()
+                self.emitted += 1
+                step = 1.0 / self.rate + self._rng.gauss(0.0, self.jitter / 1000.0)
+                self._next += max(step, 0.1 / self.rate)
+            return self._sample
+
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+# vexptoolbox: Vizard Toolbox for Behavioral Experiments
+# Event-indexed segmentation of recordings. The event log is parsed once into
+# a typed event table, and segments (e.g. every validation target, the VOR
+# block) are located in the sample data by binary search on the time column.
+
+import numpy as np
+
+from .data import loadSampleFile, _HAS_SCI_PKGS
+
+if _HAS_SCI_PKGS:
+    import pandas as pd
+
+# Event kinds whose end marker does not use the _END suffix
+SEGMENT_END = {'REC': 'REC_STOP'}
+
+
+def _columns(data):
+    """ Dict of columns from a file name, DataFrame, dict of columns or list of row dicts """
+    if isinstance(data, str):
+        return loadSampleFile(data)
+    if _HAS_SCI_PKGS and isinstance(data, pd.DataFrame):
+        return {col: data[col].values for col in data.columns}
+    if isinstance(data, (list, tuple)):
+        keys = list(data[0].keys()) if len(data) > 0 else ['time', 'message']
+        return {k: [row.get(k) for row in data] for k in keys}
+    return data
+
+
+def _isInt(token):
+    """ True if a message token is an integer literal """
+    return token.lstrip('+-').isdigit()
+
+
+def parseEvents(events):
+    """ Parse event messages into a typed event table, sorted by time. Messages
+    are split at whitespace: the first token is the event kind (e.g. 'VAL_START'),
+    an integer second token is the event index (e.g. trial or target number),
+    and remaining numeric tokens are parameters (e.g. target position).
+
+    Args:
+        events: Event file name, DataFrame, dict of 'time' and 'message' columns,
+            or list of event dicts (as recorded by SampleRecorder.recordEvent())
+
+    Returns: dict of columns:
+        - time: event time stamp (ms)
+        - kind: event kind (str)
+        - index: event index, -1 if none
+        - params: (N, P) float array of numeric parameters, NaN-padded
+        - args: message text after the kind (str)
+        - message: original message
+    """
+    ev = _columns(events)
+    times = np.asarray(ev['time'], dtype=float)
+    messages = [str(m) for m in ev['message']]
+    order = np.argsort(times, kind='mergesort')
+
+    kinds = []
+    index = np.full(len(times), -1, dtype=int)
+    args = []
+    params = []
+    for (k, i) in enumerate(order):
+        tokens = messages[i].split()
+        kinds.append(tokens[0] if len(tokens) > 0 else '')
+        rest = tokens[1:]
+        args.append(' '.join(rest))
+        if len(rest) > 0 and _isInt(rest[0]):
+            index[k] = int(rest[0])
+            rest = rest[1:]
+        p = []
+        for tok in rest:
+            try:
+                p.append(float(tok))
+            except ValueError:
+                p.append(np.nan)
+        params.append(p)
+
+    width = max([len(p) for p in params] + [0])
+    par = np.full((len(times), width), np.nan)
+    for (k, p) in enumerate(params):
+        par[k, 0:len(p)] = p
+
+    return {'time': times[order],
+            'kind': np.array(kinds, dtype=object),
+            'index': index,
+            'params': par,
+            'args': np.array(args, dtype=object),
+            'message': np.array(messages, dtype=object)[order]}
+
+
+def eventSegments(events, kind):
+    """ Pair start and end events of one kind into segments, e.g. kind='VAL'
+    pairs each 'VAL_START' with the next 'VAL_END' of the same index.
+    Segments without an end event extend to the end of the recording.
+
+    Args:
+        events: Typed event table (see parseEvents()), or raw events
+        kind (str): Segment kind, e.g. 'TRIAL', 'VAL', 'VOR', 'FREEVIEW', 'REC'
+
+    Returns: dict of columns 'start', 'end' (time stamps), 'index', 'params'
+        (parameters of the start event) and 'end_params', sorted by start time
+    """
+    if not (isinstance(events, dict) and 'kind' in events):
+        events = parseEvents(events)
+    start_kind = '{:s}_START'.format(kind)
+    end_kind = SEGMENT_END.get(kind, '{:s}_END'.format(kind))
+
+    sel = np.flatnonzero((events['kind'] == start_kind) | (events['kind'] == end_kind))
+    width = events['params'].shape[1]
+    segs = []
+    open_segs = {}
+    for e in sel:
+        idx = int(events['index'][e])
+        if events['kind'][e] == start_kind:
+            open_segs.setdefault(idx, []).append(len(segs))
+            segs.append([events['time'][e], np.inf, idx, e, -1])
+        elif len(open_segs.get(idx, [])) > 0:
+            seg = segs[open_segs[idx].pop()]
+            seg[1] = events['time'][e]
+            seg[4] = e
+
+    out = {'start': np.array([s[0] for s in segs], dtype=float),
+           'end': np.array([s[1] for s in segs], dtype=float),
+           'index': np.array([s[2] for s in segs], dtype=int),
+           'params': np.full((len(segs), width), np.nan),
+           'end_params': np.full((len(segs), width), np.nan)}
+    for (k, s) in enumerate(segs):
+        out['params'][k] = events['params'][s[3]]
+        if s[4] >= 0:
+            out['end_params'][k] = events['params'][s[4]]
+    return out
+
+
+
+class SegmentIndex(object):
+
+    def __init__(self, samples, events, time_field='time'):
+        """ Time index of one recording for cutting out event-defined segments.
+        Events are parsed once, and segment boundaries are found by binary search
+        on the (sorted) sample time column. Returned segments are slices of the
+        sample columns, i.e. views without copying for NumPy columns.
+
+        Args:
+            samples: Sample file name, DataFrame, or dict of columns
+            events: Event file name, DataFrame, dict of columns or list of event dicts
+            time_field (str): Sample time column
+        """
+        if isinstance(samples, str):
+            samples = loadSampleFile(samples)
+        if not (_HAS_SCI_PKGS and isinstance(samples, pd.DataFrame)):
+            samples = {k: np.asarray(v) for (k, v) in samples.items()}
+        self.samples = samples
+        self.events = parseEvents(events)
+        self._time = np.asarray(samples[time_field], dtype=float)
+        if np.any(np.diff(self._time) < 0):
+            raise ValueError('Sample time column must be sorted!')
+        self._segments = {}
+
+
+    def __len__(self):
+        return len(self._time)
+
+
+    def segments(self, kind):
+        """ Segment table of one kind (see eventSegments()), cached """
+        if kind not in self._segments:
+            self._segments[kind] = eventSegments(self.events, kind)
+        return self._segments[kind]
+
+
+    def bounds(self, kind):
+        """ Sample index ranges of all segments of one kind
+
+        Returns: tuple of (first, end) index arrays, end exclusive
+        """
+        seg = self.segments(kind)
+        return (np.searchsorted(self._time, seg['start'], side='left'),
+                np.searchsorted(self._time, seg['end'], side='right'))
+
+
+    def slice(self, first, end):
+        """ Samples in an index range, as a DataFrame slice or dict of array views """
+        if _HAS_SCI_PKGS and isinstance(self.samples, pd.DataFrame):
+            return self.samples.iloc[first:end]
+        return {k: v[first:end] for (k, v) in self.samples.items()}
+
+
+    def timeSlice(self, start, end):
+        """ Samples between two time stamps (inclusive) """
+        return self.slice(int(np.searchsorted(self._time, start, side='left')),
+                          int(np.searchsorted(self._time, end, side='right')))
+
+
+    def get(self, kind, index=None):
+        """ Samples of all segments of one kind
+
+        Args:
+            kind (str): Segment kind, e.g. 'VAL' for every validation target window
+            index (int): if set, only return segments with this event index
+
+        Returns: list of sample slices, in order of segment start
+        """
+        seg = self.segments(kind)
+        (first, end) = self.bounds(kind)
+        return [self.slice(int(f), int(e)) for (f, e, i) in zip(first, end, seg['index'])
+                if index is None or i == index]
+
+
+
+def collectSegments(recordings, kind, index=None):
+    """ Cut out segments of one kind from many recordings
+
+    Args:
+        recordings: List of SegmentIndex objects or (samples, events) tuples
+        kind (str): Segment kind, e.g. 'VOR' for the VOR block of every session
+        index (int): if set, only return segments with this event index
+
+    Returns: list of dicts with keys 'recording' (list position), 'index',
+        'start', 'end', 'params' and 'samples' (sample slice)
+    """
+    out = []
+    for (r, rec) in enumerate(recordings):
+        if not isinstance(rec, SegmentIndex):
+            rec = SegmentIndex(*rec)
+        seg = rec.segments(kind)
+        (first, end) = rec.bounds(kind)
+        for k in range(0, len(first)):
+            if index is not None and seg['index'][k] != index:
+                continue
+            out.append({'recording': r, 'index': int(seg['index'][k]),
+                        'start': seg['start'][k], 'end': seg['end'][k],
+                        'params': seg['params'][k],
+                        'samples': rec.slice(int(first[k]), int(end[k]))})
+    return out
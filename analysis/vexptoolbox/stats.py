@@ -65,3 +65,114 @@ def mad2(x, y):
     medx = median(x)
     medy = median(y)
     return math.sqrt((median([abs(xi - medx) for xi in x]) ** 2) + (median([abs(yi - medy) for yi in y]) ** 2))
+
+
+class RunningStats(object):
+    """ Streaming mean, population SD (Welford's algorithm) and intersample 
+    RMS of a data series, updated one value at a time in O(1) memory.
+    Also counts consecutive repeated values. """
+
+    def __init__(self):
+        self.n = 0
+        self.repeats = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._dsq = 0.0
+        self._last = None
+
+
+    def add(self, x):
+        """ Add a single value """
+        x = float(x)
+        self.n += 1
+        delta = x - self._mean
+        self._mean += delta / self.n
+        self._m2 += delta * (x - self._mean)
+        if self._last is not None:
+            self._dsq += (x - self._last) ** 2
+            if x == self._last:
+                self.repeats += 1
+        self._last = x
+
+
+    @property
+    def mean(self):
+        return self._mean if self.n > 0 else None
+
+
+    @property
+    def sd(self):
+        return math.sqrt(self._m2 / self.n) if self.n > 0 else None
+
+
+    @property
+    def rmsi(self):
+        return math.sqrt(self._dsq / (self.n - 1)) if self.n > 1 else None
+
+
+
+class RunningQuantile(object):
+    """ Streaming quantile estimate in O(1) memory using the P-square 
+    algorithm (Jain & Chlamtac, 1985, Communications of the ACM). 
+    The value is exact for up to five samples. """
+
+    def __init__(self, p=0.5):
+        self.p = float(p)
+        self.n = 0
+        self._q = []
+        self._pos = [0.0, 1.0, 2.0, 3.0, 4.0]
+        self._des = [0.0, 2.0 * p, 4.0 * p, 2.0 + 2.0 * p, 4.0]
+        self._inc = [0.0, p / 2.0, p, (1.0 + p) / 2.0, 1.0]
+
+
+    def add(self, x):
+        """ Add a single value """
+        x = float(x)
+        self.n += 1
+        q = self._q
+        if self.n <= 5:
+            q.append(x)
+            q.sort()
+            return
+
+        # Find marker cell of new value and update marker positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        pos = self._pos
+        for i in range(k + 1, 5):
+            pos[i] += 1.0
+        for i in range(0, 5):
+            self._des[i] += self._inc[i]
+
+        # Adjust middle marker heights (parabolic, or linear if not monotonic)
+        for i in range(1, 4):
+            dp = self._des[i] - pos[i]
+            if (dp >= 1.0 and pos[i + 1] - pos[i] > 1.0) or (dp <= -1.0 and pos[i - 1] - pos[i] < -1.0):
+                ds = 1.0 if dp > 0 else -1.0
+                qp = q[i] + ds / (pos[i + 1] - pos[i - 1]) * (
+                        (pos[i] - pos[i - 1] + ds) * (q[i + 1] - q[i]) / (pos[i + 1] - pos[i]) +
+                        (pos[i + 1] - pos[i] - ds) * (q[i] - q[i - 1]) / (pos[i] - pos[i - 1]))
+                if not q[i - 1] < qp < q[i + 1]:
+                    j = i + int(ds)
+                    qp = q[i] + ds * (q[j] - q[i]) / (pos[j] - pos[i])
+                q[i] = qp
+                pos[i] += ds
+
+
+    @property
+    def value(self):
+        if self.n == 0:
+            return None
+        if self.n <= 5:
+            if self.p == 0.5:
+                return median(self._q)
+            return self._q[min(int(self.p * self.n), self.n - 1)]
+        return self._q[2]